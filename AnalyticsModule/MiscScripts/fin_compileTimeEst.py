@@ -0,0 +1,57 @@
+import joblib
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from compiled_pipeline import compile_pipeline, verify
+from feature_pipeline import FeaturePipeline, TASK_DURATION_FEATURES, task_duration_input
+from model_registry import file_sha1
+
+def compile_time_model(data_path='fin_synthetic_machine_data.csv', model_path='fin_task_duration_model.joblib',
+                       output_path='fin_task_duration_model.compiled.joblib'):
+    """
+    Exports the trained task duration pipeline as a pure-NumPy predictor
+    (see compiled_pipeline.py) for est_time_api and fin_app. The export is
+    only written if it reproduces the pipeline's predictions on every row of
+    the dataset.
+    """
+    # Paths are relative to AnalyticsModule, where the services look for them.
+    BASE_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+    model_path, data_path, output_path = (os.path.join(BASE_DIR, p) for p in (model_path, data_path, output_path))
+
+    print(f"1. Loading trained model from '{model_path}'...")
+    try:
+        model_pipeline = joblib.load(model_path)
+    except FileNotFoundError:
+        print(f"Error: The model file '{model_path}' was not found.")
+        print("Please make sure you have trained the model first (fin_timeEst.py).")
+        return
+
+    print("2. Compiling one-hot maps and forest node arrays...")
+    compiled = compile_pipeline(model_pipeline, source_sha1=file_sha1(model_path))
+    print(f"-> {compiled.n_trees} trees, {len(compiled.left)} nodes, depth {compiled.depth}, "
+          f"{compiled.n_columns} encoded columns")
+
+    print(f"3. Verifying against the pipeline on the full dataset '{data_path}'...")
+    try:
+        dataset = FeaturePipeline(data_path).dataset()
+    except FileNotFoundError:
+        print(f"Error: The data file '{data_path}' was not found.")
+        return
+    columns = {c: dataset[c].to_numpy() for c in TASK_DURATION_FEATURES}
+    try:
+        max_diff = verify(compiled, model_pipeline, columns, task_duration_input(columns))
+        # Records (what the servers receive) must encode exactly like columns.
+        records = dataset[TASK_DURATION_FEATURES].head(256).to_dict('records')
+        verify(compiled, model_pipeline, records, task_duration_input(records))
+    except ValueError as e:
+        print(f"Error: {e} The compiled model was not saved.")
+        return
+    print(f"-> {len(dataset)} rows match (max abs difference {max_diff:.2e} hours)")
+
+    joblib.dump(compiled, output_path)
+    print(f"4. Compiled predictor saved as '{output_path}'")
+
+
+if __name__ == "__main__":
+    compile_time_model()
@@ -1,7 +1,10 @@
-import pandas as pd
-import numpy as np
 import joblib
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_pipeline import FeaturePipeline, clustering_matrix
+from operator_features import FEATURES_FOR_CLUSTERING
 
 def generate_insights_for_operator(operator_profile, global_averages, tier_map):
     """
@@ -56,31 +59,19 @@ def evaluate_final_profiler_model(data_path='fin_synthetic_machine_data.csv', mo
     try:
         BASE_DIR = os.path.abspath(os.path.dirname(__file__))
         pipeline = joblib.load(os.path.join(BASE_DIR, model_path))
-        df = pd.read_csv(os.path.join(BASE_DIR, data_path))
+        operator_profiles = FeaturePipeline(os.path.join(BASE_DIR, data_path)).operator_profiles()
     except FileNotFoundError as e:
         print(f"Error loading files: {e}. Make sure the required files are in the same directory as the script.")
         return
 
     # --- Step 1: Recreate Operator Profiles ---
     print("2. Re-engineering operator performance profiles...")
-    total_hours = df.groupby('Operator_ID')['Engine_Hours'].apply(lambda x: x.max() - x.min()).replace(0, 1)
-    operator_profiles = df.groupby('Operator_ID').agg(
-        total_load_cycles=('Load_Cycles', 'sum'),
-        total_fuel_used=('Fuel_Used', 'sum'),
-        total_idling_time_min=('Idling_Time', 'sum'),
-        total_safety_alerts=('Safety_Alert_Triggered', lambda x: (x == 'Yes').sum())
-    ).reset_index()
-    operator_profiles = operator_profiles.merge(total_hours.rename('total_engine_hours'), on='Operator_ID')
-    operator_profiles['fuel_per_load_cycle'] = (operator_profiles['total_fuel_used'] / operator_profiles['total_load_cycles']).replace([np.inf, -np.inf], 0)
-    operator_profiles['idling_ratio'] = (operator_profiles['total_idling_time_min'] / 60 / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    operator_profiles['safety_incident_rate'] = (operator_profiles['total_safety_alerts'] / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    features_for_clustering = ['fuel_per_load_cycle', 'idling_ratio', 'safety_incident_rate']
-    X = operator_profiles[features_for_clustering].fillna(0)
+    X = clustering_matrix(operator_profiles)
 
     # --- Step 2: Assign Clusters and Analyze ---
     print("3. Assigning operators to performance clusters...")
     operator_profiles['performance_cluster'] = pipeline.predict(X)
-    cluster_analysis = operator_profiles.groupby('performance_cluster')[features_for_clustering].mean()
+    cluster_analysis = operator_profiles.groupby('performance_cluster')[FEATURES_FOR_CLUSTERING].mean()
     print("\n--- Cluster Analysis (Average Stats per Cluster) ---")
     print(cluster_analysis.to_string())
 
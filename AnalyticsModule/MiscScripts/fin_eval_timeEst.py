@@ -4,6 +4,10 @@ from sklearn.model_selection import train_test_split
 from sklearn.metrics import mean_squared_error, mean_absolute_error
 import joblib
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_pipeline import FeaturePipeline
 
 def evaluate_final_time_model(data_path='fin_synthetic_machine_data.csv', model_path='fin_task_duration_model.joblib'):
     """
@@ -22,35 +26,14 @@ def evaluate_final_time_model(data_path='fin_synthetic_machine_data.csv', model_
 
     print(f"2. Loading and preparing final data from '{data_path}'...")
     try:
-        df = pd.read_csv(os.path.join(BASE_DIR, data_path))
+        # --- Recreate the exact same test set as during training ---
+        # Target and features come from the same shared pipeline as the training script.
+        print("3. Engineering the 'Task_Duration_Hours' target variable...")
+        X, y = FeaturePipeline(os.path.join(BASE_DIR, data_path)).task_duration()
     except FileNotFoundError:
         print(f"Error: The data file '{data_path}' was not found.")
         return
-    
-    # --- Recreate the exact same test set as during training ---
-    # This logic MUST match the final training script exactly.
-    print("3. Engineering the 'Task_Duration_Hours' target variable...")
-    terrain_multipliers = df['Terrain'].map({'Flat': 1.0, 'Incline': 1.15, 'Steep': 1.30})
-    df['Task_Duration_Hours'] = ((df['Idling_Time'] / 60) + (df['Load_Cycles'] * 0.1)) * terrain_multipliers
-    df = df.dropna()
 
-    # Define the features and target, matching the final training script
-    target = 'Task_Duration_Hours'
-    features = [
-        'Machine_ID',
-        'Operator_ID',
-        'RPM',
-        'Task_Type',
-        'Soil_Type',
-        'Terrain',
-        'Load_Cycles',
-        'Temperature_C',
-        'Precipitation_mm'
-    ]
-
-    X = df[features]
-    y = df[target]
-    
     # Use the same random_state to get the identical split as in training
     _, X_test, _, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
 
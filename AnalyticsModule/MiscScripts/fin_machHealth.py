@@ -1,8 +1,10 @@
-import pandas as pd
-import numpy as np
 from sklearn.ensemble import IsolationForest
 import joblib
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_pipeline import FeaturePipeline, HEALTH_FEATURES
 
 def train_final_health_model(data_path='fin_synthetic_machine_data.csv'):
     """
@@ -10,32 +12,18 @@ def train_final_health_model(data_path='fin_synthetic_machine_data.csv'):
     to detect anomalies in sensor readings for machine health monitoring.
     """
     print(f"1. Loading final data from '{data_path}'...")
+    BASE_DIR = os.path.abspath(os.path.dirname(__file__))
     try:
-        # Construct absolute path based on the script's location
-        BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-        df = pd.read_csv(os.path.join(BASE_DIR, data_path))
+        # --- Step 1: Feature Selection ---
+        # The features that represent a machine's live sensor state, as defined in
+        # feature_pipeline.py and used by the health-check endpoints.
+        print("2. Selecting features for machine health monitoring...")
+        X = FeaturePipeline(os.path.join(BASE_DIR, data_path)).health()
     except FileNotFoundError:
         print(f"Error: The file '{data_path}' was not found.")
         print("Please make sure you have generated the final dataset first.")
         return
 
-    # --- Step 1: Feature Selection ---
-    # We select the features that represent a machine's live sensor state.
-    # The new RPM feature is crucial for detecting complex anomalies.
-    print("2. Selecting features for machine health monitoring...")
-    
-    features_for_health = [
-        'RPM',
-        'Engine_Hours',
-        'Fuel_Used',
-        'Load_Cycles',
-        'Idling_Time',
-        'Temperature_C',
-        'Precipitation_mm'
-    ]
-    
-    X = df[features_for_health].fillna(0)
-    
     print("   - Features selected successfully.")
     print(X.head())
 
@@ -60,13 +48,12 @@ def train_final_health_model(data_path='fin_synthetic_machine_data.csv'):
     print("\n--- Anomaly Detection Demonstration ---")
     
     scores = model.decision_function(X)
-    df['anomaly_score'] = scores
     
     # Sort by the score to see the top 5 most anomalous rows
-    top_anomalies = df.sort_values('anomaly_score').head(5)
+    top_anomalies = X.assign(anomaly_score=scores).sort_values('anomaly_score').head(5)
     
     print("Top 5 most anomalous data points found in the training data:")
-    print(top_anomalies[features_for_health].to_string())
+    print(top_anomalies[HEALTH_FEATURES].to_string())
     print("\nThese are the types of 'weird' data points the model has learned to flag.")
 
 
@@ -1,10 +1,12 @@
-import pandas as pd
-import numpy as np
 from sklearn.preprocessing import StandardScaler
 from sklearn.cluster import KMeans
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_pipeline import FeaturePipeline, clustering_matrix
 
 def train_final_profiler_model(data_path='fin_synthetic_machine_data.csv'):
     """
@@ -15,7 +17,8 @@ def train_final_profiler_model(data_path='fin_synthetic_machine_data.csv'):
     try:
         # Construct absolute path based on the script's location
         BASE_DIR = os.path.abspath(os.path.dirname(__file__))
-        df = pd.read_csv(os.path.join(BASE_DIR, data_path))
+        # Profiles are cached per dataset fingerprint, so an unchanged CSV is not re-aggregated.
+        operator_profiles = FeaturePipeline(os.path.join(BASE_DIR, data_path)).operator_profiles()
     except FileNotFoundError:
         print(f"Error: The file '{data_path}' was not found.")
         print("Please make sure you have generated the final dataset first.")
@@ -25,31 +28,9 @@ def train_final_profiler_model(data_path='fin_synthetic_machine_data.csv'):
     # Create a "profile" for each operator by calculating their average performance.
     print("2. Engineering operator performance profiles...")
 
-    # Calculate total engine hours for each operator to normalize other metrics
-    total_hours = df.groupby('Operator_ID')['Engine_Hours'].apply(lambda x: x.max() - x.min()).replace(0, 1)
-    
-    operator_profiles = df.groupby('Operator_ID').agg(
-        total_load_cycles=('Load_Cycles', 'sum'),
-        total_fuel_used=('Fuel_Used', 'sum'),
-        total_idling_time_min=('Idling_Time', 'sum'),
-        total_safety_alerts=('Safety_Alert_Triggered', lambda x: (x == 'Yes').sum())
-    ).reset_index()
-
-    # Join total hours back to profiles
-    operator_profiles = operator_profiles.merge(total_hours.rename('total_engine_hours'), on='Operator_ID')
-
-    # Create meaningful, comparable metrics (the "DNA" of the operator)
-    operator_profiles['fuel_per_load_cycle'] = (operator_profiles['total_fuel_used'] / operator_profiles['total_load_cycles']).replace([np.inf, -np.inf], 0)
-    operator_profiles['idling_ratio'] = (operator_profiles['total_idling_time_min'] / 60 / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    operator_profiles['safety_incident_rate'] = (operator_profiles['total_safety_alerts'] / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    
-    # Select only the engineered features for clustering
-    features_for_clustering = [
-        'fuel_per_load_cycle',
-        'idling_ratio',
-        'safety_incident_rate'
-    ]
-    X = operator_profiles[features_for_clustering].fillna(0)
+    # Totals, engine hours and the per-operator ratios come from the shared
+    # feature pipeline, so training, evaluation and the servers stay in step.
+    X = clustering_matrix(operator_profiles)
 
     print("   - Operator profiles created successfully.")
     print(X.head())
@@ -1,4 +1,3 @@
-import pandas as pd
 import numpy as np
 from sklearn.model_selection import train_test_split
 from sklearn.ensemble import RandomForestRegressor
@@ -8,6 +7,10 @@ from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
 import joblib
 import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from feature_pipeline import FeaturePipeline, TASK_DURATION_CATEGORICAL
 
 def train_final_time_model(data_path='fin_synthetic_machine_data.csv'):
     """
@@ -16,42 +19,19 @@ def train_final_time_model(data_path='fin_synthetic_machine_data.csv'):
     """
     print(f"1. Loading final data from '{data_path}'...")
     try:
-        df = pd.read_csv(data_path)
+        # --- Feature Engineering ---
+        # The target formula and feature list live in feature_pipeline.py, shared with
+        # the evaluation script and the servers. Cached per dataset fingerprint.
+        print("2. Engineering the 'Task_Duration_Hours' target variable...")
+        X, y = FeaturePipeline(data_path).task_duration()
     except FileNotFoundError:
         print(f"Error: The file '{data_path}' was not found.")
         print("Please make sure you have generated the final dataset first.")
         return
 
-    # --- Feature Engineering ---
-    # This calculation MUST exactly match the logic from your final data generation script.
-    print("2. Engineering the 'Task_Duration_Hours' target variable...")
-    terrain_multipliers = df['Terrain'].map({'Flat': 1.0, 'Incline': 1.15, 'Steep': 1.30})
-    df['Task_Duration_Hours'] = ((df['Idling_Time'] / 60) + (df['Load_Cycles'] * 0.1)) * terrain_multipliers
-    df = df.dropna()
-
-    # 3. Define features (X) and target (y)
-    target = 'Task_Duration_Hours'
-
-    # The final feature set now includes 'RPM' for more accuracy
-    features = [
-        'Machine_ID',
-        'Operator_ID',
-        'RPM',  # NEW: Added the crucial RPM feature
-        'Task_Type',
-        'Soil_Type',
-        'Terrain',
-        'Load_Cycles',
-        'Temperature_C',
-        'Precipitation_mm'
-        # 'Operator_Experience_Years' is removed as its effect is now captured by Operator_ID personas
-    ]
-    
-    X = df[features]
-    y = df[target]
-    
     print("3. Preprocessing data (including new 'RPM' feature)...")
     # Define which features are categorical and need encoding
-    categorical_features = ['Machine_ID', 'Operator_ID', 'Task_Type', 'Soil_Type', 'Terrain']
+    categorical_features = TASK_DURATION_CATEGORICAL
     
     preprocessor = ColumnTransformer(
         transformers=[
@@ -1,11 +1,14 @@
 import flask
-from flask import request, jsonify
-import joblib
-import pandas as pd
+from flask import Response, request, jsonify, stream_with_context
 import numpy as np
 import traceback
+import json
 import os
 
+import insight_rules
+from feature_pipeline import HEALTH_FEATURES, health_input
+from model_registry import registry
+
 # -------------------------------------------------------------------
 # Initialization
 # -------------------------------------------------------------------
@@ -18,68 +21,74 @@ app = flask.Flask(__name__)
 # Get the absolute path of the directory where this script is located.
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Define the path to your trained machine health model.
-MODEL_PATH = os.path.join(SCRIPT_DIR, 'fin_machine_health_model.joblib')
+# Path to your trained machine health model (resolved by the model registry).
+MODEL_PATH = registry.path('machine_health')
 
-# Define the exact feature columns the model was trained on, in the correct order.
-MODEL_FEATURES = [
-    'RPM',
-    'Engine_Hours',
-    'Fuel_Used',
-    'Load_Cycles',
-    'Idling_Time',
-    'Temperature_C',
-    'Precipitation_mm'
-]
+# The exact feature columns the model was trained on, in the correct order.
+# Defined once in feature_pipeline.py and shared with the training script.
+MODEL_FEATURES = HEALTH_FEATURES
 
 # Define the threshold for classifying a data point as an anomaly.
 # This value is taken from your evaluation script.
 ANOMALY_THRESHOLD = -0.04
 
+# Readings per decision_function call in the batch endpoint; bounds the memory
+# one request can take however many readings it sends.
+BATCH_CHUNK_SIZE = int(os.getenv("HEALTH_BATCH_CHUNK_SIZE", "4096"))
+
 # --- Load Model ---
-model = None
-try:
-    print(f"Loading model from: {MODEL_PATH}")
-    if os.path.exists(MODEL_PATH):
-        model = joblib.load(MODEL_PATH)
-        print("Machine health model loaded successfully.")
-    else:
-        print(f"Error: Model file not found at the specified path.")
+# The model comes from the shared registry: loaded on first use rather than
+# at import, and memory-mapped so services and workers running side by side
+# share its arrays through the page cache.
+def get_model():
+    """The machine health model, or None if it could not be loaded."""
+    try:
+        return registry.get('machine_health')
+    except FileNotFoundError:
+        print(f"Error: Model file not found at the specified path: {MODEL_PATH}")
         print("Please ensure 'fin_machine_health_model.joblib' is in the same directory as this script.")
+    except Exception as e:
+        print(f"An error occurred while loading the model: {e}")
+        traceback.print_exc()
+    return None
 
-except Exception as e:
-    print(f"An error occurred while loading the model: {e}")
-    traceback.print_exc()
+registry.preload_if_requested(['machine_health'])
 
 # -------------------------------------------------------------------
 # Actionable Insights Logic (from your evaluation script)
 # -------------------------------------------------------------------
 
+NORMAL_INSIGHT = "All systems operating within normal parameters."
+
+# This API's insights are read by whoever advises the operator ("Advise operator to ...").
+INSIGHT_AUDIENCE = 'supervisor'
+
 def get_actionable_insight(data_row):
     """
     Analyzes a single anomalous data row and returns a specific,
     actionable insight for the operator. This is the "recommendation engine".
+    The rules themselves live in insight_rules.py, shared with fin_app.
     
     Args:
-        data_row (pd.Series): A pandas Series containing the feature values for the anomaly.
+        data_row (dict or pd.Series): The feature values for the anomaly.
     
     Returns:
         str: A string containing the actionable insight.
     """
-    # Rule 1: High fuel consumption while idling
-    if data_row['Fuel_Used'] > 15 and data_row['RPM'] < 900:
-        return "High fuel use at low RPM detected. Advise operator to check for potential fluid leaks."
+    return insight_rules.get_actionable_insight(data_row, INSIGHT_AUDIENCE)
 
-    # Rule 2: Overheating under light load
-    if data_row['Temperature_C'] > 140 and data_row['Load_Cycles'] < 5:
-        return "Engine overheating under light load. Advise operator to check radiator for debris blockage."
-        
-    # Rule 3: High RPM with no work being done (inefficient operation)
-    if data_row['RPM'] > 2000 and data_row['Load_Cycles'] == 0:
-        return "High engine speed with no load. Advise operator to avoid excessive throttle when not actively working to save fuel."
-
-    # Default catch-all message if no specific rule matches
-    return "General machine health anomaly detected. Recommend a standard systems check."
+def score_readings(model, readings):
+    """
+    Scores a list of readings with one decision_function call and applies the
+    insight rules to all of them. Returns (scores, statuses, insight codes,
+    insights) arrays; normal readings have no insight code.
+    """
+    input_df = health_input(readings)
+    scores = model.decision_function(input_df)
+    anomalous = scores < ANOMALY_THRESHOLD
+    codes, messages = insight_rules.evaluate_insights(input_df, INSIGHT_AUDIENCE)
+    statuses = np.where(anomalous, "ANOMALY", "Normal")
+    return scores, statuses, np.where(anomalous, codes, None), np.where(anomalous, messages, NORMAL_INSIGHT)
 
 # -------------------------------------------------------------------
 # API Endpoints
@@ -96,6 +105,7 @@ def predict_machine_health():
     Endpoint to predict machine health status and provide actionable insights.
     Accepts a JSON payload with live sensor data.
     """
+    model = get_model()
     if model is None:
         return jsonify({
             "error": "Model is not loaded. The server could not start correctly. Please check server logs."
@@ -115,22 +125,21 @@ def predict_machine_health():
 
     try:
         # --- Data Preparation ---
-        input_data = {key: [json_data[key]] for key in MODEL_FEATURES}
-        input_df = pd.DataFrame.from_dict(input_data)
+        input_df = health_input([json_data])
         print(f"Received data for health check:\n{input_df.to_string()}")
 
         # --- Prediction & Analysis ---
         # Get the raw anomaly score from the Isolation Forest model.
         score = model.decision_function(input_df)[0]
         status = "Normal"
-        insight = "All systems operating within normal parameters."
+        insight = NORMAL_INSIGHT
 
         # Check if the score is below our defined threshold.
         if score < ANOMALY_THRESHOLD:
             status = "ANOMALY"
             # If it's an anomaly, get the specific actionable insight.
-            # We pass the first (and only) row of the DataFrame to the function.
-            insight = get_actionable_insight(input_df.iloc[0])
+            # The rules read the posted reading directly; no row Series is built.
+            insight = get_actionable_insight(json_data)
 
         # --- Response ---
         response = {
@@ -149,6 +158,105 @@ def predict_machine_health():
             "message": str(e)
         }), 500
 
+def _iter_lines(stream, block_size=1 << 16):
+    """Lines of a request body, read in blocks (werkzeug's per-line readline is slow)."""
+    pending = b""
+    for block in iter(lambda: stream.read(block_size), b""):
+        lines = (pending + block).split(b"\n")
+        pending = lines.pop()
+        yield from lines
+    if pending:
+        yield pending
+
+def _ndjson_readings(stream):
+    """(reading_id, reading, error) per line of an NDJSON body, read as it arrives."""
+    for position, line in enumerate(_iter_lines(stream)):
+        if not line.strip():
+            continue
+        try:
+            reading = json.loads(line)
+        except ValueError as e:
+            yield position, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(reading, dict):
+            yield position, None, "Expected a JSON object."
+            continue
+        yield reading.get('reading_id', position), reading, None
+
+def _result_lines(model, chunk):
+    """NDJSON result lines, in order, for a chunk of (reading_id, reading, error) triples."""
+    valid = [reading for _, reading, error in chunk if error is None]
+    try:
+        scored = iter(zip(*score_readings(model, valid))) if valid else iter(())
+    except (ValueError, TypeError) as e:
+        # A malformed value fails the whole chunk; rescore one by one to find it.
+        if len(valid) > 1:
+            for item in chunk:
+                yield from _result_lines(model, [item])
+            return
+        chunk = [(reading_id, reading, error or str(e)) for reading_id, reading, error in chunk]
+    for reading_id, _, error in chunk:
+        if error is not None:
+            yield json.dumps({"reading_id": reading_id, "error": error}) + "\n"
+            continue
+        score, status, code, insight = next(scored)
+        yield json.dumps({
+            "reading_id": reading_id,
+            "status": str(status),
+            "anomaly_score": round(float(score), 4),
+            "insight_code": code,
+            "actionable_insight": str(insight),
+        }) + "\n"
+
+def _score_stream(model, readings):
+    """Scores (reading_id, reading, error) triples BATCH_CHUNK_SIZE at a time, yielding NDJSON lines."""
+    chunk = []
+    for reading_id, reading, error in readings:
+        if error is None:
+            missing_keys = [key for key in MODEL_FEATURES if key not in reading]
+            if missing_keys:
+                error = f"Missing required features: {missing_keys}"
+        chunk.append((reading_id, reading, error))
+        if len(chunk) >= BATCH_CHUNK_SIZE:
+            yield from _result_lines(model, chunk)
+            chunk = []
+    if chunk:
+        yield from _result_lines(model, chunk)
+
+@app.route("/predict/machine_health/batch", methods=['POST'])
+def predict_machine_health_batch():
+    """
+    Endpoint to score many sensor readings in one call, e.g. a fleet-wide
+    health sweep or a day of replayed telemetry.
+    Accepts a JSON list of readings (or {"readings": [...]}), or NDJSON with
+    one reading per line (Content-Type: application/x-ndjson), which is read
+    as it streams in. Each reading may carry a "reading_id"; otherwise its
+    position is used. Readings are scored BATCH_CHUNK_SIZE at a time, each
+    chunk in one IsolationForest call with the insight rules applied to the
+    whole chunk, and results stream back as NDJSON, one line per reading in
+    input order. A reading that cannot be scored gets an "error" line.
+    """
+    model = get_model()
+    if model is None:
+        return jsonify({
+            "error": "Model is not loaded. The server could not start correctly. Please check server logs."
+        }), 500
+
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        readings = _ndjson_readings(request.stream)
+    else:
+        json_data = request.get_json(silent=True)
+        items = json_data.get('readings') if isinstance(json_data, dict) else json_data
+        if not items or not isinstance(items, list):
+            return jsonify({"error": "No input data provided. Please POST a list of readings or NDJSON."}), 400
+        readings = (
+            (item.get('reading_id', position), item, None) if isinstance(item, dict)
+            else (position, None, "Expected a JSON object.")
+            for position, item in enumerate(items)
+        )
+
+    return Response(stream_with_context(_score_stream(model, readings)), mimetype='application/x-ndjson')
+
 # -------------------------------------------------------------------
 # Main execution block
 # -------------------------------------------------------------------
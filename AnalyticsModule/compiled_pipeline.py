@@ -0,0 +1,205 @@
+import threading
+
+import numpy as np
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.preprocessing import FunctionTransformer, OneHotEncoder
+
+from model_registry import file_sha1
+
+# --- Compiled Fast-Path Inference ---
+# A fitted `ColumnTransformer(OneHotEncoder) -> RandomForestRegressor` pipeline
+# spends nearly all of a single-row predict in pandas and scikit-learn dispatch,
+# not in the trees. Compiling it keeps only what prediction needs: a
+# category -> column map per one-hot feature, and the nodes of every tree
+# concatenated into flat NumPy arrays. Rows are then encoded straight from
+# dicts and all trees are walked together, one vectorized step per tree level.
+#
+# Traversal follows scikit-learn exactly: inputs are cast to float32 as the
+# forest does, `x <= threshold` goes left, NaN follows the node's
+# missing_go_to_left, and unknown categories encode as all zeros
+# (handle_unknown='ignore'). Predictions match `pipeline.predict` up to the
+# summation order of the tree average.
+
+
+class CompiledForestPipeline:
+    """
+    Pure-NumPy predictor compiled from a one-hot + random forest pipeline.
+    `predict` takes a list of records or a dict of columns, like
+    feature_pipeline.task_duration_input; `predict_one` takes one record.
+    """
+
+    def __init__(self, features, categorical, numeric, n_columns,
+                 left, right, feature, threshold, missing_left, value, roots, depth, source_sha1=None):
+        self.features = list(features)
+        self.categorical = categorical  # [(feature, {category: column}), ...]
+        self.numeric = numeric  # [(feature, column), ...]
+        self.n_columns = n_columns
+        self.left, self.right = left, right
+        self.feature, self.threshold = feature, threshold
+        self.missing_left, self.value = missing_left, value
+        self.roots = roots
+        self.depth = depth
+        self.source_sha1 = source_sha1  # content hash of the model file this was compiled from
+
+    def __setstate__(self, state):
+        # Registry loads map the arrays from disk; plain ndarray views keep the
+        # memory-mapped pages but skip np.memmap's per-operation wrapping.
+        self.__dict__.update({k: (np.asarray(v) if isinstance(v, np.ndarray) else v) for k, v in state.items()})
+
+    @property
+    def n_trees(self):
+        return len(self.roots)
+
+    # --- Encoding ---
+    def encode(self, data):
+        """The float32 matrix the forest sees: one-hot columns first, then the numeric features."""
+        if isinstance(data, dict):
+            columns = data
+            n = len(data[self.features[0]])
+        else:
+            columns = {name: [row[name] for row in data] for name in self.features}
+            n = len(data)
+        X = np.zeros((n, self.n_columns), dtype=np.float32)
+        rows = np.arange(n)
+        for name, mapping in self.categorical:
+            index = np.fromiter((mapping.get(str(v), -1) for v in columns[name]), dtype=np.intp, count=n)
+            known = index >= 0
+            X[rows[known], index[known]] = 1.0
+        for name, column in self.numeric:
+            X[:, column] = np.asarray(columns[name], dtype=np.float64)
+        return X
+
+    # --- Prediction ---
+    def predict_matrix(self, X, chunk_size=4096):
+        """Forest average for an already encoded matrix."""
+        out = np.empty(len(X), dtype=np.float64)
+        for start in range(0, len(X), chunk_size):
+            chunk = X[start:start + chunk_size]
+            flat = chunk.ravel()
+            has_nan = np.isnan(flat).any()
+            # One row of `node` per input row, one column per tree; `base` turns
+            # a feature index into a position in the flattened chunk.
+            node = np.repeat(self.roots[None, :], len(chunk), axis=0)
+            base = (np.arange(len(chunk)) * self.n_columns)[:, None]
+            for _ in range(self.depth):
+                x = flat[base + self.feature[node]]
+                go_left = x <= self.threshold[node]
+                if has_nan:
+                    go_left = np.where(np.isnan(x), self.missing_left[node], go_left)
+                node = np.where(go_left, self.left[node], self.right[node])
+            out[start:start + chunk_size] = self.value[node].mean(axis=1)
+        return out
+
+    def predict(self, data):
+        return self.predict_matrix(self.encode(data))
+
+    def predict_one(self, record):
+        return float(self.predict([record])[0])
+
+
+def compile_pipeline(pipeline, source_sha1=None):
+    """
+    Compiles a fitted Pipeline(ColumnTransformer, RandomForestRegressor).
+    Raises ValueError for any other shape of pipeline.
+    """
+    preprocessor, regressor = (step for _, step in pipeline.steps)
+    if not isinstance(preprocessor, ColumnTransformer) or not isinstance(regressor, RandomForestRegressor):
+        raise ValueError("Expected a ColumnTransformer followed by a RandomForestRegressor.")
+    if regressor.n_outputs_ != 1:
+        raise ValueError("Only single-output forests can be compiled.")
+
+    features = list(preprocessor.feature_names_in_)
+    categorical, numeric, column = [], [], 0
+    for name, transformer, columns in preprocessor.transformers_:
+        columns = [features[c] if isinstance(c, (int, np.integer)) else c for c in columns]
+        if transformer == 'drop' or not columns:
+            continue
+        if isinstance(transformer, OneHotEncoder):
+            if transformer.drop_idx_ is not None or getattr(transformer, 'infrequent_categories_', None):
+                raise ValueError(f"OneHotEncoder '{name}' drops or groups categories; not supported.")
+            for feature, categories in zip(columns, transformer.categories_):
+                categorical.append((feature, {str(c): column + i for i, c in enumerate(categories)}))
+                column += len(categories)
+        elif transformer == 'passthrough' or (isinstance(transformer, FunctionTransformer) and transformer.func is None):
+            for feature in columns:
+                numeric.append((feature, column))
+                column += 1
+        else:
+            raise ValueError(f"Transformer '{name}' ({type(transformer).__name__}) cannot be compiled.")
+    if column != regressor.n_features_in_:
+        raise ValueError(f"Preprocessor yields {column} columns but the forest expects {regressor.n_features_in_}.")
+
+    # Every tree's nodes in one set of arrays; child indices are offset to match.
+    # Leaves point at themselves, so a fixed number of steps (the deepest tree)
+    # walks every row of every tree to its leaf. Index arrays are intp so
+    # fancy indexing uses them without a conversion on every step.
+    parts = {k: [] for k in ('left', 'right', 'feature', 'threshold', 'missing_left', 'value')}
+    roots, offset = [], 0
+    for estimator in regressor.estimators_:
+        tree = estimator.tree_
+        ids = np.arange(tree.node_count)
+        leaf = tree.children_left == -1
+        parts['left'].append(np.where(leaf, ids, tree.children_left) + offset)
+        parts['right'].append(np.where(leaf, ids, tree.children_right) + offset)
+        parts['feature'].append(np.where(leaf, 0, tree.feature))
+        parts['threshold'].append(np.where(leaf, 0.0, tree.threshold))
+        missing = tree.missing_go_to_left if hasattr(tree, 'missing_go_to_left') else np.zeros(tree.node_count)
+        parts['missing_left'].append(missing.astype(bool))
+        parts['value'].append(tree.value[:, 0, 0])
+        roots.append(offset)
+        offset += tree.node_count
+    return CompiledForestPipeline(
+        features=features, categorical=categorical, numeric=numeric, n_columns=column,
+        left=np.concatenate(parts['left']).astype(np.intp),
+        right=np.concatenate(parts['right']).astype(np.intp),
+        feature=np.concatenate(parts['feature']).astype(np.intp),
+        threshold=np.concatenate(parts['threshold']).astype(np.float64),
+        missing_left=np.concatenate(parts['missing_left']),
+        value=np.concatenate(parts['value']).astype(np.float64),
+        roots=np.array(roots, dtype=np.intp),
+        depth=max(estimator.tree_.max_depth for estimator in regressor.estimators_),
+        source_sha1=source_sha1,
+    )
+
+
+def verify(compiled, pipeline, columns, frame, atol=1e-9):
+    """
+    Predicts `columns` (dict of columns) with the compiled model and the
+    equivalent DataFrame `frame` with the pipeline; returns the largest
+    absolute difference. Raises ValueError if it exceeds `atol`.
+    """
+    expected = pipeline.predict(frame)
+    actual = compiled.predict(columns)
+    max_diff = float(np.max(np.abs(expected - actual))) if len(expected) else 0.0
+    if not max_diff <= atol:
+        raise ValueError(f"Compiled predictions differ from the pipeline by up to {max_diff:.3g} (> {atol:g}).")
+    return max_diff
+
+
+# --- Serving ---
+_fast_paths = {}  # (registry id, name) -> compiled model or None, checked once per process
+_fast_paths_lock = threading.Lock()
+
+
+def fast_path(registry, name='task_duration_compiled', source='task_duration'):
+    """
+    The compiled predictor `name` from `registry`, or None when it has not been
+    exported or was compiled from a different version of the `source` model
+    file (servers then fall back to the pipeline itself).
+    """
+    key = (id(registry), name)
+    if key in _fast_paths:
+        return _fast_paths[key]
+    with _fast_paths_lock:
+        if key not in _fast_paths:
+            try:
+                compiled = registry.get(name)
+            except FileNotFoundError:
+                compiled = None
+            if compiled is not None and compiled.source_sha1 != file_sha1(registry.path(source)):
+                print(f"Ignoring {registry.files[name]}: it was compiled from a different "
+                      f"{registry.files[source]}. Re-run MiscScripts/fin_compileTimeEst.py.")
+                compiled = None
+            _fast_paths[key] = compiled
+    return _fast_paths[key]
@@ -0,0 +1,302 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: only threads of one process are coordinated
+    fcntl = None
+
+import numpy as np
+import pandas as pd
+
+# --- Columnar Dataset Snapshot ---
+# A binary copy of a shift-record CSV: one .npy file per column, with string
+# columns stored as categorical codes plus their labels. Loading memory-maps
+# the column files instead of parsing text, so server start-up no longer scales
+# with CSV parsing.
+#
+# The snapshot remembers the CSV's size and mtime, plus a sampled digest of
+# its contents (see prefix_digest). An unchanged file is detected from the
+# stat alone. A file that only had rows appended (what /api/shift_records
+# does) gets the new rows added as an extra part, at a cost that depends on
+# the new rows only. Any other change rebuilds the snapshot from scratch.
+#
+#     <snapshot_dir>/meta.json
+#     <snapshot_dir>/part-00000/<column>.npy
+#     <snapshot_dir>/part-00001/<column>.npy   (rows appended later)
+#     <snapshot_dir>.lock
+#
+# Several processes (gunicorn workers, the services sharing feature_cache) can
+# use one snapshot. Updates hold an exclusive flock on the .lock file and
+# reads a shared one while they open the column files; a rebuild is written
+# to a temporary directory and swapped in whole.
+
+SNAPSHOT_VERSION = 2
+DATETIME_COLUMNS = ['Timestamp']
+PREFIX_SAMPLE_BYTES = 1 << 16
+
+
+def prefix_digest(path, size, sample=PREFIX_SAMPLE_BYTES):
+    """
+    Digest of the first `size` bytes of a file, from its length and its first
+    and last `sample` bytes, so checking that a growing file was only appended
+    to costs the same whatever its size. Edits elsewhere that keep the length
+    are not seen. None if the file is now shorter than `size`.
+    """
+    digest = hashlib.sha1(str(size).encode())
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size < size:
+            return None
+        head = f.read(min(size, sample))
+        tail_start = max(size - sample, len(head))
+        f.seek(tail_start)
+        digest.update(head)
+        digest.update(f.read(size - tail_start))
+    return digest.hexdigest()
+
+
+def _stat_key(csv_path):
+    st = os.stat(csv_path)
+    return st.st_size, st.st_mtime_ns
+
+
+@contextmanager
+def file_lock(lock_path, shared=False):
+    """flock on `lock_path` (created if needed), held for the duration of the block."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(lock_path) or '.', exist_ok=True)
+    with open(lock_path, 'a+b') as f:
+        fcntl.flock(f, fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def _column_kind(series):
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        return 'category'
+    if pd.api.types.is_datetime64_any_dtype(series.dtype):
+        return 'datetime'
+    return 'numeric'
+
+
+class DatasetSnapshot:
+    """Memory-mapped columnar snapshot of one CSV file, kept in `snapshot_dir`."""
+
+    def __init__(self, csv_path, snapshot_dir, dtypes=None):
+        self.csv_path = csv_path
+        self.snapshot_dir = snapshot_dir
+        self.dtypes = dtypes or {}
+        self.lock_path = snapshot_dir.rstrip(os.sep) + '.lock'
+        self._lock = threading.Lock()
+        self._meta = None
+
+    def _file_lock(self, shared=False):
+        """Coordinates processes sharing the snapshot: exclusive for updates, shared for reads."""
+        return file_lock(self.lock_path, shared)
+
+    # --- Freshness ---
+    def _read_meta(self):
+        try:
+            with open(os.path.join(self.snapshot_dir, 'meta.json'), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta if meta.get('version') == SNAPSHOT_VERSION else None
+
+    def _write_meta(self, meta, directory=None):
+        directory = directory or self.snapshot_dir
+        tmp_path = os.path.join(directory, 'meta.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, os.path.join(directory, 'meta.json'))
+
+    @staticmethod
+    def _is_current(meta, size, mtime_ns):
+        return meta is not None and meta['csv_size'] == size and meta['csv_mtime_ns'] == mtime_ns
+
+    def refresh(self):
+        """
+        Brings the snapshot in line with the CSV. Returns 'fresh', 'touched'
+        (same content, new mtime), 'appended' or 'rebuilt'.
+        """
+        with self._lock:
+            size, mtime_ns = _stat_key(self.csv_path)
+            if self._is_current(self._meta, size, mtime_ns):
+                return 'fresh'
+            with self._file_lock():
+                # Another process may have caught up already.
+                meta = self._read_meta()
+                if self._is_current(meta, size, mtime_ns):
+                    self._meta = meta
+                    return 'fresh'
+                if meta is not None and size >= meta['csv_size']:
+                    status = self._extend(meta, size, mtime_ns)
+                    if status is not None:
+                        return status
+                self._meta = self._rebuild()
+                return 'rebuilt'
+
+    def _extend(self, meta, size, mtime_ns):
+        """Handles a CSV whose old contents are unchanged; returns None if they were not."""
+        old_size = meta['csv_size']
+        if prefix_digest(self.csv_path, old_size) != meta['prefix']:
+            return None
+        # Only new bytes at the end: parse just those, up to the last complete row.
+        with open(self.csv_path, 'rb') as f:
+            f.seek(old_size)
+            tail = f.read(size - old_size)
+        tail = tail[:tail.rfind(b'\n') + 1]
+        if len(tail) < size - old_size:
+            mtime_ns = None  # a row is still being written; look again next time
+        status = 'touched'
+        if tail.strip():
+            frame = self._parse(io.BytesIO(tail), header=list(meta['columns']))
+            if any(_column_kind(frame[c]) != kind for c, kind in meta['columns'].items()):
+                # e.g. a numeric column that now contains text; only a full rebuild gets its type right.
+                return None
+            meta['parts'].append(self._write_part(frame, f"part-{len(meta['parts']):05d}"))
+            status = 'appended'
+        new_size = old_size + len(tail)
+        meta.update(csv_size=new_size, csv_mtime_ns=mtime_ns, prefix=prefix_digest(self.csv_path, new_size),
+                    sha1=hashlib.sha1((meta['sha1'] + ':').encode() + tail).hexdigest())
+        self._write_meta(meta)
+        self._meta = meta
+        return status
+
+    @property
+    def csv_size(self):
+        """Bytes of the CSV the snapshot covers, as of the last refresh or load."""
+        if self._meta is None:
+            self.refresh()
+        return self._meta['csv_size']
+
+    @property
+    def fingerprint(self):
+        """
+        Identifies the CSV contents the snapshot holds: the sha1 of the file at
+        the last rebuild, chained with the bytes of every append since.
+        """
+        if self._meta is None:
+            self.refresh()
+        return self._meta['sha1']
+
+    # --- Writes ---
+    def _parse(self, source, header=None):
+        """Parses CSV text; `header` gives the column names when the text has no header row."""
+        names = header if header is not None else pd.read_csv(source, nrows=0).columns.tolist()
+        if hasattr(source, 'seek'):
+            source.seek(0)
+        frame = pd.read_csv(source, header=None if header is not None else 0, names=names,
+                            dtype={c: t for c, t in self.dtypes.items() if c in names},
+                            parse_dates=[c for c in DATETIME_COLUMNS if c in names])
+        # Any other text column is stored as a categorical as well.
+        for c in frame.columns:
+            if pd.api.types.is_object_dtype(frame[c].dtype) or pd.api.types.is_string_dtype(frame[c].dtype):
+                frame[c] = frame[c].astype('category')
+        return frame
+
+    def _write_part(self, frame, name, directory=None):
+        part_dir = os.path.join(directory or self.snapshot_dir, name)
+        tmp_dir = part_dir + '.tmp'
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        categories = {}
+        for c in frame.columns:
+            column = frame[c]
+            kind = _column_kind(column)
+            if kind == 'category':
+                values = column.cat.codes.to_numpy()
+                categories[c] = column.cat.categories.astype(str).tolist()
+            elif kind == 'datetime':
+                values = column.to_numpy(dtype='datetime64[ns]')
+            else:
+                values = column.to_numpy()
+            np.save(os.path.join(tmp_dir, f"{c}.npy"), values)
+        os.replace(tmp_dir, part_dir)
+        return {'name': name, 'rows': len(frame), 'categories': categories}
+
+    def _rebuild(self):
+        with open(self.csv_path, 'rb') as f:
+            content = f.read()
+            st = os.fstat(f.fileno())
+        frame = self._parse(io.BytesIO(content))
+        tmp_dir = f"{self.snapshot_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+        meta = {
+            'version': SNAPSHOT_VERSION, 'csv_size': len(content),
+            'csv_mtime_ns': st.st_mtime_ns if st.st_size == len(content) else None,
+            'prefix': prefix_digest(self.csv_path, len(content)), 'sha1': hashlib.sha1(content).hexdigest(),
+            'columns': {c: _column_kind(frame[c]) for c in frame.columns},
+            'parts': [self._write_part(frame, 'part-00000', tmp_dir)],
+        }
+        self._write_meta(meta, tmp_dir)
+        # Swap the whole directory in; readers hold the shared lock while opening files,
+        # and files they already mapped stay valid after the old directory is removed.
+        old_dir = f"{self.snapshot_dir}.old-{os.getpid()}"
+        if os.path.isdir(self.snapshot_dir):
+            os.replace(self.snapshot_dir, old_dir)
+        os.replace(tmp_dir, self.snapshot_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+        return meta
+
+    # --- Reads ---
+    def load(self, columns=None, start=0):
+        """
+        The dataset as a DataFrame (rows `start` onwards, optionally only
+        `columns`), refreshing the snapshot first if the CSV changed.
+        Numeric columns of a single-part snapshot are memory-mapped, read-only views.
+        """
+        self.refresh()
+        with self._file_lock(shared=True):
+            # Whatever another process last wrote; it can only be newer than ours.
+            meta = self._meta = self._read_meta() or self._meta
+            return self._load(meta, columns, start)
+
+    def _load(self, meta, columns, start):
+        columns = columns or list(meta['columns'])
+        pieces, offset = [], 0
+        for part in meta['parts']:
+            part_start, offset = offset, offset + part['rows']
+            if offset <= start:
+                continue
+            part_dir = os.path.join(self.snapshot_dir, part['name'])
+            skip = max(0, start - part_start)
+            data = {}
+            for c in columns:
+                values = np.load(os.path.join(part_dir, f"{c}.npy"), mmap_mode='r')[skip:]
+                if meta['columns'][c] == 'category':
+                    values = pd.Categorical.from_codes(values, categories=part['categories'][c])
+                data[c] = values
+            pieces.append(pd.DataFrame(data, copy=False))
+        if not pieces:
+            return self._empty(meta, columns)
+        if len(pieces) == 1:
+            return pieces[0]
+        # Parts can carry different category sets; unify them so the columns stay categorical.
+        for c in columns:
+            if meta['columns'][c] == 'category':
+                union = pd.api.types.union_categoricals([p[c] for p in pieces]).categories
+                for p in pieces:
+                    p[c] = p[c].cat.set_categories(union)
+        return pd.concat(pieces, ignore_index=True)
+
+    def _empty(self, meta, columns):
+        empty = {}
+        for c in columns:
+            kind = meta['columns'][c]
+            if kind == 'category':
+                empty[c] = pd.Categorical([])
+            else:
+                first = os.path.join(self.snapshot_dir, meta['parts'][0]['name'], f"{c}.npy")
+                empty[c] = np.load(first, mmap_mode='r')[:0]
+        return pd.DataFrame(empty)
@@ -1,11 +1,13 @@
 import flask
 from flask import request, jsonify
-import joblib
-import pandas as pd
-import numpy as np
 import traceback
 import os
 
+from compiled_pipeline import fast_path
+from feature_pipeline import TASK_DURATION_FEATURES, task_duration_input
+from micro_batcher import MicroBatcher
+from model_registry import registry
+
 # -------------------------------------------------------------------
 # Initialization
 # -------------------------------------------------------------------
@@ -19,41 +21,52 @@ app = flask.Flask(__name__)
 # This makes the script more robust and independent of the current working directory.
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Define the path to your trained model, joining the script's directory with the model filename.
-# This ensures the model is found as long as it's in the same directory as this API script.
-MODEL_PATH = os.path.join(SCRIPT_DIR, 'fin_task_duration_model.joblib')
-
-
-# Define the exact feature columns the model was trained on, in the correct order.
-# This is crucial for the model to make accurate predictions.
-MODEL_FEATURES = [
-    'Machine_ID',
-    'Operator_ID',
-    'RPM',
-    'Task_Type',
-    'Soil_Type',
-    'Terrain',
-    'Load_Cycles',
-    'Temperature_C',
-    'Precipitation_mm'
-]
+# Path to your trained model. The registry resolves it against this script's directory,
+# so the model is found as long as it's in the same directory as this API script.
+MODEL_PATH = registry.path('task_duration')
+
+
+# The exact feature columns the model was trained on, in the correct order.
+# Defined once in feature_pipeline.py and shared with the training script.
+MODEL_FEATURES = TASK_DURATION_FEATURES
 
 # --- Load Model ---
-# Load the trained model pipeline once when the server starts.
-# This is more efficient than loading it for every single request.
-model_pipeline = None
-try:
-    print(f"Loading model from: {MODEL_PATH}")
-    if os.path.exists(MODEL_PATH):
-        model_pipeline = joblib.load(MODEL_PATH)
-        print("Model loaded successfully.")
-    else:
-        print(f"Error: Model file not found at the specified path.")
+# The model comes from the shared registry: loaded on first use rather than
+# at import, and memory-mapped so services and workers running side by side
+# share its arrays through the page cache.
+def get_model():
+    """The task duration pipeline, or None if it could not be loaded."""
+    try:
+        return registry.get('task_duration')
+    except FileNotFoundError:
+        print(f"Error: Model file not found at the specified path: {MODEL_PATH}")
         print("Please ensure 'fin_task_duration_model.joblib' is in the same directory as this script.")
+    except Exception as e:
+        print(f"An error occurred while loading the model: {e}")
+        traceback.print_exc()
+    return None
+
+registry.preload_if_requested(['task_duration'])
 
-except Exception as e:
-    print(f"An error occurred while loading the model: {e}")
-    traceback.print_exc()
+# --- Micro-Batching ---
+# Concurrent single-task requests are stacked into one predict call; see
+# micro_batcher.py. PREDICT_BATCH_MAX_SIZE=1 turns batching off.
+PREDICT_BATCH_MAX_SIZE = int(os.getenv("PREDICT_BATCH_MAX_SIZE", "64"))
+PREDICT_BATCH_MAX_WAIT_MS = float(os.getenv("PREDICT_BATCH_MAX_WAIT_MS", "5"))
+
+# The compiled model walks all trees level by level in NumPy; past a few hundred
+# rows scikit-learn's own Cython traversal catches up, so big batches use the pipeline.
+FAST_PATH_MAX_ROWS = 512
+
+def predict_records(records):
+    # Pure-NumPy export of the pipeline when MiscScripts/fin_compileTimeEst.py has
+    # produced one for the current model file; otherwise the pipeline itself.
+    compiled = fast_path(registry)
+    if compiled is not None and len(records) <= FAST_PATH_MAX_ROWS:
+        return compiled.predict(records)
+    return get_model().predict(task_duration_input(records))
+
+batcher = MicroBatcher(predict_records, PREDICT_BATCH_MAX_SIZE, PREDICT_BATCH_MAX_WAIT_MS)
 
 
 # -------------------------------------------------------------------
@@ -72,6 +85,7 @@ def predict_task_duration():
     Accepts a JSON payload with the required features.
     """
     # Ensure the model was loaded correctly before proceeding
+    model_pipeline = get_model()
     if model_pipeline is None:
         return jsonify({
             "error": "Model is not loaded. The server could not start correctly. Please check server logs."
@@ -81,7 +95,7 @@ def predict_task_duration():
     json_data = request.get_json()
 
     # --- Input Validation ---
-    if not json_data:
+    if not json_data or not isinstance(json_data, dict):
         return jsonify({"error": "No input data provided. Please POST a JSON object."}), 400
 
     # Check if all required features are in the JSON data
@@ -93,21 +107,10 @@ def predict_task_duration():
         }), 400
 
     try:
-        # --- Data Preparation ---
-        # Convert the incoming JSON into a pandas DataFrame.
-        # The model's pipeline expects a DataFrame as input.
-        # We use a dictionary comprehension to ensure the order of columns matches MODEL_FEATURES.
-        input_data = {key: [json_data[key]] for key in MODEL_FEATURES}
-        input_df = pd.DataFrame.from_dict(input_data)
-
-        print(f"Received data for prediction:\n{input_df.to_string()}")
-
         # --- Prediction ---
-        # The .predict() method uses the entire pipeline (preprocessing + regressor)
-        prediction_array = model_pipeline.predict(input_df)
-
-        # The prediction is a numpy array, e.g., array([5.432]). We extract the single value.
-        predicted_duration_hours = float(prediction_array[0])
+        # The request joins whatever other tasks arrive within a few ms; the batch is
+        # predicted in a single call to predict_records (compiled model or pipeline).
+        predicted_duration_hours = float(batcher.predict_one(json_data))
 
         # --- Response ---
         # Create a success response payload
@@ -127,6 +130,75 @@ def predict_task_duration():
             "message": str(e)
         }), 500
 
+@app.route("/predict/task_duration/batch", methods=['POST'])
+def predict_task_duration_batch():
+    """
+    Endpoint to predict the duration of many tasks in one call.
+    Accepts {"tasks": [...]} (or a bare list) where each item has the model
+    features plus an optional "task_id". All rows are scored with a single
+    vectorized predict, and results are returned keyed by task_id (or by the
+    item's position in the list when no task_id is given).
+    """
+    model_pipeline = get_model()
+    if model_pipeline is None:
+        return jsonify({
+            "error": "Model is not loaded. The server could not start correctly. Please check server logs."
+        }), 500
+
+    json_data = request.get_json()
+    tasks = json_data.get('tasks') if isinstance(json_data, dict) else json_data
+
+    # --- Input Validation ---
+    if not tasks or not isinstance(tasks, list):
+        return jsonify({"error": "No input data provided. Please POST a list of task objects."}), 400
+
+    not_objects = [position for position, task in enumerate(tasks) if not isinstance(task, dict)]
+    if not_objects:
+        return jsonify({
+            "error": "Every task must be a JSON object.",
+            "invalid_positions": not_objects
+        }), 400
+
+    invalid = {}
+    for position, task in enumerate(tasks):
+        missing_keys = [key for key in MODEL_FEATURES if key not in task]
+        if missing_keys:
+            invalid[str(task.get('task_id', position))] = missing_keys
+    if invalid:
+        return jsonify({
+            "error": "Missing required features in JSON payload.",
+            "missing_keys": invalid
+        }), 400
+
+    try:
+        print(f"Received batch of {len(tasks)} tasks for prediction.")
+
+        # --- Prediction ---
+        # All rows in one call: the compiled model when available, else one typed
+        # DataFrame (MODEL_FEATURES order) through the pipeline.
+        prediction_array = predict_records(tasks)
+
+        # --- Response ---
+        keys = [str(task.get('task_id', position)) for position, task in enumerate(tasks)]
+        response = {
+            "success": True,
+            "count": len(keys),
+            "predictions": {key: round(float(hours), 4) for key, hours in zip(keys, prediction_array)}
+        }
+        return jsonify(response), 200
+
+    except Exception as e:
+        print(traceback.format_exc())
+        return jsonify({
+            "error": "An error occurred during prediction.",
+            "message": str(e)
+        }), 500
+
+@app.route("/predict/task_duration/metrics", methods=['GET'])
+def predict_task_duration_metrics():
+    """Micro-batcher throughput, batch sizes and request latency percentiles."""
+    return jsonify(batcher.metrics()), 200
+
 # -------------------------------------------------------------------
 # Main execution block
 # -------------------------------------------------------------------
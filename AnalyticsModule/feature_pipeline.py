@@ -0,0 +1,170 @@
+import os
+
+import pandas as pd
+
+from dataset_snapshot import DatasetSnapshot
+from model_registry import file_sha1
+from operator_features import build_operator_profiles, clustering_matrix
+
+# --- Shared Feature Pipeline ---
+# Every trainer, evaluation script and server builds its model inputs here, so
+# a formula only exists once. Datasets are read with a fixed column schema,
+# and derived feature tables are cached on disk under the dataset's content
+# fingerprint: retraining or evaluating against an unchanged CSV loads them
+# instead of recomputing, and any edit to the CSV produces a new key. The
+# dataset itself is read from a memory-mapped columnar snapshot of the CSV
+# (dataset_snapshot.py) rather than re-parsed each time.
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_CACHE_DIR = os.path.join(BASE_DIR, 'feature_cache')
+
+# Bump when a formula below changes so stale cached features are not reused.
+FEATURE_VERSION = 1
+
+# Column schema of the fin_* shift-record datasets. Measurements are float64 so
+# a missing value loads as NaN instead of failing the whole read.
+CATEGORICAL_COLUMNS = ['Machine_ID', 'Operator_ID', 'Seatbelt_Status', 'Safety_Alert_Triggered',
+                       'Task_Type', 'Soil_Type', 'Terrain']
+NUMERIC_COLUMNS = ['RPM', 'Engine_Hours', 'Fuel_Used', 'Load_Cycles', 'Idling_Time',
+                   'Temperature_C', 'Precipitation_mm']
+DATASET_DTYPES = {**{c: 'category' for c in CATEGORICAL_COLUMNS}, **{c: 'float64' for c in NUMERIC_COLUMNS}}
+
+# --- Task duration model ---
+TASK_DURATION_FEATURES = ['Machine_ID', 'Operator_ID', 'RPM', 'Task_Type', 'Soil_Type', 'Terrain',
+                          'Load_Cycles', 'Temperature_C', 'Precipitation_mm']
+TASK_DURATION_CATEGORICAL = ['Machine_ID', 'Operator_ID', 'Task_Type', 'Soil_Type', 'Terrain']
+TASK_DURATION_TARGET = 'Task_Duration_Hours'
+TERRAIN_MULTIPLIERS = {'Flat': 1.0, 'Incline': 1.15, 'Steep': 1.30}
+
+# --- Machine health model ---
+HEALTH_FEATURES = ['RPM', 'Engine_Hours', 'Fuel_Used', 'Load_Cycles', 'Idling_Time', 'Temperature_C', 'Precipitation_mm']
+
+
+def task_duration_hours(df):
+    """The Task_Duration_Hours target: idle hours plus 0.1 h per load cycle, scaled by terrain."""
+    terrain_multipliers = df['Terrain'].map(TERRAIN_MULTIPLIERS).astype(float)
+    return ((df['Idling_Time'] / 60) + (df['Load_Cycles'] * 0.1)) * terrain_multipliers
+
+
+def task_duration_table(df):
+    """Model features plus target, with incomplete rows (e.g. an unknown terrain) dropped."""
+    table = df[TASK_DURATION_FEATURES].assign(**{TASK_DURATION_TARGET: task_duration_hours(df)})
+    # Rows are judged on the whole record, as the original `df.dropna()` did.
+    return table[df.notna().all(axis=1) & table[TASK_DURATION_TARGET].notna()]
+
+
+def health_matrix(df):
+    return df[HEALTH_FEATURES].fillna(0)
+
+
+# --- Serving inputs ---
+def _input_frame(data, columns, categorical):
+    """
+    A typed model-input frame from a list of records or a dict of columns.
+    Categorical inputs are strings and everything else float64, matching the
+    training data whatever JSON types the client sent.
+    """
+    if isinstance(data, dict):
+        frame = pd.DataFrame({c: data[c] for c in columns})
+    else:
+        frame = pd.DataFrame({c: [row[c] for row in data] for c in columns})
+    return frame.astype({c: (str if c in categorical else 'float64') for c in columns})
+
+
+def task_duration_input(data):
+    return _input_frame(data, TASK_DURATION_FEATURES, TASK_DURATION_CATEGORICAL)
+
+
+def health_input(data):
+    return _input_frame(data, HEALTH_FEATURES, ())
+
+
+# --- Dataset loading and feature cache ---
+def load_dataset(csv_path):
+    """Reads a shift-record CSV with the fixed column schema."""
+    header = pd.read_csv(csv_path, nrows=0).columns
+    return pd.read_csv(csv_path, dtype={c: t for c, t in DATASET_DTYPES.items() if c in header})
+
+
+def dataset_snapshot(csv_path, cache_dir=DEFAULT_CACHE_DIR):
+    """The columnar snapshot of a dataset, kept in `cache_dir` next to its feature tables."""
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return DatasetSnapshot(csv_path, os.path.join(cache_dir, f"{stem}.snapshot"), DATASET_DTYPES)
+
+
+def dataset_fingerprint(csv_path, chunk_size=1 << 20):
+    """Content hash of a dataset file (sha1, hex)."""
+    return file_sha1(csv_path, chunk_size)
+
+
+class FeaturePipeline:
+    """
+    Feature tables for one dataset file. Each table is computed at most once
+    per dataset version: after the first build it is stored in `cache_dir` as
+    a pickle named after the dataset file, the table, FEATURE_VERSION and
+    the dataset fingerprint.
+    Pass cache_dir=None to disable the disk cache.
+    """
+
+    def __init__(self, data_path, cache_dir=DEFAULT_CACHE_DIR):
+        self.data_path = data_path
+        self.cache_dir = cache_dir
+        self._fingerprint = None
+        self._dataset = None
+        self.snapshot = dataset_snapshot(data_path, cache_dir) if cache_dir is not None else None
+        self.stats = {'hits': 0, 'misses': 0}
+
+    @property
+    def fingerprint(self):
+        if self._fingerprint is None:
+            if self.snapshot is not None:
+                # The snapshot keeps a fingerprint of what it holds; no extra pass over the CSV.
+                self.snapshot.refresh()
+                self._fingerprint = self.snapshot.fingerprint
+            else:
+                self._fingerprint = dataset_fingerprint(self.data_path)
+        return self._fingerprint
+
+    def dataset(self):
+        if self._dataset is None:
+            self._dataset = self.snapshot.load() if self.snapshot is not None else load_dataset(self.data_path)
+        return self._dataset
+
+    def _cache_prefix(self, name):
+        # Several datasets can share one cache directory, so entries carry the file's name too.
+        return f"{os.path.splitext(os.path.basename(self.data_path))[0]}.{name}-"
+
+    def _cached(self, name, build):
+        if self.cache_dir is None:
+            return build(self.dataset())
+        prefix = self._cache_prefix(name)
+        path = os.path.join(self.cache_dir, f"{prefix}v{FEATURE_VERSION}-{self.fingerprint[:16]}.pkl")
+        if os.path.exists(path):
+            self.stats['hits'] += 1
+            return pd.read_pickle(path)
+        self.stats['misses'] += 1
+        table = build(self.dataset())
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Drop entries for older versions of this dataset before writing the new one.
+        for stale in os.listdir(self.cache_dir):
+            if stale.startswith(prefix) and stale.endswith('.pkl'):
+                os.remove(os.path.join(self.cache_dir, stale))
+        tmp_path = path + '.tmp'
+        table.to_pickle(tmp_path)
+        os.replace(tmp_path, path)
+        return table
+
+    def task_duration(self):
+        """(X, y) for the task duration model."""
+        table = self._cached('task_duration', task_duration_table)
+        return table[TASK_DURATION_FEATURES], table[TASK_DURATION_TARGET]
+
+    def health(self):
+        return self._cached('health', health_matrix)
+
+    def operator_profiles(self):
+        return self._cached('operator_profiles', build_operator_profiles)
+
+    def profiler_matrix(self):
+        return clustering_matrix(self.operator_profiles())
+
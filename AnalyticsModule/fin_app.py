@@ -1,62 +1,81 @@
 import pandas as pd
-import numpy as np
 from flask import Flask, jsonify, request
 from flask_cors import CORS
-import joblib
 import os
+import threading
+
+from compiled_pipeline import fast_path
+from feature_pipeline import health_input, task_duration_input
+from insight_rules import get_actionable_insight
+from model_registry import PRELOAD_MODELS, registry
+from operator_profiles import OperatorProfileAggregator
+from profiler_cache import ProfilerPayloadCache
+from readiness import Readiness
 
 # --- Configuration ---
 # This makes the script runnable from any location by finding its own path.
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 DATA_PATH = os.path.join(BASE_DIR, 'fin_synthetic_machine_data.csv')
+PROFILE_STATE_PATH = os.path.join(BASE_DIR, 'fin_operator_profiles_state.json')
 
 # --- Initialize the Flask App ---
 app = Flask(__name__)
 CORS(app) # Enable Cross-Origin Resource Sharing
 
-# --- Load All Models and Data at Startup ---
-print("--- Initializing Analytics Server ---")
-try:
-    print("1. Loading all final models...")
-    time_model = joblib.load(os.path.join(BASE_DIR, 'fin_task_duration_model.joblib'))
-    profiler_model = joblib.load(os.path.join(BASE_DIR, 'fin_operator_profiler_model.joblib'))
-    health_model = joblib.load(os.path.join(BASE_DIR, 'fin_machine_health_model.joblib'))
-    print("   - All models loaded successfully.")
-
-    print("2. Loading and pre-processing data...")
-    df = pd.read_csv(DATA_PATH)
-    
-    # Pre-process data required for the profiler
-    total_hours = df.groupby('Operator_ID')['Engine_Hours'].apply(lambda x: x.max() - x.min()).replace(0, 1)
-    operator_profiles = df.groupby('Operator_ID').agg(
-        total_load_cycles=('Load_Cycles', 'sum'),
-        total_fuel_used=('Fuel_Used', 'sum'),
-        total_idling_time_min=('Idling_Time', 'sum'),
-        total_safety_alerts=('Safety_Alert_Triggered', lambda x: (x == 'Yes').sum())
-    ).reset_index()
-    operator_profiles = operator_profiles.merge(total_hours.rename('total_engine_hours'), on='Operator_ID')
-    operator_profiles['fuel_per_load_cycle'] = (operator_profiles['total_fuel_used'] / operator_profiles['total_load_cycles']).replace([np.inf, -np.inf], 0)
-    operator_profiles['idling_ratio'] = (operator_profiles['total_idling_time_min'] / 60 / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    operator_profiles['safety_incident_rate'] = (operator_profiles['total_safety_alerts'] / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
-    features_for_clustering = ['fuel_per_load_cycle', 'idling_ratio', 'safety_incident_rate']
-    X_profiles = operator_profiles[features_for_clustering].fillna(0)
-    operator_profiles['cluster'] = profiler_model.predict(X_profiles)
-    print("   - Operator profiles ready.")
-
-except FileNotFoundError as e:
-    print(f"❌ CRITICAL ERROR: Could not load a required file: {e}")
-    print("   - Please ensure all 'fin_*.csv' and 'fin_*.joblib' files are in the same directory as this script.")
-    exit()
-
-# --- Helper function for actionable insights ---
-def get_actionable_insight(data_row):
-    if data_row['Fuel_Used'] > 15 and data_row['RPM'] < 900:
-        return "High fuel use at low RPM detected. Check for potential fluid leaks."
-    if data_row['Temperature_C'] > 140 and data_row['Load_Cycles'] < 5:
-        return "Engine overheating under light load. Check radiator for debris blockage."
-    if data_row['RPM'] > 2000 and data_row['Load_Cycles'] == 0:
-        return "High engine speed with no load. Avoid excessive throttle when not actively working to save fuel."
-    return "General machine health anomaly detected. Recommend a standard systems check."
+# --- Load Data in the Background ---
+# Flask binds its port immediately; /api/ready reports progress and the
+# endpoints below return 503 until everything they need is loaded. Models come
+# from the shared registry: memory-mapped and loaded on first use, except the
+# profiler model, which the profiles need up front.
+readiness = Readiness()
+profile_aggregator = profiler_cache = None
+
+def load_resources():
+    global profile_aggregator, profiler_cache
+    print("--- Initializing Analytics Server ---")
+    try:
+        with readiness.step('models'):
+            print("1. Loading the profiler model...")
+            profiler_model = registry.get('operator_profiler')
+            # Under gunicorn --preload with PRELOAD_MODELS=1, load the rest before the workers fork.
+            registry.preload_if_requested()
+            print("   - Models ready.")
+
+        with readiness.step('operator_profiles'):
+            print("2. Loading operator profiles...")
+            # Running per-operator totals are kept on disk; only rows added since the last run
+            # are read, from a memory-mapped snapshot of the CSV rather than the text itself.
+            profile_aggregator = OperatorProfileAggregator(PROFILE_STATE_PATH)
+            new_rows = profile_aggregator.catch_up(DATA_PATH)
+            print(f"   - Folded in {new_rows} new shift records.")
+            operator_profiles = profile_aggregator.profiles()
+            # Clusters, scatter coordinates and the serialized response are computed once here.
+            profiler_cache = ProfilerPayloadCache(profiler_model, operator_profiles)
+            profile_aggregator.take_changes()  # already in the payload
+            print("   - Operator profiles ready.")
+
+    except FileNotFoundError as e:
+        print(f"❌ CRITICAL ERROR: Could not load a required file: {e}")
+        print("   - Please ensure all 'fin_*.csv' and 'fin_*.joblib' files are in the same directory as this script.")
+        raise
+
+readiness.start(load_resources, background=not PRELOAD_MODELS)
+
+_sync_lock = threading.Lock()
+
+def sync_profiler_cache():
+    """
+    Applies every profile change folded in since the last sync to the cached
+    payload, including records other workers appended to the dataset, so each
+    worker serves (and ETags) the same, current body.
+    """
+    with _sync_lock:
+        profile_aggregator.refresh(DATA_PATH)
+        changed, complete = profile_aggregator.take_changes()
+        if complete:
+            profiler_cache.reset(changed)
+        else:
+            profiler_cache.upsert(changed)
 
 # --- API Endpoints ---
 
@@ -64,39 +83,55 @@ def get_actionable_insight(data_row):
 def index():
     return "<h1>CatHackathon Analytics Server is Running!</h1>"
 
+@app.route('/api/ready')
+def ready():
+    """Readiness report: 200 once the profiler model and profiles are loaded, 503 (with the current stage) before."""
+    return readiness.response()
+
+@app.errorhandler(FileNotFoundError)
+def model_file_missing(e):
+    # A lazily loaded model whose file is missing.
+    return jsonify({'error': 'A required model file could not be loaded.', 'message': str(e)}), 503
+
 @app.route('/api/profiler_data')
+@readiness.required
 def get_profiler_data():
-    """Endpoint for the main analytics dashboard charts."""
-    # (Code for this endpoint is the same as the previous final version)
-    scatter_data = profiler_model.named_steps['scaler'].transform(X_profiles)
-    avg_fuel_per_cycle = operator_profiles['fuel_per_load_cycle'].mean()
-    avg_idling_ratio = operator_profiles['idling_ratio'].mean()
-    avg_safety_rate = operator_profiles['safety_incident_rate'].mean()
-    response_data = {'operators': [], 'site_average': {
-        'fuel_efficiency_score': (1 / avg_fuel_per_cycle if avg_fuel_per_cycle != 0 else 0) * 100,
-        'low_idling_score': (1 - avg_idling_ratio) * 100,
-        'safety_score': (1 - avg_safety_rate) * 100 }}
-    for i, row in operator_profiles.iterrows():
-        response_data['operators'].append({
-            'id': row['Operator_ID'], 'cluster': int(row['cluster']),
-            'scatter_x': scatter_data[i, 0], 'scatter_y': scatter_data[i, 1],
-            'fuel_efficiency_score': (1 / row['fuel_per_load_cycle'] if row['fuel_per_load_cycle'] != 0 else 0) * 100,
-            'low_idling_score': (1 - row['idling_ratio']) * 100,
-            'safety_score': (1 - row['safety_incident_rate']) * 100 })
-    return jsonify(response_data)
+    """Endpoint for the main analytics dashboard charts. Served from the precomputed payload, with ETag support."""
+    sync_profiler_cache()
+    return profiler_cache.response()
+
+@app.route('/api/shift_records', methods=['POST'])
+@readiness.required
+def add_shift_records():
+    """
+    Accepts new shift records (a JSON list of rows with the dataset's columns),
+    appends them to the dataset and refreshes only the affected operator profiles.
+    """
+    records = request.get_json()
+    if not isinstance(records, list) or not records:
+        return jsonify({'error': 'Expected a non-empty JSON list of shift records.'}), 400
+    try:
+        changed = profile_aggregator.ingest(pd.DataFrame(records), DATA_PATH)
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    sync_profiler_cache()
+    return jsonify({'records_added': len(records), 'operators_updated': changed['Operator_ID'].tolist()})
 
 @app.route('/api/estimate_time', methods=['POST'])
+@readiness.required
 def estimate_time():
     """
     NEW: Endpoint to predict task completion time.
     Expects a JSON payload with task details.
     """
     data = request.get_json()
-    # Create a DataFrame in the exact order the model expects
-    features = ['Machine_ID', 'Operator_ID', 'RPM', 'Task_Type', 'Soil_Type', 'Terrain', 'Load_Cycles', 'Temperature_C', 'Precipitation_mm']
-    input_df = pd.DataFrame([data], columns=features)
-    
-    prediction = time_model.predict(input_df)
+    compiled = fast_path(registry)
+    if compiled is not None:
+        # Pure-NumPy export of the same pipeline (MiscScripts/fin_compileTimeEst.py)
+        prediction = compiled.predict([data])
+    else:
+        # Typed DataFrame in the exact order the model expects (shared with the trainer)
+        prediction = registry.get('task_duration').predict(task_duration_input([data]))
     
     # Convert prediction to hours and minutes for readability
     hours = int(prediction[0])
@@ -108,17 +143,17 @@ def estimate_time():
     })
 
 @app.route('/api/check_health', methods=['POST'])
+@readiness.required
 def check_health():
     """
     NEW: Endpoint to check the health of the machine based on live sensor data.
     """
     data = request.get_json()
-    # Create a DataFrame in the exact order the model expects
-    features = ['RPM', 'Engine_Hours', 'Fuel_Used', 'Load_Cycles', 'Idling_Time', 'Temperature_C', 'Precipitation_mm']
-    input_df = pd.DataFrame([data], columns=features)
+    # Typed DataFrame in the exact order the model expects (shared with the trainer)
+    input_df = health_input([data])
     
     # Get the raw anomaly score from the model
-    score = health_model.decision_function(input_df)[0]
+    score = registry.get('machine_health').decision_function(input_df)[0]
     
     # Use our custom threshold to decide if it's an anomaly
     ANOMALY_THRESHOLD = -0.07
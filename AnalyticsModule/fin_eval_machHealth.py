@@ -3,25 +3,7 @@ import numpy as np
 import joblib
 import os
 
-def get_actionable_insight(data_row):
-    """
-    Analyzes a single anomalous data row and returns a specific,
-    actionable insight for the operator. This is the "recommendation engine".
-    """
-    # Rule 1: High fuel consumption while idling
-    if data_row['Fuel_Used'] > 15 and data_row['RPM'] < 900:
-        return "💡 INSIGHT: High fuel use at low RPM detected. Check for potential fluid leaks."
-
-    # Rule 2: Overheating under light load
-    if data_row['Temperature_C'] > 140 and data_row['Load_Cycles'] < 5:
-        return "💡 INSIGHT: Engine overheating under light load. Check radiator for debris blockage."
-        
-    # Rule 3: High RPM with no work being done (inefficient operation)
-    if data_row['RPM'] > 2000 and data_row['Load_Cycles'] == 0:
-        return "💡 INSIGHT: High engine speed with no load. Avoid excessive throttle when not actively working to save fuel."
-
-    # Default catch-all message if no specific rule matches
-    return "💡 INSIGHT: General machine health anomaly detected. Recommend a standard systems check."
+from insight_rules import evaluate_insights
 
 
 def evaluate_final_health_model(model_path='fin_machine_health_model.joblib'):
@@ -68,6 +50,9 @@ def evaluate_final_health_model(model_path='fin_machine_health_model.joblib'):
     # Classify based on our custom threshold.
     test_df['is_anomaly'] = np.where(test_df['anomaly_score'] < ANOMALY_THRESHOLD, 'ANOMALY', 'Normal')
 
+    # Insight rules for every case at once (shared with the servers, see insight_rules.py).
+    test_df['insight_code'], test_df['insight'] = evaluate_insights(test_df)
+
     # --- Step 3: Generate Insights and Display Final Report ---
     print(f"\n--- Final Machine Health Evaluation Report (Threshold: {ANOMALY_THRESHOLD}) ---")
     for index, row in test_df.iterrows():
@@ -77,8 +62,7 @@ def evaluate_final_health_model(model_path='fin_machine_health_model.joblib'):
         
         # If an anomaly is detected based on our threshold, generate the insight.
         if row['is_anomaly'] == 'ANOMALY':
-            insight = get_actionable_insight(row)
-            print(insight)
+            print(f"💡 INSIGHT: {row['insight']}")
         
     print("\n--------------------------------------------")
 
@@ -0,0 +1,65 @@
+import numpy as np
+
+# --- Actionable Insight Rules ---
+# The "recommendation engine" for machine health anomalies, shared by
+# fin_app, actionable_insights_api and fin_eval_machHealth. Every rule is a
+# boolean mask over whole columns, so one np.select call labels a single
+# reading or a fleet-wide sweep alike; the first matching rule wins.
+#
+# Each rule has a stable code and a finding plus an action. The services
+# phrase the action for different readers: fin_app speaks to the operator
+# ("Check for ..."), actionable_insights_api to whoever advises them
+# ("Advise operator to check for ...").
+
+# (code, finding, action), in priority order; conditions are in _rule_masks.
+INSIGHT_RULES = [
+    ('fluid_leak', "High fuel use at low RPM detected.", "check for potential fluid leaks"),
+    ('radiator_blockage', "Engine overheating under light load.", "check radiator for debris blockage"),
+    ('idle_revving', "High engine speed with no load.", "avoid excessive throttle when not actively working to save fuel"),
+]
+DEFAULT_CODE = 'general_check'
+DEFAULT_MESSAGE = "General machine health anomaly detected. Recommend a standard systems check."
+
+INSIGHT_CODES = np.array([code for code, _, _ in INSIGHT_RULES] + [DEFAULT_CODE], dtype=object)
+INSIGHT_MESSAGES = {
+    'operator': np.array([f"{finding} {action[0].upper()}{action[1:]}." for _, finding, action in INSIGHT_RULES]
+                         + [DEFAULT_MESSAGE], dtype=object),
+    'supervisor': np.array([f"{finding} Advise operator to {action}." for _, finding, action in INSIGHT_RULES]
+                           + [DEFAULT_MESSAGE], dtype=object),
+}
+
+
+def _rule_masks(readings):
+    fuel = np.asarray(readings['Fuel_Used'], dtype=float)
+    rpm = np.asarray(readings['RPM'], dtype=float)
+    temperature = np.asarray(readings['Temperature_C'], dtype=float)
+    load_cycles = np.asarray(readings['Load_Cycles'], dtype=float)
+    return [
+        # Rule 1: High fuel consumption while idling
+        (fuel > 15) & (rpm < 900),
+        # Rule 2: Overheating under light load
+        (temperature > 140) & (load_cycles < 5),
+        # Rule 3: High RPM with no work being done (inefficient operation)
+        (rpm > 2000) & (load_cycles == 0),
+    ]
+
+
+def rule_indices(readings):
+    """
+    Index into INSIGHT_RULES of the first rule each reading matches
+    (len(INSIGHT_RULES) when none does). `readings` is a DataFrame or dict of
+    columns (one index per row) or a single reading as a dict or Series (a
+    0-d array).
+    """
+    return np.select(_rule_masks(readings), np.arange(len(INSIGHT_RULES)), default=len(INSIGHT_RULES))
+
+
+def evaluate_insights(readings, audience='operator'):
+    """Insight codes and messages for `readings`, as two arrays aligned with its rows."""
+    index = rule_indices(readings)
+    return INSIGHT_CODES[index], INSIGHT_MESSAGES[audience][index]
+
+
+def get_actionable_insight(reading, audience='operator'):
+    """The insight message for one anomalous reading (a dict or pd.Series)."""
+    return INSIGHT_MESSAGES[audience][int(rule_indices(reading))]
@@ -0,0 +1,141 @@
+import os
+import queue
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+
+import numpy as np
+
+# --- Dynamic Micro-Batching ---
+# Single-row predictions spend almost all their time in per-call overhead
+# (ColumnTransformer, OneHotEncoder, dispatching a 100-tree forest), which is
+# the same for one row as for a hundred. Requests handled concurrently are
+# therefore queued, and a worker thread takes everything that arrives within
+# `max_wait_ms` of the first one (up to `max_batch_size`), predicts it in one
+# call and hands each caller its own row of the result.
+#
+# The worker starts on the first submit() of each process: under
+# `gunicorn --preload` the module is imported in the master and the workers
+# are forked from it, and a thread does not survive the fork.
+
+
+class MicroBatcher:
+    """
+    Batches concurrent `submit(record)` calls into single `predict(records)`
+    calls. `predict` receives a list of records and returns one result per
+    record, in order.
+    """
+
+    def __init__(self, predict, max_batch_size=64, max_wait_ms=5.0, latency_window=2048):
+        self.predict = predict
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.latency_window = latency_window
+        self._reset()
+        if hasattr(os, 'register_at_fork'):
+            os.register_at_fork(after_in_child=self._reset)
+
+    def _reset(self):
+        # Fresh queue, lock and counters with no worker yet. Also runs in a forked
+        # child, where the parent's lock may have been held mid-fork and its
+        # queued futures belong to the parent's callers.
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._worker_pid = None
+        self._started = time.monotonic()
+        self._latencies = deque(maxlen=self.latency_window)  # seconds from submit to result, recent requests
+        self._batch_sizes = deque(maxlen=self.latency_window)
+        self.counters = {'requests': 0, 'batches': 0, 'failed_batches': 0, 'errors': 0, 'predict_seconds': 0.0}
+
+    def _ensure_worker(self):
+        pid = os.getpid()
+        if self._worker_pid == pid:
+            return
+        with self._lock:
+            if self._worker_pid != pid:
+                threading.Thread(target=self._run, args=(self._queue,), name='micro-batcher', daemon=True).start()
+                self._worker_pid = pid
+
+    def submit(self, record):
+        """Queues one record; returns a Future that resolves to its prediction."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((record, future, time.perf_counter()))
+        return future
+
+    def predict_one(self, record, timeout=30.0):
+        return self.submit(record).result(timeout)
+
+    # --- Worker ---
+    def _collect(self, jobs):
+        batch = [jobs.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                batch.append(jobs.get(timeout=remaining) if remaining > 0 else jobs.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, jobs):
+        while True:
+            batch = self._collect(jobs)
+            records = [record for record, _, _ in batch]
+            start = time.perf_counter()
+            try:
+                results = self.predict(records)
+                if len(results) != len(records):
+                    raise ValueError(f"predict returned {len(results)} results for {len(records)} records")
+                outcomes = [(result, None) for result in results]
+            except Exception:
+                # One bad record must not fail its neighbours: retry them one at a time.
+                with self._lock:
+                    self.counters['failed_batches'] += 1
+                outcomes = []
+                for record in records:
+                    try:
+                        outcomes.append((self.predict([record])[0], None))
+                    except Exception as e:
+                        outcomes.append((None, e))
+            finished = time.perf_counter()
+            with self._lock:
+                self.counters['batches'] += 1
+                self.counters['requests'] += len(batch)
+                self.counters['predict_seconds'] += finished - start
+                self._batch_sizes.append(len(batch))
+                for _, _, submitted in batch:
+                    self._latencies.append(finished - submitted)
+            for (_, future, _), (result, error) in zip(batch, outcomes):
+                if error is not None:
+                    with self._lock:
+                        self.counters['errors'] += 1
+                    future.set_exception(error)
+                else:
+                    future.set_result(result)
+
+    # --- Metrics ---
+    def metrics(self):
+        with self._lock:
+            counters = dict(self.counters)
+            latencies = np.array(self._latencies) * 1000.0
+            sizes = np.array(self._batch_sizes)
+        uptime = time.monotonic() - self._started
+        report = {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000.0,
+            'queue_depth': self._queue.qsize(),
+            **counters,
+            'requests_per_second': round(counters['requests'] / uptime, 2) if uptime > 0 else 0.0,
+            'mean_batch_size': round(counters['requests'] / counters['batches'], 2) if counters['batches'] else 0.0,
+        }
+        if len(latencies):
+            report['latency_ms'] = {
+                'p50': round(float(np.percentile(latencies, 50)), 3),
+                'p95': round(float(np.percentile(latencies, 95)), 3),
+                'p99': round(float(np.percentile(latencies, 99)), 3),
+                'max': round(float(latencies.max()), 3),
+            }
+            report['recent_batch_size'] = {'mean': round(float(sizes.mean()), 2), 'max': int(sizes.max())}
+        return report
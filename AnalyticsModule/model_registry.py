@@ -0,0 +1,102 @@
+import hashlib
+import os
+import threading
+import time
+
+import joblib
+
+# --- Model Registry ---
+# One place the analytics services get their joblib models from. Models are
+# loaded on first use rather than at import, so a service only pays for the
+# models its endpoints actually touch, and they are opened with
+# `mmap_mode='r'`: numpy arrays stored in the file are mapped from the page
+# cache instead of copied into each process, so several services (and forked
+# gunicorn workers) running off the same files share those pages.
+#
+# Arrays that scikit-learn copies into its own buffers while unpickling (the
+# tree node tables) are not mapped. Those are shared between gunicorn workers
+# by loading them in the master before it forks: run gunicorn with --preload
+# and PRELOAD_MODELS=1, and the workers inherit the pages copy-on-write.
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# Default model files of the fin_* services, by registry name.
+MODEL_FILES = {
+    'task_duration': 'fin_task_duration_model.joblib',
+    'operator_profiler': 'fin_operator_profiler_model.joblib',
+    'machine_health': 'fin_machine_health_model.joblib',
+    # Pure-NumPy export of task_duration (MiscScripts/fin_compileTimeEst.py, compiled_pipeline.py).
+    'task_duration_compiled': 'fin_task_duration_model.compiled.joblib',
+}
+# Exports that may not have been built; preload() skips them when their file is missing.
+OPTIONAL_MODELS = {'task_duration_compiled'}
+
+# Empty string turns memory-mapping off (joblib copies everything into the process).
+MMAP_MODE = os.environ.get('MODEL_MMAP_MODE', 'r') or None
+PRELOAD_MODELS = os.environ.get('PRELOAD_MODELS') == '1'
+
+
+def file_sha1(path, chunk_size=1 << 20):
+    """Content hash of any file (sha1, hex), read in chunks."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ModelRegistry:
+    """Lazily loaded, memory-mapped joblib models, keyed by name."""
+
+    def __init__(self, base_dir=BASE_DIR, files=None, mmap_mode=MMAP_MODE):
+        self.base_dir = base_dir
+        self.files = dict(files or MODEL_FILES)
+        self.mmap_mode = mmap_mode
+        self._models = {}
+        self._lock = threading.Lock()
+        self.load_times = {}  # name -> seconds spent in joblib.load
+
+    def path(self, name):
+        return os.path.join(self.base_dir, self.files[name])
+
+    def get(self, name):
+        """The model called `name`, loaded on first use. Raises FileNotFoundError if its file is missing."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        with self._lock:
+            # Another thread may have loaded it while this one waited.
+            model = self._models.get(name)
+            if model is None:
+                start = time.perf_counter()
+                model = joblib.load(self.path(name), mmap_mode=self.mmap_mode)
+                self.load_times[name] = round(time.perf_counter() - start, 3)
+                self._models[name] = model
+                print(f"Model '{name}' loaded from {self.files[name]} in {self.load_times[name]:.3f}s.")
+        return model
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def preload(self, names=None):
+        """Loads the given models (default: all registered) now, e.g. before a pre-fork server forks."""
+        if names is None:
+            names = [n for n in self.files if n not in OPTIONAL_MODELS or os.path.exists(self.path(n))]
+        for name in names:
+            self.get(name)
+
+    def preload_if_requested(self, names=None):
+        """preload() when PRELOAD_MODELS=1 is set, for servers started with gunicorn --preload."""
+        if PRELOAD_MODELS:
+            self.preload(names)
+
+    def stats(self):
+        return {
+            'mmap_mode': self.mmap_mode,
+            'loaded': sorted(self._models),
+            'load_times_s': dict(self.load_times),
+        }
+
+
+# Shared by the fin_* services; app.py builds its own for the older model files.
+registry = ModelRegistry()
@@ -0,0 +1,65 @@
+import numpy as np
+
+# --- Operator Profile Features ---
+# The one implementation of the operator "DNA" features, shared by the
+# profiler trainer (MiscScripts/fin_operProfile.py), its evaluation script and
+# both analytics servers. Everything is built from cythonized groupby
+# reductions and column arithmetic, with no per-group Python callbacks, so it
+# scales to tens of millions of shift records.
+
+RECORD_COLUMNS = ['Operator_ID', 'Engine_Hours', 'Fuel_Used', 'Load_Cycles', 'Idling_Time', 'Safety_Alert_Triggered']
+SUM_COLUMNS = ['total_load_cycles', 'total_fuel_used', 'total_idling_time_min', 'total_safety_alerts', 'record_count']
+STATE_COLUMNS = SUM_COLUMNS + ['min_engine_hours', 'max_engine_hours']
+FEATURES_FOR_CLUSTERING = ['fuel_per_load_cycle', 'idling_ratio', 'safety_incident_rate']
+
+
+def aggregate_records(records):
+    """
+    Per-operator totals for a batch of shift records, indexed by Operator_ID
+    (sorted). Engine-hour min/max are kept instead of their difference so
+    totals from separate batches can still be combined.
+    """
+    grouped = records[RECORD_COLUMNS].assign(
+        safety_alert=(records['Safety_Alert_Triggered'] == 'Yes').astype(np.int64)
+    ).groupby('Operator_ID', sort=True, observed=True)
+    totals = grouped.agg(
+        total_load_cycles=('Load_Cycles', 'sum'),
+        total_fuel_used=('Fuel_Used', 'sum'),
+        total_idling_time_min=('Idling_Time', 'sum'),
+        total_safety_alerts=('safety_alert', 'sum'),
+        record_count=('Load_Cycles', 'size'),
+        min_engine_hours=('Engine_Hours', 'min'),
+        max_engine_hours=('Engine_Hours', 'max'),
+    )
+    # A categorical Operator_ID would otherwise leak into the index dtype.
+    totals.index = totals.index.astype(object)
+    return totals
+
+
+def _ratio(numerator, denominator):
+    # Division where +/-inf becomes 0, as in the original preprocessing; 0/0 stays NaN.
+    return (numerator / denominator).replace([np.inf, -np.inf], 0)
+
+
+def derive_profiles(totals):
+    """
+    Turns per-operator totals into the profile table the profiler model is
+    trained and served on: Operator_ID, the totals, total_engine_hours and
+    the three FEATURES_FOR_CLUSTERING.
+    """
+    profiles = totals.rename_axis('Operator_ID').reset_index()
+    profiles['total_engine_hours'] = (profiles['max_engine_hours'] - profiles['min_engine_hours']).replace(0, 1)
+    profiles['fuel_per_load_cycle'] = _ratio(profiles['total_fuel_used'], profiles['total_load_cycles'])
+    profiles['idling_ratio'] = _ratio(profiles['total_idling_time_min'] / 60, profiles['total_engine_hours'])
+    profiles['safety_incident_rate'] = _ratio(profiles['total_safety_alerts'], profiles['total_engine_hours'])
+    return profiles
+
+
+def build_operator_profiles(df):
+    """Operator profiles for a full dataset of shift records."""
+    return derive_profiles(aggregate_records(df))
+
+
+def clustering_matrix(profiles):
+    """The model input for a profiles frame (NaN features, e.g. 0/0, become 0)."""
+    return profiles[FEATURES_FOR_CLUSTERING].fillna(0)
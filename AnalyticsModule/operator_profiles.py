@@ -0,0 +1,172 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+
+from dataset_snapshot import file_lock, prefix_digest
+from feature_pipeline import dataset_snapshot
+from operator_features import RECORD_COLUMNS, STATE_COLUMNS, SUM_COLUMNS, aggregate_records, derive_profiles
+
+# --- Incremental Operator Profile Aggregator ---
+# Keeps per-operator running totals (sums, counts and min/max engine hours) so
+# profiles are updated from new shift records alone instead of re-running a
+# groupby over the full history. The state is persisted as JSON next to the
+# dataset, together with how many CSV rows it already covers, so a restart
+# only reads rows appended since the last run. The state also records how many
+# bytes of the CSV it covers and a digest of them (dataset_snapshot.prefix_digest):
+# if the file was rewritten or edited rather than appended to, the totals are
+# rebuilt from scratch. The feature formulas live in operator_features.py.
+#
+# Appends to the CSV go through `<csv>.lock`, so concurrent posts, gunicorn
+# workers and other processes ingesting into the same file take turns. Each
+# process folds in the others' appends with refresh() and picks up the
+# operators that changed with take_changes().
+
+NUMERIC_RECORD_COLUMNS = ['Engine_Hours', 'Fuel_Used', 'Load_Cycles', 'Idling_Time']
+
+
+def merge_totals(state, partial):
+    """Folds partial totals into the running state; sums add up, min/max combine."""
+    if state.empty:
+        return partial.copy()
+    merged = state.reindex(state.index.union(partial.index))
+    incoming = partial.reindex(merged.index)
+    merged[SUM_COLUMNS] = merged[SUM_COLUMNS].fillna(0) + incoming[SUM_COLUMNS].fillna(0)
+    merged['min_engine_hours'] = np.fmin(merged['min_engine_hours'], incoming['min_engine_hours'])
+    merged['max_engine_hours'] = np.fmax(merged['max_engine_hours'], incoming['max_engine_hours'])
+    return merged
+
+
+class OperatorProfileAggregator:
+    """Running per-operator totals, persisted to `state_path`."""
+
+    def __init__(self, state_path):
+        self.state_path = state_path
+        self._lock = threading.RLock()
+        self._reset()
+        self._load()
+
+    def _reset(self):
+        self.state = pd.DataFrame(columns=STATE_COLUMNS, dtype=float)
+        self.state.index.name = 'Operator_ID'
+        self.source_rows = 0  # rows of the source CSV already folded in
+        self.source_bytes = 0  # ... and the bytes they take up
+        self.source_digest = None  # prefix_digest of those bytes
+        self._unsynced = None  # Operator_IDs folded in since take_changes(); None: all of them
+
+    def _load(self):
+        if not os.path.exists(self.state_path):
+            return
+        with open(self.state_path, encoding='utf-8') as f:
+            saved = json.load(f)
+        if 'source_digest' not in saved:
+            return  # written before the digest was kept; rebuild once
+        self.source_rows = saved['source_rows']
+        self.source_bytes = saved['source_bytes']
+        self.source_digest = saved['source_digest']
+        self.state = pd.DataFrame.from_dict(saved['operators'], orient='index', columns=STATE_COLUMNS)
+        self.state.index.name = 'Operator_ID'
+
+    def save(self):
+        with self._lock:
+            saved = {'source_rows': self.source_rows, 'source_bytes': self.source_bytes,
+                     'source_digest': self.source_digest, 'operators': self.state.to_dict(orient='index')}
+            tmp_path = f"{self.state_path}.tmp-{os.getpid()}"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(saved, f)
+            os.replace(tmp_path, self.state_path)
+
+    def add_records(self, records):
+        """
+        Folds a batch of new shift records (the dataset's columns) into the
+        running totals and returns the refreshed profile rows of the operators
+        it touched, ready for ProfilerPayloadCache.upsert().
+        """
+        if len(records) == 0:
+            return derive_profiles(self.state.iloc[0:0])
+        partial = aggregate_records(records)
+        with self._lock:
+            self.state = merge_totals(self.state, partial)
+            touched = self.state.loc[partial.index]
+            if self._unsynced is not None:
+                self._unsynced.update(partial.index)
+        return derive_profiles(touched)
+
+    def take_changes(self):
+        """
+        (profiles, complete): the profile rows of operators folded in since the
+        last call, whoever appended them. `complete` is True when the totals
+        were rebuilt, so these are all the profiles and any others are gone.
+        """
+        with self._lock:
+            unsynced, self._unsynced = self._unsynced, set()
+            if unsynced is None:
+                return derive_profiles(self.state), True
+            return derive_profiles(self.state.loc[sorted(unsynced)]), False
+
+    def catch_up(self, csv_path):
+        """
+        Reads only the rows appended to the source CSV since the state was last
+        saved. On the first run, or if the part of the file the state covers
+        has changed, this is the whole file, once. Rows come from the CSV's
+        columnar snapshot, which only parses text that is new to it.
+        """
+        with self._lock, file_lock(csv_path + '.lock'):
+            return self._catch_up(csv_path)
+
+    def refresh(self, csv_path):
+        """
+        Folds in rows other processes appended to the source CSV since this
+        instance last read or wrote it. One stat call when there are none.
+        """
+        if os.path.getsize(csv_path) != self.source_bytes:
+            self.catch_up(csv_path)
+
+    def _catch_up(self, csv_path):
+        if self.source_bytes and prefix_digest(csv_path, self.source_bytes) != self.source_digest:
+            print(f"   - {os.path.basename(csv_path)} was rewritten; rebuilding operator totals.")
+            self._reset()
+        snapshot = dataset_snapshot(csv_path)
+        new_rows = snapshot.load(columns=RECORD_COLUMNS, start=self.source_rows)
+        if len(new_rows) or snapshot.csv_size != self.source_bytes:
+            self.add_records(new_rows)
+            self.source_rows += len(new_rows)
+            self._covered(csv_path, snapshot.csv_size)
+            self.save()
+        return len(new_rows)
+
+    def _covered(self, csv_path, size):
+        self.source_bytes = size
+        self.source_digest = prefix_digest(csv_path, size)
+
+    def ingest(self, records, csv_path):
+        """
+        Appends new shift records to the source CSV and folds them in, keeping
+        the saved row count in step so a restart does not read them twice.
+        Rows other processes appended in the meantime are folded in first.
+        Returns the refreshed profile rows of the operators they touched.
+        """
+        missing = [c for c in RECORD_COLUMNS if c not in records.columns]
+        if missing:
+            raise ValueError(f"Missing columns: {', '.join(missing)}")
+        records = records.copy()
+        for c in NUMERIC_RECORD_COLUMNS:
+            try:
+                records[c] = pd.to_numeric(records[c])
+            except (TypeError, ValueError):
+                raise ValueError(f"Column {c} must be numeric.")
+        header = pd.read_csv(csv_path, nrows=0).columns
+        with self._lock, file_lock(csv_path + '.lock'):
+            self._catch_up(csv_path)
+            records.reindex(columns=header).to_csv(csv_path, mode='a', header=False, index=False)
+            changed = self.add_records(records)
+            self.source_rows += len(records)
+            self._covered(csv_path, os.path.getsize(csv_path))
+            self.save()
+        return changed
+
+    def profiles(self):
+        with self._lock:
+            return derive_profiles(self.state)
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import threading
+
+import numpy as np
+import pandas as pd
+from flask import Response, request
+
+from operator_features import clustering_matrix
+
+# --- Profiler Payload Cache ---
+# The /api/profiler_data response only depends on the operator profiles and the
+# profiler model, so it is built once, kept as serialized JSON bytes and served
+# with an ETag. Clients that already have the current version get a 304.
+# When profiles change, only the changed operators are re-scaled and re-clustered.
+# Every worker brings its copy up to date from the shared dataset before
+# serving (fin_app.sync_profiler_cache), so the body, and with it the ETag, is
+# the same whichever worker answers.
+
+
+def _inverse_score(values):
+    # (1 / x if x != 0 else 0) * 100, for a whole column at once
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(values != 0, 1 / values, 0) * 100
+
+
+def operator_records(operator_profiles):
+    """
+    Per-operator entries of the profiler response, from a profiles frame that
+    already carries the `cluster`, `scatter_x` and `scatter_y` columns.
+    Pure column math, no row loop.
+    """
+    fuel = operator_profiles['fuel_per_load_cycle'].to_numpy(dtype=float)
+    idling = operator_profiles['idling_ratio'].to_numpy(dtype=float)
+    safety = operator_profiles['safety_incident_rate'].to_numpy(dtype=float)
+    # Keys are listed in sorted order, matching jsonify's output.
+    columns = {
+        'cluster': operator_profiles['cluster'].to_numpy(dtype=int).tolist(),
+        'fuel_efficiency_score': _inverse_score(fuel).tolist(),
+        'id': operator_profiles['Operator_ID'].tolist(),
+        'low_idling_score': ((1 - idling) * 100).tolist(),
+        'safety_score': ((1 - safety) * 100).tolist(),
+        'scatter_x': operator_profiles['scatter_x'].to_numpy(dtype=float).tolist(),
+        'scatter_y': operator_profiles['scatter_y'].to_numpy(dtype=float).tolist(),
+    }
+    keys = list(columns)
+    return [dict(zip(keys, values)) for values in zip(*columns.values())]
+
+
+def site_average(operator_profiles):
+    avg_fuel_per_cycle = operator_profiles['fuel_per_load_cycle'].mean()
+    avg_idling_ratio = operator_profiles['idling_ratio'].mean()
+    avg_safety_rate = operator_profiles['safety_incident_rate'].mean()
+    return {
+        'fuel_efficiency_score': float((1 / avg_fuel_per_cycle if avg_fuel_per_cycle != 0 else 0) * 100),
+        'low_idling_score': float((1 - avg_idling_ratio) * 100),
+        'safety_score': float((1 - avg_safety_rate) * 100)
+    }
+
+
+def build_profiler_payload(operator_profiles):
+    return {'operators': operator_records(operator_profiles), 'site_average': site_average(operator_profiles)}
+
+
+class ProfilerPayloadCache:
+    """Holds the serialized /api/profiler_data payload and its ETag."""
+
+    def __init__(self, profiler_model, operator_profiles):
+        self.profiler_model = profiler_model
+        self._lock = threading.Lock()
+        self.reset(operator_profiles)
+
+    def reset(self, operator_profiles):
+        """Rebuilds the payload from a complete set of profile rows."""
+        scored = self._score(operator_profiles.reset_index(drop=True))
+        with self._lock:
+            self.profiles = scored
+            self._fragments = {}  # Operator_ID -> that operator's serialized JSON object
+            self._serialize(scored)
+            self._rebuild()
+
+    def _score(self, profiles):
+        """Adds cluster and scatter columns for the given profile rows."""
+        profiles = profiles.copy()
+        X = clustering_matrix(profiles)
+        scatter = self.profiler_model.named_steps['scaler'].transform(X)
+        profiles['cluster'] = self.profiler_model.predict(X)
+        profiles['scatter_x'] = scatter[:, 0]
+        profiles['scatter_y'] = scatter[:, 1]
+        return profiles
+
+    def _serialize(self, profiles):
+        for record in operator_records(profiles):
+            self._fragments[record['id']] = json.dumps(record).encode('utf-8')
+
+    def _rebuild(self):
+        # Float formatting dominates serialization, so unchanged operators' bytes are reused as-is.
+        operators = b', '.join(self._fragments[i] for i in self.profiles['Operator_ID'].tolist())
+        body = b'{"operators": [' + operators + b'], "site_average": ' + \
+            json.dumps(site_average(self.profiles)).encode('utf-8') + b'}'
+        self.body = body
+        self.etag = hashlib.sha1(body).hexdigest()
+
+    def upsert(self, changed_profiles):
+        """
+        Replaces or adds the given operators' profile rows (same columns as the
+        startup profiles) and refreshes the payload. Only these rows go through
+        the scaler, the model and the JSON encoder; everything else is reused.
+        """
+        if len(changed_profiles) == 0:
+            return
+        scored = self._score(changed_profiles.reset_index(drop=True))
+        with self._lock:
+            kept = self.profiles[~self.profiles['Operator_ID'].isin(scored['Operator_ID'])]
+            self.profiles = (pd.concat([kept, scored], ignore_index=True)
+                             .sort_values('Operator_ID', kind='stable').reset_index(drop=True))
+            self._serialize(scored)
+            self._rebuild()
+
+    def response(self):
+        """The cached payload as a Flask response; 304 when If-None-Match matches."""
+        with self._lock:
+            body, etag = self.body, self.etag
+        response = Response(body, mimetype='application/json')
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response.make_conditional(request)
@@ -0,0 +1,102 @@
+import functools
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+
+from flask import jsonify
+
+# --- Background Start-up and Readiness ---
+# The analytics servers load models and data in a background thread so Flask
+# binds its port straight away. Liveness is the plain `/` route; readiness is
+# reported separately (e.g. on /api/ready), and endpoints that need the loaded
+# data answer 503 with Retry-After until it is there.
+
+
+class Readiness:
+    """Tracks a background start-up: current stage, per-stage timings and any failure."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._done = threading.Event()  # set once start-up has finished, successfully or not
+        self._started = time.monotonic()
+        self.stage = 'starting'
+        self.error = None
+        self.timings = {}  # stage -> seconds
+
+    @property
+    def ready(self):
+        return self._ready.is_set()
+
+    @contextmanager
+    def step(self, name):
+        """Marks `name` as the current stage and records how long it took."""
+        with self._lock:
+            self.stage = name
+        start = time.perf_counter()
+        yield
+        with self._lock:
+            self.timings[name] = round(time.perf_counter() - start, 3)
+
+    def start(self, load, background=True):
+        """
+        Runs `load()` in a daemon thread; the service is ready once it returns.
+        With background=False it runs inline instead, which is what a pre-fork
+        server needs: threads started in the master do not exist in the workers.
+        """
+        def run():
+            try:
+                load()
+            except Exception as e:
+                with self._lock:
+                    self.error = f"{type(e).__name__}: {e}"
+                print(f"❌ CRITICAL ERROR during start-up ({self.stage}): {e}")
+                traceback.print_exc()
+                self._done.set()
+                return
+            with self._lock:
+                self.stage = 'ready'
+                self.timings['total'] = round(time.monotonic() - self._started, 3)
+            self._ready.set()
+            self._done.set()
+
+        if not background:
+            run()
+            return None
+        thread = threading.Thread(target=run, name='startup-loader', daemon=True)
+        thread.start()
+        return thread
+
+    def wait(self, timeout=None):
+        """Blocks until start-up has finished or failed; returns whether the service is ready."""
+        self._done.wait(timeout)
+        return self.ready
+
+    def report(self):
+        with self._lock:
+            return {
+                'ready': self.ready,
+                'stage': self.stage,
+                'error': self.error,
+                'timings_s': dict(self.timings),
+                'uptime_s': round(time.monotonic() - self._started, 3),
+            }
+
+    def response(self):
+        """The readiness report as a Flask response: 200 when ready, 503 otherwise."""
+        return jsonify(self.report()), (200 if self.ready else 503)
+
+    def required(self, view):
+        """Decorator for endpoints that need the loaded data: 503 until start-up has finished."""
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.ready:
+                report = self.report()
+                message = 'Start-up failed.' if report['error'] else 'Service is still starting up.'
+                response = jsonify({'error': message, 'stage': report['stage'], 'detail': report['error']})
+                response.status_code = 503
+                response.headers['Retry-After'] = '1'
+                return response
+            return view(*args, **kwargs)
+        return wrapper
@@ -1,22 +1,51 @@
 import os
+import threading
+import time
 import psycopg2
 import psycopg2.extras
 import requests
 from dotenv import load_dotenv
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request, stream_with_context
 from flask_cors import CORS
 
+from services.db_pool import ConnectionPool, PoolExhaustedError
+from services.event_sink import EventSink
+from services.geofence import track_arrays
+from services.live_alerts import alert_rules, frame_is_for, live_status_payload, update_alerts
+from services.prediction_cache import PredictionCache, build_ml_payload, payload_key
+from services.schedule_ingest import insert_tasks
+from services.sessions import InvalidGeofence, InvalidShiftId, Session, create_registry, parse_shift_id
+from services.health_drift import HealthDriftDetector
+from services.telemetry_rollup import TelemetryRollup
+from services.telemetry_store import TelemetryStore, parse_timestamp
+from services.telemetry_stream import TelemetryHub, sse_stream
+from services.upstream import CircuitBreaker, UpstreamClient
+
 # --- Initialization ---
 load_dotenv()
 app = Flask(__name__)
 CORS(app, resources={r"/api/*": {"origins": "*"}})
 
-active_shift = { "shift_id": None, "task_id": None, "geofence_wkt": None }
-
 # --- API Endpoints Configuration ---
 ML_API_ENDPOINT = "http://127.0.0.1:5002/predict/task_duration" # ML model runs on port 5002
+ML_BATCH_API_ENDPOINT = ML_API_ENDPOINT + "/batch"
 SIMULATOR_API_ENDPOINT = "http://127.0.0.1:5001/get_current_data"
 
+# Keep-alive clients with timeouts, jittered retries and circuit breakers, so a
+# stalled upstream fast-fails instead of tying up every worker.
+simulator_client = UpstreamClient(
+    "simulator",
+    timeout=(0.5, float(os.getenv("SIMULATOR_TIMEOUT_S", 2))),
+    retries=int(os.getenv("UPSTREAM_RETRIES", 2)),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=5)
+)
+ml_client = UpstreamClient(
+    "ml",
+    timeout=(0.5, float(os.getenv("ML_TIMEOUT_S", 5))),
+    retries=int(os.getenv("UPSTREAM_RETRIES", 2)),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=15)
+)
+
 # --- Database Configuration ---
 DB_CONFIG = {
     "dbname": os.getenv("DB_NAME"), "user": os.getenv("DB_USER"),
@@ -24,155 +53,407 @@ DB_CONFIG = {
     "port": os.getenv("DB_PORT")
 }
 
+# One pool per worker process; connections are reused across requests instead of
+# paying TCP + auth setup on every call.
+db_pool = ConnectionPool(
+    DB_CONFIG,
+    minconn=int(os.getenv("DB_POOL_MIN", 1)),
+    maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+    wait_timeout=float(os.getenv("DB_POOL_WAIT_TIMEOUT", 5)),
+    max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300))
+)
+
 def get_db_connection():
-    return psycopg2.connect(**DB_CONFIG)
+    """Checks out a pooled connection; use as `with get_db_connection() as conn:`."""
+    return db_pool.connection()
 
-# --- Alert Thresholds ---
-ALERT_THRESHOLDS = {
-    "PROXIMITY_NEAR": 3.0, "HIGH_NOISE": 90.0,
-    "HIGH_AQI": 200.0, "HIGH_ENGINE_TEMP": 115.0
-}
+# Alerts are persisted off the request path in batches; see services/event_sink.py.
+event_sink = EventSink(
+    db_pool,
+    spill_path=os.getenv("EVENT_SPILL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_spill.jsonl")),
+    batch_size=int(os.getenv("EVENT_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("EVENT_FLUSH_MS", 250)) / 1000
+)
+
+# Predictions are cached per ML payload, so edited task inputs simply map to a new entry.
+prediction_cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 4096)),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_S", 3600))
+)
+
+# Telemetry history, buffered in memory and flushed as hourly columnar chunks.
+telemetry_store = TelemetryStore(
+    os.getenv("TELEMETRY_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry_store")),
+    flush_rows=int(os.getenv("TELEMETRY_FLUSH_ROWS", 600)),
+    flush_interval=float(os.getenv("TELEMETRY_FLUSH_S", 30)),
+    repeat_interval=float(os.getenv("TELEMETRY_SAMPLE_S", 1))
+)
+
+# Streaming 1s/1m/1h aggregates, rebuilt from the history store in the background at startup.
+telemetry_rollup = TelemetryRollup()
+threading.Thread(
+    target=telemetry_rollup.seed_from_store, args=(telemetry_store, time.time()),
+    name="rollup-seed", daemon=True
+).start()
+
+# Per-machine EWMA baselines for engine temperature and RPM; see services/health_drift.py.
+health_drift = HealthDriftDetector()
+
+def record_telemetry(frame):
+    """
+    Keeps a history sample and updates the rollups and drift baselines; repeated
+    polls of one frame are recorded once.
+    """
+    now = time.time()
+    # True for any new sample, including ids the store can't keep as a directory name.
+    if telemetry_store.append(frame, ts=now):
+        telemetry_rollup.add(frame, ts=now)
+        for event in health_drift.update(frame, ts=now):
+            submit_health_event(event)
+
+# --- Shift Sessions ---
+# SESSION_BACKEND=redis shares sessions across gunicorn workers; the default keeps them in-process.
+sessions = create_registry(
+    backend=os.getenv("SESSION_BACKEND", "memory"),
+    redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", 8 * 3600))
+)
+
+def get_session():
+    """Looks up the session named by `shift_id` or `machine_id` in the query string or JSON body."""
+    params = dict(request.args)
+    if request.is_json:
+        body = request.get_json(silent=True)
+        if isinstance(body, dict):
+            params.update(body)
+    if params.get('shift_id') is not None:
+        return sessions.get(parse_shift_id(params['shift_id']))
+    if params.get('machine_id') is not None:
+        return sessions.get_by_machine(params['machine_id'])
+    return None
+
+def submit_health_event(event):
+    """Files a drift detector event under the shift currently running on its machine, if there is one."""
+    session = sessions.get_by_machine(event['machine_id'])
+    if session is not None:
+        event_sink.submit(session.shift_id, event['type'], event)
+
+@app.errorhandler(PoolExhaustedError)
+def handle_pool_exhausted(e):
+    print(f"Database pool exhausted: {e}")
+    return jsonify({"error": "Database is busy. Please retry shortly."}), 503
+
+@app.errorhandler(InvalidShiftId)
+def handle_invalid_shift_id(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(InvalidGeofence)
+def handle_invalid_geofence(e):
+    return jsonify({"error": str(e)}), 400
 
 # --- API Endpoints ---
 @app.route('/api/login', methods=['POST'])
 def login():
     data = request.get_json()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute(
-        "INSERT INTO work_shifts (operator_id, machine_id) VALUES (%s, %s) RETURNING shift_id;",
-        (data.get('operator_id'), data.get('machine_id'))
-    )
-    shift_id = cur.fetchone()[0]
-    conn.commit()
-    active_shift["shift_id"] = shift_id
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute(
+            "INSERT INTO work_shifts (operator_id, machine_id) VALUES (%s, %s) RETURNING shift_id;",
+            (data.get('operator_id'), data.get('machine_id'))
+        )
+        shift_id = cur.fetchone()[0]
+        conn.commit()
+    sessions.put(Session(
+        shift_id, machine_id=data.get('machine_id'), operator_id=data.get('operator_id'),
+        thresholds=alert_rules.thresholds_for(data.get('machine_id'))
+    ))
     return jsonify({"message": "Login successful", "shift_id": shift_id}), 200
 
 @app.route('/api/schedule', methods=['POST'])
 def post_schedule():
     tasks = request.get_json()
-    conn = get_db_connection()
-    cur = conn.cursor()
-    task_ids = []
-    for task in tasks:
-        points_str = ", ".join([f"{p[0]} {p[1]}" for p in task['geofence_points']])
-        polygon_wkt = f"POLYGON(({points_str}))"
+    with get_db_connection() as conn, conn.cursor() as cur:
+        task_ids = insert_tasks(cur, tasks)
+        conn.commit()
+    return jsonify({"message": f"{len(tasks)} tasks scheduled.", "task_ids": task_ids}), 201
+
+@app.route('/api/schedule/<int:task_id>', methods=['PATCH'])
+def update_task_inputs(task_id):
+    """
+    Updates a scheduled task's planned load cycles and/or task_inputs. Every
+    worker rebuilds the ML payload from the row, so the next prediction uses
+    the new inputs.
+    """
+    data = request.get_json() or {}
+    with get_db_connection() as conn, conn.cursor() as cur:
         cur.execute(
             """
-            INSERT INTO scheduled_tasks (assigned_date, operator_id, machine_id, task_type, load_cycles_planned, geofence, task_inputs)
-            VALUES (%s, %s, %s, %s, %s, ST_GeomFromText(%s, 4326), %s) RETURNING task_id;
+            UPDATE scheduled_tasks
+            SET load_cycles_planned = COALESCE(%s, load_cycles_planned),
+                task_inputs = task_inputs || %s
+            WHERE task_id = %s RETURNING task_id;
             """,
-            (
-                task['assigned_date'], task['operator_id'], task['machine_id'],
-                task['task_type'], task['load_cycles_planned'],
-                polygon_wkt, psycopg2.extras.Json(task['task_inputs'])
-            )
+            (data.get('load_cycles_planned'), psycopg2.extras.Json(data.get('task_inputs') or {}), task_id)
         )
-        task_ids.append(cur.fetchone()[0])
-    conn.commit()
-    cur.close()
-    conn.close()
-    return jsonify({"message": f"{len(tasks)} tasks scheduled.", "task_ids": task_ids}), 201
+        updated = cur.fetchone()
+        conn.commit()
+    if not updated: return jsonify({"error": "Task not found"}), 404
+    return jsonify({"message": f"Task {task_id} updated."})
+
+def request_prediction(ml_payload):
+    # Falls back to the last prediction returned for these inputs if the ML service is down.
+    prediction_data, _ = ml_client.post_json(ML_API_ENDPOINT, json=ml_payload, fallback_key=payload_key(ml_payload))
+    return prediction_data.get('predicted_duration_hours')
 
 @app.route('/api/predict_time', methods=['GET'])
 def predict_time():
     task_id = request.args.get('task_id', type=int)
     if not task_id: return jsonify({"error": "task_id is required"}), 400
-    
-    conn = get_db_connection()
-    cur = conn.cursor(cursor_factory=psycopg2.extras.DictCursor)
-    cur.execute("SELECT * FROM scheduled_tasks WHERE task_id = %s;", (task_id,))
-    task_data = cur.fetchone()
-    cur.close()
-    conn.close()
 
-    if not task_data: return jsonify({"error": "Task not found"}), 404
+    # Read the task on every call (a primary-key lookup) so edits made through
+    # another worker are never served from a stale payload.
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        cur.execute("SELECT * FROM scheduled_tasks WHERE task_id = %s;", (task_id,))
+        task_data = cur.fetchone()
 
-    # Construct the payload for the ML model API
-    task_inputs = task_data['task_inputs']
-    ml_payload = {
-        "Machine_ID": task_data['machine_id'],
-        "Operator_ID": task_data['operator_id'],
-        "RPM": task_inputs.get('average_rpm', 1800), # Use a default if not provided
-        "Task_Type": task_data['task_type'],
-        "Soil_Type": task_inputs.get('soil_type'),
-        "Terrain": task_inputs.get('terrain'),
-        "Load_Cycles": task_data['load_cycles_planned'],
-        "Temperature_C": task_inputs.get('temperature_c'),
-        "Precipitation_mm": task_inputs.get('precipitation_mm')
-    }
+    if not task_data: return jsonify({"error": "Task not found"}), 404
+    ml_payload = build_ml_payload(task_data)
 
     try:
-        # Call the external ML model API
-        ml_response = requests.post(ML_API_ENDPOINT, json=ml_payload, timeout=5)
-        ml_response.raise_for_status()
-        prediction_data = ml_response.json()
-        
-        # Return the prediction to the frontend
+        # Concurrent requests for the same inputs share a single upstream call.
+        predicted_hours = prediction_cache.get_or_compute(
+            payload_key(ml_payload), lambda: request_prediction(ml_payload)
+        )
         return jsonify({
             "task_id": task_id,
-            "predicted_duration_hours": prediction_data.get('predicted_duration_hours')
+            "predicted_duration_hours": predicted_hours
         })
     except requests.RequestException as e:
         print(f"Error calling ML API: {e}")
         return jsonify({"error": "Failed to get prediction from ML model."}), 503
 
+def request_predictions(payloads_by_task):
+    """Scores many tasks with one call to the ML batch endpoint. Returns {task_id: hours}."""
+    tasks = [dict(payload, task_id=task_id) for task_id, payload in payloads_by_task.items()]
+    response_data, _ = ml_client.post_json(ML_BATCH_API_ENDPOINT, json={"tasks": tasks}, timeout=(0.5, 30))
+    predictions = response_data.get('predictions', {})
+    return {task_id: predictions.get(str(task_id)) for task_id in payloads_by_task}
+
+@app.route('/api/predict_time/batch', methods=['GET'])
+def predict_time_batch():
+    """
+    Predicted durations for a whole plan: pass `assigned_date` (YYYY-MM-DD) or a
+    comma-separated `task_ids` list. Tasks are read in one query, cached
+    predictions are reused, and the rest are scored in one upstream call.
+    """
+    assigned_date = request.args.get('assigned_date')
+    task_ids_arg = request.args.get('task_ids')
+    if not assigned_date and not task_ids_arg:
+        return jsonify({"error": "assigned_date or task_ids is required"}), 400
+
+    with get_db_connection() as conn, conn.cursor(cursor_factory=psycopg2.extras.DictCursor) as cur:
+        if task_ids_arg:
+            try:
+                task_ids = [int(t) for t in task_ids_arg.split(',') if t.strip()]
+            except ValueError:
+                return jsonify({"error": "task_ids must be a comma-separated list of integers"}), 400
+            cur.execute("SELECT * FROM scheduled_tasks WHERE task_id = ANY(%s) ORDER BY task_id;", (task_ids,))
+        else:
+            cur.execute("SELECT * FROM scheduled_tasks WHERE assigned_date = %s ORDER BY task_id;", (assigned_date,))
+        rows = cur.fetchall()
+
+    if not rows: return jsonify({"error": "No matching tasks found"}), 404
+
+    predictions, misses = {}, {}
+    for row in rows:
+        payload = build_ml_payload(row)
+        cached = prediction_cache.peek(payload_key(payload))
+        if cached is not None:
+            predictions[row['task_id']] = cached
+        else:
+            misses[row['task_id']] = payload
+
+    if misses:
+        try:
+            fresh = request_predictions(misses)
+        except requests.RequestException as e:
+            print(f"Error calling ML batch API: {e}")
+            return jsonify({"error": "Failed to get predictions from ML model."}), 503
+        for task_id, hours in fresh.items():
+            if hours is not None:
+                prediction_cache.put(payload_key(misses[task_id]), hours)
+            predictions[task_id] = hours
+
+    return jsonify({
+        "count": len(predictions),
+        "predictions": {str(task_id): predictions[task_id] for task_id in sorted(predictions)}
+    })
+
+def fetch_sensor_data():
+    """Returns (frame, stale); stale frames are the last good reading served while the simulator is down."""
+    return simulator_client.get_json(SIMULATOR_API_ENDPOINT, fallback_key="current")
+
+def process_telemetry_frame(sensor_data, shift_ids, changed_ids):
+    """
+    Evaluates one ingested frame for every streamed shift on the frame's
+    machine. A message is built for shifts whose telemetry changed or whose
+    alerts transitioned.
+    """
+    record_telemetry(sensor_data)
+    messages = {}
+    for shift_id in shift_ids:
+        session = sessions.get(shift_id)
+        if session is None:
+            if shift_id in changed_ids:
+                messages[shift_id] = {"error": "Shift session expired. Please login again."}
+            continue
+        if not frame_is_for(session, sensor_data):
+            # The frame belongs to another machine; leave this shift's alerts alone.
+            if shift_id in changed_ids:
+                messages[shift_id] = {"error": f"No telemetry for machine {session.machine_id}."}
+            continue
+        new_alerts, cleared = update_alerts(session, sensor_data, event_sink.submit)
+        session.last_telemetry = sensor_data
+        sessions.save(session)
+        if shift_id in changed_ids or new_alerts or cleared:
+            messages[shift_id] = live_status_payload(session, sensor_data, new_alerts, cleared)
+    return messages
+
+# One ingest loop per worker feeds every /api/stream client.
+telemetry_hub = TelemetryHub(
+    lambda: fetch_sensor_data()[0], process_telemetry_frame,
+    interval=float(os.getenv("TELEMETRY_POLL_INTERVAL", 0.5))
+)
+
 @app.route('/api/live_status', methods=['GET'])
 def get_live_status():
-    # ... (This function remains the same as before)
-    if not active_shift["shift_id"]:
-        return jsonify({"error": "No active shift. Please login first."}), 400
+    session = get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
     try:
-        sim_response = requests.get(SIMULATOR_API_ENDPOINT)
-        sim_response.raise_for_status()
-        sensor_data = sim_response.json()
+        sensor_data, stale = fetch_sensor_data()
     except requests.RequestException:
         return jsonify({"error": "Could not connect to simulator."}), 500
-    conn = get_db_connection()
-    cur = conn.cursor()
-    new_alerts = []
-    try:
-        if any(p < ALERT_THRESHOLDS["PROXIMITY_NEAR"] for p in sensor_data['safety']['proximity_meters'].values()):
-            new_alerts.append({"type": "PROXIMITY_NEAR", "message": "Proximity Breach! Object too close."})
-        if sensor_data['environment']['noise_db'] > ALERT_THRESHOLDS["HIGH_NOISE"]:
-            new_alerts.append({"type": "HIGH_NOISE", "message": "Noise levels exceed safety threshold."})
-        if active_shift["geofence_wkt"]:
-            cur.execute(
-                "SELECT NOT ST_Contains(ST_GeomFromText(%s, 4326), ST_SetSRID(ST_MakePoint(%s, %s), 4326));",
-                (active_shift['geofence_wkt'], sensor_data['location']['gps']['longitude'], sensor_data['location']['gps']['latitude'])
-            )
-            if cur.fetchone()[0]:
-                new_alerts.append({"type": "GEOFENCE_BREACH", "message": "Machine is outside designated work area."})
-        for alert in new_alerts:
-            cur.execute("INSERT INTO events (shift_id, event_type, details) VALUES (%s, %s, %s);", (active_shift['shift_id'], alert['type'], psycopg2.extras.Json(alert)))
-        conn.commit()
-    except Exception as e:
-        print(f"Database Error: {e}")
-        conn.rollback()
-    finally:
-        cur.close()
-        conn.close()
-    return jsonify({"live_data": sensor_data, "alerts": new_alerts})
+    if stale:
+        # Don't re-run alerts on a cached frame; just show the last known state.
+        return jsonify(dict(live_status_payload(session, sensor_data, [], []), stale=True))
+    record_telemetry(sensor_data)
+    if not frame_is_for(session, sensor_data):
+        return jsonify({"error": f"No telemetry for machine {session.machine_id}."}), 404
+    new_alerts, cleared = update_alerts(session, sensor_data, event_sink.submit)
+    session.last_telemetry = sensor_data
+    sessions.save(session)
+    return jsonify(live_status_payload(session, sensor_data, new_alerts, cleared))
+
+@app.route('/api/stream', methods=['GET'])
+def stream_live_status():
+    """
+    Server-Sent Events feed of telemetry and alerts for one shift.
+    Frames are pushed only when the telemetry changes or an alert is raised or cleared. Needs a threaded or
+    gevent worker, since each client holds its connection open.
+    """
+    session = get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
+    return Response(
+        stream_with_context(sse_stream(telemetry_hub, session.shift_id)),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
 
 @app.route('/api/set_task', methods=['POST'])
 def set_task():
-    # ... (This function remains the same as before)
+    session = get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
     data = request.get_json()
     task_id = data.get('task_id')
-    conn = get_db_connection()
-    cur = conn.cursor()
-    cur.execute("SELECT ST_AsText(geofence) FROM scheduled_tasks WHERE task_id = %s;", (task_id,))
-    result = cur.fetchone()
-    if result:
-        active_shift['task_id'] = task_id
-        active_shift['geofence_wkt'] = result[0]
-        cur.execute("UPDATE work_shifts SET active_task_id = %s WHERE shift_id = %s;", (task_id, active_shift['shift_id']))
-        conn.commit()
-    cur.close()
-    conn.close()
+    with get_db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT ST_AsText(geofence) FROM scheduled_tasks WHERE task_id = %s;", (task_id,))
+        result = cur.fetchone()
+        if result:
+            # The geofence is compiled once here so live_status never sends it back to PostGIS.
+            session.set_task(task_id, result[0])
+            sessions.save(session)
+            cur.execute("UPDATE work_shifts SET active_task_id = %s WHERE shift_id = %s;", (task_id, session.shift_id))
+            conn.commit()
     return jsonify({"message": f"Active task set to {task_id}"})
 
+@app.route('/api/geofence/check', methods=['POST'])
+def check_geofence_track():
+    """Checks a batch of [lon, lat] points (e.g. a replayed track) against the active task's geofence."""
+    session = get_session()
+    if session is None or not session.geofence:
+        return jsonify({"error": "No active task with a geofence."}), 400
+    data = request.get_json(silent=True)
+    try:
+        lons, lats = track_arrays(data.get('points') if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    breaches = session.geofence.breaches(lons, lats)
+    return jsonify({
+        "task_id": session.task_id,
+        "breach": breaches.tolist(),
+        "breach_count": int(breaches.sum())
+    })
+
+@app.route('/api/telemetry/history', methods=['GET'])
+def get_telemetry_history():
+    """
+    Recorded telemetry for a `machine_id` (or the rollups for an `operator_id`)
+    between `start` and `end` (epoch seconds or ISO-8601; default: the last hour).
+    `metrics` is a comma-separated subset of the stored columns. Without `step`
+    the raw samples are returned; with `step` (seconds) the answer comes from the
+    coarsest rollup resolution that fits, with min/max/mean/count per point.
+    """
+    machine_id, operator_id = request.args.get('machine_id'), request.args.get('operator_id')
+    if not machine_id and not operator_id:
+        return jsonify({"error": "machine_id or operator_id is required"}), 400
+    kind, key_id = ("machine", machine_id) if machine_id else ("operator", operator_id)
+    try:
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else time.time()
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else end - 3600
+        step = request.args.get('step', type=float)
+        metrics = [m for m in request.args.get('metrics', '').split(',') if m] or None
+        if step is not None or kind == "operator":
+            history = telemetry_rollup.query(kind, key_id, start, end, step=step, metrics=metrics)
+            source = f"rollup_{history.pop('resolution')}s"
+        else:
+            history = telemetry_store.query(key_id, start, end, metrics=metrics)
+            source = "raw"
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({kind + "_id": key_id, "start": start, "end": end, "step": step, "source": source,
+                    "count": len(history["ts"]), "history": history})
+
+@app.route('/api/health/drift', methods=['GET'])
+def get_health_drift():
+    """
+    Streaming health state of a `machine_id`: per metric, the baseline and recent
+    level, noise deviation, rate of change and active SPIKE/DRIFT/RATE events,
+    plus its most recent raised/cleared events (`limit`, default 50).
+    """
+    machine_id = request.args.get('machine_id')
+    if not machine_id:
+        return jsonify({"error": "machine_id is required"}), 400
+    state = health_drift.snapshot(machine_id)
+    if state is None:
+        return jsonify({"error": "No telemetry seen for this machine yet."}), 404
+    state["events"] = health_drift.events(machine_id, limit=request.args.get('limit', 50, type=int))
+    return jsonify(state)
+
+@app.route('/api/metrics', methods=['GET'])
+def get_metrics():
+    return jsonify({
+        "db_pool": db_pool.stats(),
+        "active_sessions": len(sessions),
+        "prediction_cache": prediction_cache.stats(),
+        "upstreams": {"simulator": simulator_client.stats(), "ml": ml_client.stats()},
+        "event_sink": dict(event_sink.metrics, queue_depth=event_sink.queue_depth()),
+        "telemetry_stream": dict(telemetry_hub.metrics, subscribers=telemetry_hub.subscriber_count()),
+        "telemetry_store": telemetry_store.metrics,
+        "telemetry_rollup": dict(telemetry_rollup.stats, series=telemetry_rollup.series_count()),
+        "health_drift": dict(health_drift.stats, machines=health_drift.machine_count())
+    })
+
 if __name__ == '__main__':
     app.run(host='0.0.0.0', port=5000, debug=True)
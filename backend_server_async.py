@@ -0,0 +1,476 @@
+"""
+Asyncio serving mode for the backend API.
+
+Same routes and JSON as backend_server.py, served by Quart on an ASGI server.
+Database access goes through asyncpg and upstream calls through httpx, so
+one worker handles thousands of concurrent dashboard polls and SSE streams
+without a thread per connection. Run with:
+
+    uvicorn backend_server_async:app --host 0.0.0.0 --port 5003
+
+Alert rules, sessions, the prediction cache and geofences are shared with the
+Flask server through services/; only the I/O differs.
+"""
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+from dotenv import load_dotenv
+from quart import Quart, Response, jsonify, request
+from quart_cors import cors
+
+from services.async_support import (AsyncConnectionPool, AsyncEventSink, AsyncTelemetryHub,
+                                    AsyncUpstreamClient, SingleFlight, create_async_registry,
+                                    insert_tasks_async, sse_stream_async)
+from services.db_pool import PoolExhaustedError
+from services.geofence import track_arrays
+from services.live_alerts import alert_rules, frame_is_for, live_status_payload, update_alerts
+from services.prediction_cache import PredictionCache, build_ml_payload, payload_key
+from services.sessions import InvalidGeofence, InvalidShiftId, Session, parse_shift_id
+from services.health_drift import HealthDriftDetector
+from services.telemetry_rollup import TelemetryRollup
+from services.telemetry_store import TelemetryStore, parse_timestamp
+from services.upstream import CircuitBreaker, CircuitOpenError, UpstreamResponseError
+
+# --- Initialization ---
+load_dotenv()
+app = cors(Quart(__name__), allow_origin="*")
+
+# --- API Endpoints Configuration ---
+ML_API_ENDPOINT = "http://127.0.0.1:5002/predict/task_duration" # ML model runs on port 5002
+ML_BATCH_API_ENDPOINT = ML_API_ENDPOINT + "/batch"
+SIMULATOR_API_ENDPOINT = "http://127.0.0.1:5001/get_current_data"
+
+# Large plans are split into chunks that are scored by concurrent ML batch calls.
+ML_BATCH_CHUNK = int(os.getenv("ML_BATCH_CHUNK", 500))
+
+UPSTREAM_ERRORS = (httpx.HTTPError, CircuitOpenError, UpstreamResponseError)
+
+simulator_client = AsyncUpstreamClient(
+    "simulator",
+    timeout=(0.5, float(os.getenv("SIMULATOR_TIMEOUT_S", 2))),
+    retries=int(os.getenv("UPSTREAM_RETRIES", 2)),
+    pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", 100)),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=5)
+)
+ml_client = AsyncUpstreamClient(
+    "ml",
+    timeout=(0.5, float(os.getenv("ML_TIMEOUT_S", 5))),
+    retries=int(os.getenv("UPSTREAM_RETRIES", 2)),
+    pool_size=int(os.getenv("UPSTREAM_POOL_SIZE", 100)),
+    breaker=CircuitBreaker(failure_threshold=5, reset_timeout=15)
+)
+
+# --- Database Configuration ---
+DB_CONFIG = {
+    "dbname": os.getenv("DB_NAME"), "user": os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"), "host": os.getenv("DB_HOST"),
+    "port": os.getenv("DB_PORT")
+}
+
+db_pool = AsyncConnectionPool(
+    DB_CONFIG,
+    minconn=int(os.getenv("DB_POOL_MIN", 1)),
+    maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+    wait_timeout=float(os.getenv("DB_POOL_WAIT_TIMEOUT", 5)),
+    max_idle=float(os.getenv("DB_POOL_MAX_IDLE", 300))
+)
+
+event_sink = AsyncEventSink(
+    db_pool,
+    spill_path=os.getenv("EVENT_SPILL_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "event_spill_async.jsonl")),
+    batch_size=int(os.getenv("EVENT_BATCH_SIZE", 500)),
+    flush_interval=float(os.getenv("EVENT_FLUSH_MS", 250)) / 1000
+)
+
+prediction_cache = PredictionCache(
+    maxsize=int(os.getenv("PREDICTION_CACHE_SIZE", 4096)),
+    ttl_seconds=float(os.getenv("PREDICTION_CACHE_TTL_S", 3600))
+)
+
+telemetry_store = TelemetryStore(
+    os.getenv("TELEMETRY_STORE_DIR", os.path.join(os.path.dirname(os.path.abspath(__file__)), "telemetry_store")),
+    flush_rows=int(os.getenv("TELEMETRY_FLUSH_ROWS", 600)),
+    flush_interval=float(os.getenv("TELEMETRY_FLUSH_S", 30)),
+    repeat_interval=float(os.getenv("TELEMETRY_SAMPLE_S", 1))
+)
+
+# Streaming 1s/1m/1h aggregates, rebuilt from the history store in the background at startup.
+telemetry_rollup = TelemetryRollup()
+threading.Thread(
+    target=telemetry_rollup.seed_from_store, args=(telemetry_store, time.time()),
+    name="rollup-seed", daemon=True
+).start()
+
+# Per-machine EWMA baselines for engine temperature and RPM; see services/health_drift.py.
+health_drift = HealthDriftDetector()
+
+async def record_telemetry(frame):
+    """
+    Keeps a history sample and updates the rollups and drift baselines; repeated
+    polls of one frame are recorded once.
+    """
+    now = time.time()
+    # True for any new sample, including ids the store can't keep as a directory name.
+    # append() only buffers; the store flushes and compacts on its own thread.
+    if telemetry_store.append(frame, ts=now):
+        telemetry_rollup.add(frame, ts=now)
+        for event in health_drift.update(frame, ts=now):
+            await submit_health_event(event)
+
+# --- Shift Sessions ---
+sessions = create_async_registry(
+    backend=os.getenv("SESSION_BACKEND", "memory"),
+    redis_url=os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+    ttl_seconds=int(os.getenv("SESSION_TTL_SECONDS", 8 * 3600))
+)
+
+async def get_session():
+    """Looks up the session named by `shift_id` or `machine_id` in the query string or JSON body."""
+    params = dict(request.args)
+    if request.is_json:
+        body = await request.get_json(silent=True)
+        if isinstance(body, dict):
+            params.update(body)
+    if params.get('shift_id') is not None:
+        return await sessions.get(parse_shift_id(params['shift_id']))
+    if params.get('machine_id') is not None:
+        return await sessions.get_by_machine(params['machine_id'])
+    return None
+
+@app.before_serving
+async def startup():
+    await db_pool.start()
+
+@app.after_serving
+async def shutdown():
+    await event_sink.stop()
+    await simulator_client.aclose()
+    await ml_client.aclose()
+    await db_pool.close()
+    await sessions.aclose()
+
+async def submit_health_event(event):
+    """Files a drift detector event under the shift currently running on its machine, if there is one."""
+    session = await sessions.get_by_machine(event['machine_id'])
+    if session is not None:
+        event_sink.submit(session.shift_id, event['type'], event)
+
+@app.errorhandler(PoolExhaustedError)
+async def handle_pool_exhausted(e):
+    print(f"Database pool exhausted: {e}")
+    return jsonify({"error": "Database is busy. Please retry shortly."}), 503
+
+@app.errorhandler(InvalidShiftId)
+async def handle_invalid_shift_id(e):
+    return jsonify({"error": str(e)}), 400
+
+@app.errorhandler(InvalidGeofence)
+async def handle_invalid_geofence(e):
+    return jsonify({"error": str(e)}), 400
+
+# --- API Endpoints ---
+@app.route('/api/login', methods=['POST'])
+async def login():
+    data = await request.get_json()
+    async with db_pool.connection() as conn:
+        shift_id = await conn.fetchval(
+            "INSERT INTO work_shifts (operator_id, machine_id) VALUES ($1, $2) RETURNING shift_id;",
+            data.get('operator_id'), data.get('machine_id')
+        )
+    await sessions.put(Session(
+        shift_id, machine_id=data.get('machine_id'), operator_id=data.get('operator_id'),
+        thresholds=alert_rules.thresholds_for(data.get('machine_id'))
+    ))
+    return jsonify({"message": "Login successful", "shift_id": shift_id}), 200
+
+@app.route('/api/schedule', methods=['POST'])
+async def post_schedule():
+    tasks = await request.get_json()
+    async with db_pool.connection() as conn, conn.transaction():
+        task_ids = await insert_tasks_async(conn, tasks)
+    return jsonify({"message": f"{len(tasks)} tasks scheduled.", "task_ids": task_ids}), 201
+
+@app.route('/api/schedule/<int:task_id>', methods=['PATCH'])
+async def update_task_inputs(task_id):
+    """Updates a scheduled task's planned load cycles and/or task_inputs; see backend_server.update_task_inputs."""
+    data = await request.get_json() or {}
+    async with db_pool.connection() as conn:
+        updated = await conn.fetchval(
+            """
+            UPDATE scheduled_tasks
+            SET load_cycles_planned = COALESCE($1, load_cycles_planned),
+                task_inputs = task_inputs || $2::jsonb
+            WHERE task_id = $3 RETURNING task_id;
+            """,
+            data.get('load_cycles_planned'), data.get('task_inputs') or {}, task_id
+        )
+    if not updated: return jsonify({"error": "Task not found"}), 404
+    return jsonify({"message": f"Task {task_id} updated."})
+
+async def request_prediction(ml_payload):
+    prediction_data, _ = await ml_client.post_json(ML_API_ENDPOINT, json=ml_payload, fallback_key=payload_key(ml_payload))
+    return prediction_data.get('predicted_duration_hours')
+
+@app.route('/api/predict_time', methods=['GET'])
+async def predict_time():
+    task_id = request.args.get('task_id', type=int)
+    if not task_id: return jsonify({"error": "task_id is required"}), 400
+
+    # Read on every call so edits made through another worker are seen.
+    async with db_pool.connection() as conn:
+        task_data = await conn.fetchrow("SELECT * FROM scheduled_tasks WHERE task_id = $1;", task_id)
+    if not task_data: return jsonify({"error": "Task not found"}), 404
+    ml_payload = build_ml_payload(task_data)
+
+    try:
+        predicted_hours = await prediction_cache.get_or_compute_async(
+            payload_key(ml_payload), lambda: request_prediction(ml_payload)
+        )
+        return jsonify({
+            "task_id": task_id,
+            "predicted_duration_hours": predicted_hours
+        })
+    except UPSTREAM_ERRORS as e:
+        print(f"Error calling ML API: {e}")
+        return jsonify({"error": "Failed to get prediction from ML model."}), 503
+
+async def request_predictions(payloads_by_task):
+    """Scores many tasks with concurrent calls to the ML batch endpoint. Returns {task_id: hours}."""
+    tasks = [dict(payload, task_id=task_id) for task_id, payload in payloads_by_task.items()]
+    chunks = [tasks[i:i + ML_BATCH_CHUNK] for i in range(0, len(tasks), ML_BATCH_CHUNK)]
+    responses = await asyncio.gather(*(
+        ml_client.post_json(ML_BATCH_API_ENDPOINT, json={"tasks": chunk}, timeout=(0.5, 30)) for chunk in chunks
+    ))
+    predictions = {}
+    for response_data, _ in responses:
+        predictions.update(response_data.get('predictions', {}))
+    return {task_id: predictions.get(str(task_id)) for task_id in payloads_by_task}
+
+@app.route('/api/predict_time/batch', methods=['GET'])
+async def predict_time_batch():
+    """
+    Predicted durations for a whole plan: pass `assigned_date` (YYYY-MM-DD) or a
+    comma-separated `task_ids` list.
+    """
+    assigned_date = request.args.get('assigned_date')
+    task_ids_arg = request.args.get('task_ids')
+    if not assigned_date and not task_ids_arg:
+        return jsonify({"error": "assigned_date or task_ids is required"}), 400
+
+    async with db_pool.connection() as conn:
+        if task_ids_arg:
+            try:
+                task_ids = [int(t) for t in task_ids_arg.split(',') if t.strip()]
+            except ValueError:
+                return jsonify({"error": "task_ids must be a comma-separated list of integers"}), 400
+            rows = await conn.fetch("SELECT * FROM scheduled_tasks WHERE task_id = ANY($1::int[]) ORDER BY task_id;", task_ids)
+        else:
+            rows = await conn.fetch("SELECT * FROM scheduled_tasks WHERE assigned_date = $1::text::date ORDER BY task_id;", assigned_date)
+
+    if not rows: return jsonify({"error": "No matching tasks found"}), 404
+
+    predictions, misses = {}, {}
+    for row in rows:
+        payload = build_ml_payload(row)
+        cached = prediction_cache.peek(payload_key(payload))
+        if cached is not None:
+            predictions[row['task_id']] = cached
+        else:
+            misses[row['task_id']] = payload
+
+    if misses:
+        try:
+            fresh = await request_predictions(misses)
+        except UPSTREAM_ERRORS as e:
+            print(f"Error calling ML batch API: {e}")
+            return jsonify({"error": "Failed to get predictions from ML model."}), 503
+        for task_id, hours in fresh.items():
+            if hours is not None:
+                prediction_cache.put(payload_key(misses[task_id]), hours)
+            predictions[task_id] = hours
+
+    return jsonify({
+        "count": len(predictions),
+        "predictions": {str(task_id): predictions[task_id] for task_id in sorted(predictions)}
+    })
+
+# Every dashboard polls the same simulator frame, so concurrent polls share one upstream request.
+sensor_flight = SingleFlight()
+
+async def fetch_sensor_data():
+    """Returns (frame, stale); stale frames are the last good reading served while the simulator is down."""
+    return await sensor_flight.run(
+        "current", lambda: simulator_client.get_json(SIMULATOR_API_ENDPOINT, fallback_key="current")
+    )
+
+async def process_telemetry_frame(sensor_data, shift_ids, changed_ids):
+    """Evaluates one ingested frame for the streamed shifts on its machine; see backend_server.process_telemetry_frame."""
+    await record_telemetry(sensor_data)
+    messages = {}
+    for shift_id in shift_ids:
+        session = await sessions.get(shift_id)
+        if session is None:
+            if shift_id in changed_ids:
+                messages[shift_id] = {"error": "Shift session expired. Please login again."}
+            continue
+        if not frame_is_for(session, sensor_data):
+            # The frame belongs to another machine; leave this shift's alerts alone.
+            if shift_id in changed_ids:
+                messages[shift_id] = {"error": f"No telemetry for machine {session.machine_id}."}
+            continue
+        new_alerts, cleared = update_alerts(session, sensor_data, event_sink.submit)
+        session.last_telemetry = sensor_data
+        await sessions.save(session)
+        if shift_id in changed_ids or new_alerts or cleared:
+            messages[shift_id] = live_status_payload(session, sensor_data, new_alerts, cleared)
+    return messages
+
+async def _fetch_frame():
+    return (await fetch_sensor_data())[0]
+
+telemetry_hub = AsyncTelemetryHub(
+    _fetch_frame, process_telemetry_frame,
+    interval=float(os.getenv("TELEMETRY_POLL_INTERVAL", 0.5))
+)
+
+@app.route('/api/live_status', methods=['GET'])
+async def get_live_status():
+    session = await get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
+    try:
+        sensor_data, stale = await fetch_sensor_data()
+    except UPSTREAM_ERRORS:
+        return jsonify({"error": "Could not connect to simulator."}), 500
+    if stale:
+        return jsonify(dict(live_status_payload(session, sensor_data, [], []), stale=True))
+    await record_telemetry(sensor_data)
+    if not frame_is_for(session, sensor_data):
+        return jsonify({"error": f"No telemetry for machine {session.machine_id}."}), 404
+    new_alerts, cleared = update_alerts(session, sensor_data, event_sink.submit)
+    session.last_telemetry = sensor_data
+    await sessions.save(session)
+    return jsonify(live_status_payload(session, sensor_data, new_alerts, cleared))
+
+@app.route('/api/stream', methods=['GET'])
+async def stream_live_status():
+    """Server-Sent Events feed of telemetry and alerts for one shift. Each client costs a coroutine, not a thread."""
+    session = await get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
+    response = Response(
+        sse_stream_async(telemetry_hub, session.shift_id),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    response.timeout = None  # Streams stay open for the whole shift.
+    return response
+
+@app.route('/api/set_task', methods=['POST'])
+async def set_task():
+    session = await get_session()
+    if session is None:
+        return jsonify({"error": "No active shift. Please login first and pass shift_id or machine_id."}), 400
+    data = await request.get_json()
+    task_id = data.get('task_id')
+    async with db_pool.connection() as conn, conn.transaction():
+        # Look up the geofence and record the active task in a single round trip;
+        # an unusable geofence raises inside the transaction and rolls it back.
+        geofence = await conn.fetchval(
+            """
+            UPDATE work_shifts SET active_task_id = t.task_id
+            FROM scheduled_tasks t
+            WHERE t.task_id = $1 AND work_shifts.shift_id = $2
+            RETURNING ST_AsText(t.geofence);
+            """,
+            task_id, session.shift_id
+        )
+        if geofence:
+            session.set_task(task_id, geofence)
+    if geofence:
+        await sessions.save(session)
+    return jsonify({"message": f"Active task set to {task_id}"})
+
+@app.route('/api/geofence/check', methods=['POST'])
+async def check_geofence_track():
+    """Checks a batch of [lon, lat] points (e.g. a replayed track) against the active task's geofence."""
+    session = await get_session()
+    if session is None or not session.geofence:
+        return jsonify({"error": "No active task with a geofence."}), 400
+    data = await request.get_json(silent=True)
+    try:
+        lons, lats = track_arrays(data.get('points') if isinstance(data, dict) else None)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    breaches = session.geofence.breaches(lons, lats)
+    return jsonify({
+        "task_id": session.task_id,
+        "breach": breaches.tolist(),
+        "breach_count": int(breaches.sum())
+    })
+
+@app.route('/api/telemetry/history', methods=['GET'])
+async def get_telemetry_history():
+    """
+    Recorded telemetry for a `machine_id` (or the rollups for an `operator_id`)
+    between `start` and `end` (epoch seconds or ISO-8601; default: the last hour).
+    `metrics` is a comma-separated subset of the stored columns. Without `step`
+    the raw samples are returned; with `step` (seconds) the answer comes from the
+    coarsest rollup resolution that fits, with min/max/mean/count per point.
+    """
+    machine_id, operator_id = request.args.get('machine_id'), request.args.get('operator_id')
+    if not machine_id and not operator_id:
+        return jsonify({"error": "machine_id or operator_id is required"}), 400
+    kind, key_id = ("machine", machine_id) if machine_id else ("operator", operator_id)
+    try:
+        end = parse_timestamp(request.args['end']) if request.args.get('end') else time.time()
+        start = parse_timestamp(request.args['start']) if request.args.get('start') else end - 3600
+        step = request.args.get('step', type=float)
+        metrics = [m for m in request.args.get('metrics', '').split(',') if m] or None
+        if step is not None or kind == "operator":
+            history = telemetry_rollup.query(kind, key_id, start, end, step=step, metrics=metrics)
+            source = f"rollup_{history.pop('resolution')}s"
+        else:
+            # Chunk reads are file I/O; keep them off the event loop.
+            history = await asyncio.to_thread(telemetry_store.query, key_id, start, end, metrics=metrics)
+            source = "raw"
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({kind + "_id": key_id, "start": start, "end": end, "step": step, "source": source,
+                    "count": len(history["ts"]), "history": history})
+
+@app.route('/api/health/drift', methods=['GET'])
+async def get_health_drift():
+    """
+    Streaming health state of a `machine_id`: per metric, the baseline and recent
+    level, noise deviation, rate of change and active SPIKE/DRIFT/RATE events,
+    plus its most recent raised/cleared events (`limit`, default 50).
+    """
+    machine_id = request.args.get('machine_id')
+    if not machine_id:
+        return jsonify({"error": "machine_id is required"}), 400
+    state = health_drift.snapshot(machine_id)
+    if state is None:
+        return jsonify({"error": "No telemetry seen for this machine yet."}), 404
+    state["events"] = health_drift.events(machine_id, limit=request.args.get('limit', 50, type=int))
+    return jsonify(state)
+
+@app.route('/api/metrics', methods=['GET'])
+async def get_metrics():
+    return jsonify({
+        "db_pool": db_pool.stats(),
+        "active_sessions": await sessions.count(),
+        "prediction_cache": prediction_cache.stats(),
+        "upstreams": {"simulator": dict(simulator_client.stats(), coalescing=sensor_flight.metrics), "ml": ml_client.stats()},
+        "event_sink": dict(event_sink.metrics, queue_depth=event_sink.queue_depth()),
+        "telemetry_stream": dict(telemetry_hub.metrics, subscribers=telemetry_hub.subscriber_count()),
+        "telemetry_store": telemetry_store.metrics,
+        "telemetry_rollup": dict(telemetry_rollup.stats, series=telemetry_rollup.series_count()),
+        "health_drift": dict(health_drift.stats, machines=health_drift.machine_count())
+    })
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=5003)
@@ -0,0 +1,105 @@
+"""
+Start-up time and memory of the AnalyticsModule services.
+
+Each service is imported in a fresh subprocess and measured twice: right
+after import (what a worker costs before serving anything) and after its
+first request (when the model registry has loaded what that endpoint needs).
+RSS is the resident set; PSS splits shared pages between the processes
+mapping them, so it shows what memory-mapped model files save when several
+services or workers run side by side. Run with --mmap-mode "" to compare
+against plain joblib loading.
+
+    python benchmarks/analytics_service_footprint.py
+    python benchmarks/analytics_service_footprint.py --mmap-mode "" --services est_time_api
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+ANALYTICS_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule'))
+
+TASK = {'Machine_ID': 'EXC001', 'Operator_ID': 'OP1002', 'RPM': 1500, 'Task_Type': 'Digging', 'Soil_Type': 'Clay',
+        'Terrain': 'Flat', 'Load_Cycles': 12, 'Temperature_C': 90, 'Precipitation_mm': 0}
+READING = {'RPM': 850, 'Engine_Hours': 1800, 'Fuel_Used': 18.0, 'Load_Cycles': 0, 'Idling_Time': 60,
+           'Temperature_C': 98, 'Precipitation_mm': 0}
+
+# service module -> (method, path, JSON body) of the request that exercises its model(s)
+SERVICES = {
+    'est_time_api': ('POST', '/predict/task_duration', TASK),
+    'actionable_insights_api': ('POST', '/predict/machine_health', READING),
+    'fin_app': ('POST', '/api/estimate_time', TASK),
+    'app': ('GET', '/api/profiler_data', None),
+}
+
+# Runs inside the subprocess; prints one JSON line.
+PROBE = r'''
+import json, os, sys, time, warnings
+warnings.filterwarnings('ignore')
+
+def memory():
+    out = {}
+    with open('/proc/self/status') as f:
+        for line in f:
+            if line.startswith('VmRSS:'):
+                out['rss_mb'] = int(line.split()[1]) / 1024
+    try:
+        with open('/proc/self/smaps_rollup') as f:
+            for line in f:
+                if line.startswith('Pss:'):
+                    out['pss_mb'] = int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return out
+
+module, method, path, body = sys.argv[1], sys.argv[2], sys.argv[3], json.loads(sys.argv[4])
+start = time.perf_counter()
+service = __import__(module)
+result = {'import_s': time.perf_counter() - start, 'after_import': memory()}
+readiness = getattr(service, 'readiness', None)
+if readiness is not None:
+    readiness.wait(120)
+    result['ready_s'] = time.perf_counter() - start
+client = service.app.test_client()
+start = time.perf_counter()
+response = client.open(path, method=method, json=body)
+result['first_request_s'] = time.perf_counter() - start
+result['status'] = response.status_code
+result['after_first_request'] = memory()
+print('RESULT ' + json.dumps(result))
+'''
+
+
+def measure(module, mmap_mode):
+    method, path, body = SERVICES[module]
+    env = dict(os.environ, MODEL_MMAP_MODE=mmap_mode)
+    proc = subprocess.run(
+        [sys.executable, '-c', PROBE, module, method, path, json.dumps(body)],
+        cwd=ANALYTICS_DIR, env=env, capture_output=True, text=True, timeout=300,
+    )
+    for line in proc.stdout.splitlines():
+        if line.startswith('RESULT '):
+            return json.loads(line[len('RESULT '):])
+    raise RuntimeError(f"{module} failed:\n{proc.stderr[-2000:]}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--services', nargs='+', default=list(SERVICES), choices=list(SERVICES))
+    parser.add_argument('--mmap-mode', default='r', help='joblib mmap_mode for the model registry ("" disables it)')
+    args = parser.parse_args()
+
+    print(f"mmap_mode={args.mmap_mode or None}")
+    print(f"{'service':<24} {'import s':>9} {'ready s':>8} {'rss MB':>7} {'pss MB':>7} "
+          f"{'1st req s':>9} {'status':>6} {'rss MB':>7} {'pss MB':>7}")
+    for module in args.services:
+        r = measure(module, args.mmap_mode)
+        before, after = r['after_import'], r['after_first_request']
+        print(f"{module:<24} {r['import_s']:>9.2f} {r.get('ready_s', r['import_s']):>8.2f} "
+              f"{before['rss_mb']:>7.1f} {before.get('pss_mb', 0):>7.1f} "
+              f"{r['first_request_s']:>9.2f} {r['status']:>6} {after['rss_mb']:>7.1f} {after.get('pss_mb', 0):>7.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""
+Throughput and detection quality of the streaming health drift detector.
+
+Simulates `--machines` machines reporting engine temperature and RPM once a
+second for `--seconds` seconds. A fraction of them develop a fault halfway
+through: a slow temperature drift, an RPM level shift or a fast temperature
+ramp; everyone else only has sensor noise and the odd single-sample RPM
+glitch (which should raise SPIKE and nothing else). The whole fleet is fed
+one tick at a time through HealthDriftDetector.update_arrays, then a sample
+of ticks through the per-frame path the backend uses (`update(frame)`).
+
+    python benchmarks/health_drift_bench.py
+    python benchmarks/health_drift_bench.py --machines 20000 --seconds 900 --faulty 0.02
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from services.health_drift import HealthDriftDetector  # noqa: E402
+
+FAULTS = ("temp_drift", "rpm_shift", "temp_ramp")
+
+FRAME = {
+    "identity": {"machine_id": "", "operator_id": "OP1002"},
+    "status": {"ignition_on": True, "is_idling": False, "engine_hours": 435.2, "fuel_percent": 65,
+               "engine_temperature_celsius": 95.5, "engine_rpm": 800},
+}
+
+
+def simulate(machines, seconds, faulty, seed=0):
+    """(values[t, machine, metric], fault kind per machine or '', fault start second)."""
+    rng = np.random.default_rng(seed)
+    base_temp = rng.uniform(85, 100, machines)
+    base_rpm = rng.uniform(800, 1900, machines)
+    temp = base_temp + rng.normal(0, 0.3, (seconds, machines))
+    rpm = base_rpm + rng.normal(0, 20, (seconds, machines))
+    glitches = rng.random((seconds, machines)) < 1e-3
+    rpm[glitches] += 2500
+
+    kinds = np.full(machines, '', dtype=object)
+    chosen = rng.choice(machines, int(machines * faulty), replace=False)
+    kinds[chosen] = rng.choice(FAULTS, len(chosen))
+    start = seconds // 2
+    elapsed = np.arange(seconds - start)[:, None]
+    temp[start:, kinds == "temp_drift"] += 0.02 * elapsed                        # 1.2 degC per minute
+    rpm[start:, kinds == "rpm_shift"] += 400
+    temp[start:, kinds == "temp_ramp"] += np.minimum(elapsed, 30) * 1.0          # 30 degC in 30 s
+    return np.stack([temp, rpm], axis=-1), kinds, start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--machines', type=int, default=5000)
+    parser.add_argument('--seconds', type=int, default=600)
+    parser.add_argument('--faulty', type=float, default=0.01, help='fraction of machines that develop a fault')
+    parser.add_argument('--frame-ticks', type=int, default=20, help='ticks replayed through update(frame)')
+    args = parser.parse_args()
+
+    values, kinds, start = simulate(args.machines, args.seconds, args.faulty)
+    ids = [f"M{i:06d}" for i in range(args.machines)]
+    detector = HealthDriftDetector()
+
+    first_event = {}  # machine -> (second, type) of its first non-SPIKE event after the fault start
+    elapsed = 0.0
+    for t in range(args.seconds):
+        started = time.perf_counter()
+        events = detector.update_arrays(ids, np.full(args.machines, float(t)), values[t])
+        elapsed += time.perf_counter() - started
+        for e in events:
+            if e["state"] == "raised" and not e["type"].endswith("SPIKE"):
+                first_event.setdefault(e["machine_id"], (t, e["type"]))
+
+    samples = args.machines * args.seconds
+    print(f"machines={args.machines} seconds={args.seconds} faulty={int((kinds != '').sum())}")
+    print(f"fleet ticks (update_arrays): {samples / elapsed:,.0f} samples/s   "
+          f"{elapsed / args.seconds * 1000:.2f} ms per {args.machines}-machine tick   "
+          f"events raised {detector.stats['raised']}")
+
+    index = {machine_id: i for i, machine_id in enumerate(ids)}
+    for fault in FAULTS:
+        members = np.flatnonzero(kinds == fault)
+        delays = [first_event[ids[i]][0] - start for i in members if ids[i] in first_event and first_event[ids[i]][0] >= start]
+        print(f"  {fault:<10} detected {len(delays)}/{len(members)}   "
+              f"median delay {np.median(delays) if delays else float('nan'):.0f} s")
+    false_alarms = sum(1 for machine_id in first_event if kinds[index[machine_id]] == '')
+    print(f"  healthy machines with a DRIFT/RATE event: {false_alarms}/{int((kinds == '').sum())}")
+
+    # The backend's live path: one frame dict per machine per poll.
+    frames = []
+    for machine_id in ids:
+        frame = copy.deepcopy(FRAME)
+        frame["identity"]["machine_id"] = machine_id
+        frames.append(frame)
+    single = HealthDriftDetector()
+    ticks = min(args.frame_ticks, args.seconds)
+    started = time.perf_counter()
+    for t in range(ticks):
+        for i, frame in enumerate(frames):
+            frame["status"]["engine_temperature_celsius"], frame["status"]["engine_rpm"] = values[t, i]
+            single.update(frame, ts=float(t))
+    per_frame = (time.perf_counter() - started) / (ticks * args.machines)
+    print(f"per-frame path (update):     {1 / per_frame:,.0f} frames/s   {per_frame * 1e6:.1f} us per frame")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Actionable-insight rules: per-row Python `if` chains vs. the vectorized insight_rules module.
+
+The legacy path is the function the services used to carry, applied the way
+they applied it: to `df.iloc[i]` Series one row at a time. The vectorized
+path is insight_rules.evaluate_insights over the whole DataFrame. Checks both
+give the same message for every row, then times them at several sizes, plus
+the single-reading case the servers hit on every request.
+
+    python benchmarks/insight_rules_bench.py
+    python benchmarks/insight_rules_bench.py --rows 1000 100000 --repeat 3
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule')))
+
+from insight_rules import evaluate_insights, get_actionable_insight  # noqa: E402
+
+
+def legacy_insight(data_row):
+    """The copy previously in fin_app.py."""
+    if data_row['Fuel_Used'] > 15 and data_row['RPM'] < 900:
+        return "High fuel use at low RPM detected. Check for potential fluid leaks."
+    if data_row['Temperature_C'] > 140 and data_row['Load_Cycles'] < 5:
+        return "Engine overheating under light load. Check radiator for debris blockage."
+    if data_row['RPM'] > 2000 and data_row['Load_Cycles'] == 0:
+        return "High engine speed with no load. Avoid excessive throttle when not actively working to save fuel."
+    return "General machine health anomaly detected. Recommend a standard systems check."
+
+
+def make_readings(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({
+        'RPM': rng.integers(750, 2400, n).astype(float),
+        'Engine_Hours': rng.uniform(800, 2200, n),
+        'Fuel_Used': rng.uniform(1, 20, n),
+        'Load_Cycles': rng.integers(0, 8, n).astype(float),
+        'Idling_Time': rng.uniform(0, 60, n),
+        'Temperature_C': rng.uniform(85, 155, n),
+        'Precipitation_mm': rng.choice([0.0, 2.5], n),
+    })
+
+
+def timed(call, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = call()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+    parser.add_argument('--legacy-max-rows', type=int, default=100000, help='skip the per-row path above this size')
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>8} {'per-row s':>10} {'vectorized s':>13} {'speed-up':>9}   rule mix")
+    for n in args.rows:
+        df = make_readings(n)
+        fast, (codes, messages) = timed(lambda: evaluate_insights(df), args.repeat)
+        mix = ', '.join(f"{code} {count}" for code, count in zip(*np.unique(codes.astype(str), return_counts=True)))
+        if n > args.legacy_max_rows:
+            print(f"{n:>8} {'-':>10} {fast:>13.4f} {'-':>9}   {mix}")
+            continue
+        slow, expected = timed(lambda: [legacy_insight(df.iloc[i]) for i in range(n)], 1)
+        assert list(messages) == expected, "vectorized rules disagree with the per-row rules"
+        print(f"{n:>8} {slow:>10.4f} {fast:>13.4f} {slow / fast:>8.0f}x   {mix}")
+
+    reading = make_readings(1).iloc[0].to_dict()
+    row = pd.Series(reading)
+    loops = 2000
+    legacy_us = timed(lambda: [legacy_insight(row) for _ in range(loops)], args.repeat)[0] / loops * 1e6
+    shared_us = timed(lambda: [get_actionable_insight(reading) for _ in range(loops)], args.repeat)[0] / loops * 1e6
+    print(f"single reading: per-row on a Series {legacy_us:.1f} us, insight_rules on the dict {shared_us:.1f} us")
+
+
+if __name__ == '__main__':
+    main()
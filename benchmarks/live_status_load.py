@@ -0,0 +1,111 @@
+"""
+Load test for /api/live_status and /api/stream.
+
+Opens `--concurrency` simulated dashboards against each base URL and reports
+throughput, latency percentiles and errors, so the Flask server
+(backend_server.py, port 5000) and the ASGI server (backend_server_async.py,
+port 5003) can be compared under the same load. Each dashboard logs in once
+to get its own shift on `--machine-id` (the simulator's machine, so every
+request gets real telemetry), unless --shift-id pins all of them to an
+existing one.
+
+    python benchmarks/live_status_load.py --url http://127.0.0.1:5000 --url http://127.0.0.1:5003
+    python benchmarks/live_status_load.py --url http://127.0.0.1:5003 --concurrency 2000 --mode stream
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def login(client, url, i, machine_id):
+    response = await client.post(f"{url}/api/login", json={"operator_id": f"OP{1000 + i % 10}", "machine_id": machine_id})
+    response.raise_for_status()
+    return response.json()["shift_id"]
+
+
+async def poll_worker(client, url, shift_id, deadline, interval, latencies, errors):
+    while time.monotonic() < deadline:
+        started = time.perf_counter()
+        try:
+            response = await client.get(f"{url}/api/live_status", params={"shift_id": shift_id})
+            if response.status_code != 200:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+            else:
+                latencies.append((time.perf_counter() - started) * 1000)
+        except httpx.HTTPError as e:
+            errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+        if interval:
+            await asyncio.sleep(interval)
+
+
+async def stream_worker(client, url, shift_id, deadline, latencies, errors):
+    """Holds one SSE connection open; records the gap between consecutive frames."""
+    try:
+        async with client.stream("GET", f"{url}/api/stream", params={"shift_id": shift_id}) as response:
+            if response.status_code != 200:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                return
+            last = time.perf_counter()
+            async for line in response.aiter_lines():
+                if line.startswith("data:"):
+                    now = time.perf_counter()
+                    latencies.append((now - last) * 1000)
+                    last = now
+                if time.monotonic() >= deadline:
+                    return
+    except httpx.HTTPError as e:
+        errors[type(e).__name__] = errors.get(type(e).__name__, 0) + 1
+
+
+def percentile(values, q):
+    return values[min(len(values) - 1, int(len(values) * q))] if values else float("nan")
+
+
+async def run(url, args):
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=args.timeout) as client:
+        if args.shift_id is not None:
+            shift_ids = [args.shift_id] * args.concurrency
+        else:
+            shift_ids = await asyncio.gather(*(login(client, url, i, args.machine_id) for i in range(args.concurrency)))
+
+        latencies, errors = [], {}
+        deadline = time.monotonic() + args.duration
+        started = time.perf_counter()
+        if args.mode == "poll":
+            workers = [poll_worker(client, url, s, deadline, args.interval, latencies, errors) for s in shift_ids]
+        else:
+            workers = [stream_worker(client, url, s, deadline, latencies, errors) for s in shift_ids]
+        await asyncio.gather(*workers)
+        elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    label = "frame gap" if args.mode == "stream" else "latency"
+    print(f"\n{url}  mode={args.mode}  clients={args.concurrency}  duration={elapsed:.1f}s")
+    print(f"  {'frames' if args.mode == 'stream' else 'requests'}/sec: {len(latencies) / elapsed:,.0f}  ok={len(latencies):,}  errors={errors or 0}")
+    if latencies:
+        print(f"  {label} ms: p50={percentile(latencies, 0.50):.1f}  p95={percentile(latencies, 0.95):.1f}  "
+              f"p99={percentile(latencies, 0.99):.1f}  max={latencies[-1]:.1f}  mean={statistics.fmean(latencies):.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", action="append", help="Backend base URL; repeat to compare servers.")
+    parser.add_argument("--mode", choices=["poll", "stream"], default="poll")
+    parser.add_argument("--concurrency", type=int, default=200)
+    parser.add_argument("--duration", type=float, default=20.0)
+    parser.add_argument("--interval", type=float, default=0.0, help="Pause between polls per client (the dashboard uses 2s).")
+    parser.add_argument("--timeout", type=float, default=30.0)
+    parser.add_argument("--machine-id", default="EXC001",
+                        help="Machine the dashboards log in on; live_status answers 404 for machines the simulator doesn't report.")
+    parser.add_argument("--shift-id", type=int, help="Reuse one existing shift instead of logging in per client.")
+    args = parser.parse_args()
+    for url in args.url or ["http://127.0.0.1:5000", "http://127.0.0.1:5003"]:
+        asyncio.run(run(url.rstrip("/"), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Throughput of machine health scoring: one request per reading vs. the batch endpoint.
+
+Sends `--readings` synthetic sensor readings to actionable_insights_api
+through Flask's test client: first a sample of them one POST
+/predict/machine_health at a time (extrapolated to the full count), then all
+of them in one POST /predict/machine_health/batch as a JSON list and as
+NDJSON. Checks that the batch results match the single-reading endpoint.
+
+    python benchmarks/machine_health_batch_bench.py
+    python benchmarks/machine_health_batch_bench.py --readings 200000 --chunk-size 8192
+"""
+import argparse
+import io
+import json
+import os
+import random
+import sys
+import time
+import warnings
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule')))
+warnings.filterwarnings('ignore')
+
+
+def make_reading(rng):
+    return {
+        'RPM': rng.randrange(750, 2400), 'Engine_Hours': round(rng.uniform(800, 2200), 1),
+        'Fuel_Used': round(rng.uniform(1, 20), 2), 'Load_Cycles': rng.randrange(0, 20),
+        'Idling_Time': round(rng.uniform(0, 60), 1), 'Temperature_C': round(rng.uniform(85, 155), 1),
+        'Precipitation_mm': rng.choice([0.0, 0.0, 0.0, 2.5]),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--readings', type=int, default=50000)
+    parser.add_argument('--single-sample', type=int, default=300, help='readings sent one request at a time')
+    parser.add_argument('--chunk-size', type=int, help='override HEALTH_BATCH_CHUNK_SIZE')
+    args = parser.parse_args()
+
+    import actionable_insights_api as service
+    if args.chunk_size:
+        service.BATCH_CHUNK_SIZE = args.chunk_size
+    client = service.app.test_client()
+    rng = random.Random(0)
+    readings = [make_reading(rng) for _ in range(args.readings)]
+    service.get_model()
+
+    sample = readings[:args.single_sample]
+    start = time.perf_counter()
+    with redirect_stdout(io.StringIO()):  # the single endpoint prints every reading
+        single = [client.post('/predict/machine_health', json=r).get_json() for r in sample]
+    per_reading = (time.perf_counter() - start) / len(sample)
+
+    start = time.perf_counter()
+    lines = client.post('/predict/machine_health/batch', json=readings).get_data(as_text=True).splitlines()
+    batch_json = time.perf_counter() - start
+
+    body = ''.join(json.dumps(r) + '\n' for r in readings)
+    start = time.perf_counter()
+    ndjson_lines = client.post('/predict/machine_health/batch', data=body,
+                               content_type='application/x-ndjson').get_data(as_text=True).splitlines()
+    batch_ndjson = time.perf_counter() - start
+
+    results = [json.loads(line) for line in lines[:len(sample)]]
+    mismatches = sum(
+        (r['status'], r['anomaly_score'], r['actionable_insight']) != (s['status'], s['anomaly_score'], s['actionable_insight'])
+        for r, s in zip(results, single)
+    )
+    assert len(lines) == len(ndjson_lines) == len(readings)
+
+    total_single = per_reading * len(readings)
+    print(f"readings={len(readings)} chunk_size={service.BATCH_CHUNK_SIZE}")
+    print(f"{'single requests':<16} {total_single:>8.2f} s (extrapolated from {len(sample)})   "
+          f"{len(readings) / total_single:>9.0f} readings/s")
+    print(f"{'batch JSON':<16} {batch_json:>8.2f} s   {len(readings) / batch_json:>9.0f} readings/s   "
+          f"{total_single / batch_json:.0f}x")
+    print(f"{'batch NDJSON':<16} {batch_ndjson:>8.2f} s   {len(readings) / batch_ndjson:>9.0f} readings/s   "
+          f"{total_single / batch_ndjson:.0f}x")
+    print(f"mismatches vs single endpoint: {mismatches}/{len(sample)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,83 @@
+"""
+Benchmark for building operator profiles from shift records.
+
+Generates synthetic shift records shaped like fin_synthetic_machine_data.csv
+and times the original lambda-based groupby against the shared vectorized
+implementation in AnalyticsModule/operator_features.py, checking that both
+produce the same profiles. Operator_ID and Safety_Alert_Triggered are
+generated as categoricals so the largest size fits in memory.
+
+    python benchmarks/operator_profile_bench.py
+    python benchmarks/operator_profile_bench.py --sizes 2000 1000000 50000000 --operators 500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule')))
+from operator_features import build_operator_profiles
+
+
+def make_records(n, operators, seed=42):
+    rng = np.random.default_rng(seed)
+    operator_ids = pd.Categorical.from_codes(
+        rng.integers(0, operators, n, dtype=np.int32), categories=[f"OP{1000 + i}" for i in range(operators)]
+    )
+    return pd.DataFrame({
+        "Operator_ID": operator_ids,
+        "Engine_Hours": rng.uniform(1000, 2000, n),
+        "Fuel_Used": rng.uniform(5, 25, n).astype(np.float32),
+        "Load_Cycles": rng.integers(0, 30, n, dtype=np.int32),
+        "Idling_Time": rng.integers(0, 60, n, dtype=np.int32),
+        "Safety_Alert_Triggered": pd.Categorical.from_codes(
+            (rng.random(n) < 0.1).astype(np.int8), categories=["No", "Yes"]
+        ),
+    })
+
+
+def legacy_profiles(df):
+    """The groupby that fin_app.py, app.py and the MiscScripts used to carry."""
+    total_hours = df.groupby('Operator_ID', observed=True)['Engine_Hours'].apply(lambda x: x.max() - x.min()).replace(0, 1)
+    operator_profiles = df.groupby('Operator_ID', observed=True).agg(
+        total_load_cycles=('Load_Cycles', 'sum'),
+        total_fuel_used=('Fuel_Used', 'sum'),
+        total_idling_time_min=('Idling_Time', 'sum'),
+        total_safety_alerts=('Safety_Alert_Triggered', lambda x: (x == 'Yes').sum())
+    ).reset_index()
+    operator_profiles = operator_profiles.merge(total_hours.rename('total_engine_hours'), on='Operator_ID')
+    operator_profiles['fuel_per_load_cycle'] = (operator_profiles['total_fuel_used'] / operator_profiles['total_load_cycles']).replace([np.inf, -np.inf], 0)
+    operator_profiles['idling_ratio'] = (operator_profiles['total_idling_time_min'] / 60 / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
+    operator_profiles['safety_incident_rate'] = (operator_profiles['total_safety_alerts'] / operator_profiles['total_engine_hours']).replace([np.inf, -np.inf], 0)
+    return operator_profiles
+
+
+def timed(fn, df):
+    start = time.perf_counter()
+    result = fn(df)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2000, 1_000_000, 50_000_000])
+    parser.add_argument("--operators", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10}  {'path':<10}  {'seconds':>9}  {'rows/sec':>12}")
+    for n in args.sizes:
+        df = make_records(n, args.operators)
+        vectorized, elapsed = timed(build_operator_profiles, df)
+        print(f"{n:>10}  {'vectorized':<10}  {elapsed:>9.3f}  {n / elapsed:>12.0f}")
+        legacy, elapsed = timed(legacy_profiles, df)
+        print(f"{n:>10}  {'lambda':<10}  {elapsed:>9.3f}  {n / elapsed:>12.0f}")
+        legacy['Operator_ID'] = legacy['Operator_ID'].astype(object)
+        pd.testing.assert_frame_equal(legacy, vectorized[legacy.columns], check_dtype=False, rtol=1e-6)
+        del df
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+Benchmark for the /api/schedule ingest paths.
+
+Inserts synthetic tasks with the original row-by-row INSERT, the multi-row
+VALUES path and the COPY staging path, and prints rows/sec for each size.
+Every run happens inside a transaction that is rolled back, so the database
+is left untouched. Requires the same DB_* environment variables as
+backend_server.py.
+
+    python benchmarks/schedule_ingest_bench.py
+    python benchmarks/schedule_ingest_bench.py --sizes 10 1000 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+import psycopg2
+from dotenv import load_dotenv
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+from services.schedule_ingest import insert_tasks_copy, insert_tasks_rowwise, insert_tasks_values
+
+# The row-by-row path is skipped above this size; it would take minutes.
+ROWWISE_MAX = 5000
+
+
+def make_tasks(n):
+    rng = random.Random(42)
+    tasks = []
+    for _ in range(n):
+        lon, lat = 76.9558 + rng.random() * 0.01, 11.0168 + rng.random() * 0.01
+        tasks.append({
+            "assigned_date": "2025-07-18",
+            "operator_id": f"OP{1000 + rng.randrange(10)}",
+            "machine_id": f"EXC{rng.randrange(1, 201):03d}",
+            "task_type": rng.choice(["Digging", "Trenching", "Compacting", "Loading"]),
+            "load_cycles_planned": rng.randrange(10, 80),
+            "geofence_points": [
+                [lon, lat], [lon + 0.001, lat], [lon + 0.001, lat + 0.001], [lon, lat + 0.001], [lon, lat]
+            ],
+            "task_inputs": {"soil_type": "Clay", "terrain": "Flat"}
+        })
+    return tasks
+
+
+def time_path(conn, insert_fn, tasks):
+    with conn.cursor() as cur:
+        start = time.perf_counter()
+        task_ids = insert_fn(cur, tasks)
+        elapsed = time.perf_counter() - start
+    conn.rollback()
+    assert len(task_ids) == len(tasks)
+    assert task_ids == sorted(task_ids), "task_ids must follow input order"
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 1000, 50000])
+    args = parser.parse_args()
+
+    load_dotenv()
+    conn = psycopg2.connect(
+        dbname=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"), host=os.getenv("DB_HOST"),
+        port=os.getenv("DB_PORT")
+    )
+    paths = [("rowwise", insert_tasks_rowwise), ("values", insert_tasks_values), ("copy", insert_tasks_copy)]
+
+    print(f"{'tasks':>8}  {'path':<8}  {'seconds':>9}  {'rows/sec':>10}")
+    for n in args.sizes:
+        tasks = make_tasks(n)
+        for name, fn in paths:
+            if name == "rowwise" and n > ROWWISE_MAX:
+                print(f"{n:>8}  {name:<8}  {'skipped':>9}  {'-':>10}")
+                continue
+            elapsed = time_path(conn, fn, tasks)
+            print(f"{n:>8}  {name:<8}  {elapsed:>9.3f}  {n / elapsed:>10.0f}")
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
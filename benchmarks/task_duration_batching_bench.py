@@ -0,0 +1,121 @@
+"""
+Throughput of single-task duration predictions, with and without micro-batching.
+
+By default runs in-process: `--concurrency` threads issue single-task
+predictions for `--duration` seconds, first each calling the model directly
+(what est_time_api did per request), then through the MicroBatcher. With
+--url it load-tests a running est_time_api instead (start it once with
+PREDICT_BATCH_MAX_SIZE=1 and once without to compare).
+
+    python benchmarks/task_duration_batching_bench.py
+    python benchmarks/task_duration_batching_bench.py --concurrency 64 --max-batch-size 128 --max-wait-ms 2
+    python benchmarks/task_duration_batching_bench.py --url http://127.0.0.1:5001 --concurrency 32
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import threading
+import time
+import warnings
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule')))
+warnings.filterwarnings('ignore')
+
+
+def make_task(rng):
+    return {
+        'Machine_ID': f"EXC{rng.randrange(1, 6):03d}", 'Operator_ID': f"OP{rng.randrange(1001, 1006)}",
+        'RPM': rng.randrange(800, 2300), 'Task_Type': rng.choice(['Digging', 'Loading', 'Compacting', 'Grading', 'Trenching']),
+        'Soil_Type': rng.choice(['Clay', 'Gravel', 'Rock', 'Sand', 'Loam']), 'Terrain': rng.choice(['Flat', 'Incline', 'Steep']),
+        'Load_Cycles': rng.randrange(0, 30), 'Temperature_C': round(rng.uniform(80, 120), 2), 'Precipitation_mm': 0.0,
+    }
+
+
+def run_load(call, concurrency, duration):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        local = []
+        while time.monotonic() < deadline:
+            task = make_task(rng)
+            started = time.perf_counter()
+            try:
+                call(task)
+                local.append((time.perf_counter() - started) * 1000)
+            except Exception:
+                with lock:
+                    errors[0] += 1
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return latencies, errors[0], time.perf_counter() - started
+
+
+def report(label, latencies, errors, elapsed):
+    if not latencies:
+        print(f"{label:<12} no successful requests ({errors} errors)")
+        return 0.0
+    latencies.sort()
+    rps = len(latencies) / elapsed
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(f"{label:<12} {rps:>9.1f} req/s   p50 {statistics.median(latencies):>7.2f} ms   "
+          f"p99 {p99:>7.2f} ms   errors {errors}")
+    return rps
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-batch-size', type=int, default=64)
+    parser.add_argument('--max-wait-ms', type=float, default=5.0)
+    parser.add_argument('--url', help='base URL of a running est_time_api; skips the in-process comparison')
+    args = parser.parse_args()
+
+    if args.url:
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=args.concurrency, pool_maxsize=args.concurrency)
+        session.mount('http://', adapter)
+
+        def call(task):
+            response = session.post(f"{args.url}/predict/task_duration", json=task, timeout=30)
+            response.raise_for_status()
+
+        report('http', *run_load(call, args.concurrency, args.duration))
+        print(session.get(f"{args.url}/predict/task_duration/metrics", timeout=5).json())
+        return
+
+    from feature_pipeline import task_duration_input
+    from micro_batcher import MicroBatcher
+    from model_registry import registry
+
+    model = registry.get('task_duration')
+
+    def direct(task):
+        return model.predict(task_duration_input([task]))[0]
+
+    batcher = MicroBatcher(lambda records: model.predict(task_duration_input(records)),
+                           args.max_batch_size, args.max_wait_ms)
+
+    print(f"concurrency={args.concurrency} duration={args.duration}s "
+          f"max_batch_size={args.max_batch_size} max_wait_ms={args.max_wait_ms}")
+    direct_rps = report('direct', *run_load(direct, args.concurrency, args.duration))
+    batched_rps = report('batched', *run_load(batcher.predict_one, args.concurrency, args.duration))
+    if direct_rps:
+        print(f"speed-up: {batched_rps / direct_rps:.1f}x   mean batch size: {batcher.metrics()['mean_batch_size']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+"""
+Latency of the task duration model: fitted pipeline vs. its compiled NumPy export.
+
+Times `model_pipeline.predict(task_duration_input(rows))` (what the servers
+ran per request) against `CompiledForestPipeline.predict(rows)` for several
+batch sizes of dict records, and checks the two agree on every row. The
+model is compiled in memory from fin_task_duration_model.joblib, so this
+does not need MiscScripts/fin_compileTimeEst.py to have been run.
+
+    python benchmarks/task_duration_compiled_bench.py
+    python benchmarks/task_duration_compiled_bench.py --batch-sizes 1 8 256 --repeat 50
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import warnings
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'AnalyticsModule')))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+warnings.filterwarnings('ignore')
+
+from task_duration_batching_bench import make_task  # noqa: E402
+
+
+def best_of(call, repeat):
+    """Median wall time of `repeat` calls, in milliseconds."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        call()
+        times.append((time.perf_counter() - start) * 1000)
+    return float(np.median(times))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--batch-sizes', type=int, nargs='+', default=[1, 16, 64, 1024])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    from compiled_pipeline import compile_pipeline
+    from feature_pipeline import task_duration_input
+    from model_registry import registry
+
+    pipeline = registry.get('task_duration')
+    start = time.perf_counter()
+    compiled = compile_pipeline(pipeline)
+    print(f"compiled {compiled.n_trees} trees / {len(compiled.left)} nodes in {time.perf_counter() - start:.3f}s")
+
+    rng = random.Random(0)
+    print(f"{'rows':>6} {'pipeline ms':>12} {'compiled ms':>12} {'speed-up':>9} {'max abs diff':>13}")
+    for size in args.batch_sizes:
+        rows = [make_task(rng) for _ in range(size)]
+        diff = float(np.max(np.abs(pipeline.predict(task_duration_input(rows)) - compiled.predict(rows))))
+        slow = best_of(lambda: pipeline.predict(task_duration_input(rows)), args.repeat)
+        fast = best_of(lambda: compiled.predict(rows), args.repeat)
+        print(f"{size:>6} {slow:>12.3f} {fast:>12.3f} {slow / fast:>8.1f}x {diff:>13.2e}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,146 @@
+# services/alert_rules.py
+import operator
+import re
+
+import numpy as np
+
+_OPS = {
+    "<": operator.lt, "<=": operator.le, ">": operator.gt,
+    ">=": operator.ge, "==": operator.eq, "!=": operator.ne
+}
+
+# Flat metric name -> how to read it from a simulator telemetry frame.
+METRIC_EXTRACTORS = {
+    "proximity_min_m": lambda f: min(f['safety']['proximity_meters'].values()),
+    "noise_db": lambda f: f['environment']['noise_db'],
+    "dust_aqi": lambda f: f['environment']['dust_aqi'],
+    "air_quality_ppm": lambda f: f['environment']['air_quality_ppm'],
+    "engine_temp_c": lambda f: f['status']['engine_temperature_celsius'],
+    "engine_rpm": lambda f: f['status']['engine_rpm'],
+    "fuel_percent": lambda f: f['status']['fuel_percent'],
+    "ignition_on": lambda f: f['status']['ignition_on'],
+    "is_idling": lambda f: f['status']['is_idling'],
+    "seatbelt_buckled": lambda f: f['safety']['seatbelt_buckled'],
+}
+
+# Each rule fires when `all` (or `any`) of its conditions hold. A condition's
+# threshold is either a number or the name of an entry in the threshold table,
+# which lets machine types override limits without redefining rules, e.g.
+#   {"type": "HOT_AT_IDLE", "message": "...",
+#    "all": [("engine_temp_c", ">", "HIGH_ENGINE_TEMP"), ("is_idling", "==", True)]}
+DEFAULT_RULES = [
+    {"type": "PROXIMITY_NEAR", "message": "Proximity Breach! Object too close.",
+     "all": [("proximity_min_m", "<", "PROXIMITY_NEAR")]},
+    {"type": "HIGH_NOISE", "message": "Noise levels exceed safety threshold.",
+     "all": [("noise_db", ">", "HIGH_NOISE")]},
+    {"type": "HIGH_AQI", "message": "Dust levels exceed safe air quality limits.",
+     "all": [("dust_aqi", ">", "HIGH_AQI")]},
+    {"type": "HIGH_ENGINE_TEMP", "message": "Engine temperature is above the safe operating limit.",
+     "all": [("engine_temp_c", ">", "HIGH_ENGINE_TEMP")]},
+]
+
+
+def machine_type(machine_id):
+    """The alphabetic prefix of a machine id, e.g. 'EXC' for 'EXC001'."""
+    match = re.match(r"[A-Za-z]+", machine_id or "")
+    return match.group(0).upper() if match else ""
+
+
+class RuleEngine:
+    """
+    Declarative alert rules compiled into comparisons that run either on one
+    telemetry frame (the live path) or on whole columns of frames at once with
+    NumPy (replayed shifts and offline analysis).
+    """
+
+    def __init__(self, thresholds, rules=None, machine_type_overrides=None):
+        self.thresholds = dict(thresholds)
+        self.rules = rules or DEFAULT_RULES
+        self.machine_type_overrides = machine_type_overrides or {}
+        self.metrics = sorted({c[0] for r in self.rules for c in r.get("all", []) + r.get("any", [])})
+        self._compiled = [
+            (rule["type"], rule["message"], "any" not in rule,
+             [(metric, _OPS[op], threshold) for metric, op, threshold in rule.get("all", rule.get("any", []))])
+            for rule in self.rules
+        ]
+
+    def thresholds_for(self, machine_id=None):
+        """The threshold table for a machine, with its type's overrides applied."""
+        return dict(self.thresholds, **self.machine_type_overrides.get(machine_type(machine_id), {}))
+
+    @staticmethod
+    def _limit(threshold, thresholds):
+        # None when the table lacks the named threshold, e.g. one only some machine types define.
+        return thresholds.get(threshold) if isinstance(threshold, str) else threshold
+
+    # --- Single frame ---
+    def _frame_values(self, frame):
+        return {m: METRIC_EXTRACTORS[m](frame) for m in self.metrics}
+
+    def _met(self, values, thresholds):
+        """Yields (type, message) for every rule the metric values meet under a threshold table."""
+        for alert_type, message, require_all, conditions in self._compiled:
+            limits = ((m, op, self._limit(t, thresholds)) for m, op, t in conditions)
+            # A condition on a threshold the table doesn't define never holds.
+            results = (limit is not None and op(values[m], limit) for m, op, limit in limits)
+            if (all(results) if require_all else any(results)):
+                yield alert_type, message
+
+    def evaluate_frame(self, frame, thresholds=None, machine_id=None):
+        """Returns the alerts one telemetry frame triggers, as {type, message} dicts."""
+        thresholds = thresholds or self.thresholds_for(machine_id)
+        values = self._frame_values(frame)
+        return [{"type": alert_type, "message": message} for alert_type, message in self._met(values, thresholds)]
+
+    def evaluate_frame_held(self, frame, thresholds, hold_thresholds):
+        """
+        evaluate_frame plus the set of rule types still met under the hold
+        (hysteresis) thresholds; the frame's metrics are read once for both.
+        """
+        values = self._frame_values(frame)
+        alerts = [{"type": alert_type, "message": message} for alert_type, message in self._met(values, thresholds)]
+        held = {alert_type for alert_type, _ in self._met(values, hold_thresholds)}
+        return alerts, held
+
+    # --- Batches ---
+    def frames_to_columns(self, frames):
+        """Flattens a list of telemetry frames into {metric: ndarray} columns."""
+        return {m: np.array([METRIC_EXTRACTORS[m](f) for f in frames]) for m in self.metrics}
+
+    def _threshold_columns(self, machine_ids, n):
+        """Per-row threshold arrays, resolved once per distinct machine type."""
+        if machine_ids is None:
+            return {k: np.full(n, v, dtype=np.float64) for k, v in self.thresholds.items()}
+        types = np.array([machine_type(m) for m in machine_ids])
+        uniques, inverse = np.unique(types, return_inverse=True)
+        tables = [self.thresholds_for(t) for t in uniques]
+        # Limits only some machine types define are NaN for the other rows;
+        # evaluate_batch treats those conditions as not met, like evaluate_frame.
+        keys = set().union(*tables)
+        return {k: np.array([table.get(k, np.nan) for table in tables], dtype=np.float64)[inverse] for k in keys}
+
+    def evaluate_batch(self, columns, machine_ids=None):
+        """
+        Evaluates every rule over columns of metrics (a dict of arrays or a
+        DataFrame with the metric names as columns). Returns {type: bool ndarray}.
+        """
+        n = len(columns[self.metrics[0]])
+        limits = self._threshold_columns(machine_ids, n)
+        results = {}
+        for alert_type, _, require_all, conditions in self._compiled:
+            mask = np.full(n, require_all)
+            for metric, op, threshold in conditions:
+                if not isinstance(threshold, str):
+                    hit = op(np.asarray(columns[metric]), threshold)
+                elif threshold in limits:
+                    limit = limits[threshold]
+                    hit = op(np.asarray(columns[metric]), limit) & ~np.isnan(limit)
+                else:
+                    hit = np.zeros(n, dtype=bool)
+                mask = mask & hit if require_all else mask | hit
+            results[alert_type] = mask
+        return results
+
+    def evaluate_frames(self, frames, machine_ids=None):
+        """Convenience wrapper: flatten raw frames, then evaluate them as a batch."""
+        return self.evaluate_batch(self.frames_to_columns(frames), machine_ids)
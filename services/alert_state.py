@@ -0,0 +1,68 @@
+# services/alert_state.py
+
+# Per-alert lifecycle states.
+PENDING = "pending"    # condition seen, waiting out raise_hold before alerting
+ACTIVE = "active"      # alert raised and still held
+CLEARING = "clearing"  # condition gone, waiting out clear_hold before clearing
+
+
+class AlertTracker:
+    """
+    Debounces alerts into raise/clear transitions.
+
+    Each frame supplies two sets of alert types:
+      - `raised`: types whose raise condition is met (the normal thresholds)
+      - `held`:   types whose looser hold condition is met (thresholds shifted
+                  by a hysteresis margin), so a value hovering around the
+                  threshold does not flap
+    An alert is raised once its raise condition has lasted `raise_hold`
+    seconds, stays active while it is held, and clears only after it has been
+    active for `min_active` seconds and un-held for `clear_hold` seconds.
+    Only the transitions are returned, so callers persist and push one row per
+    incident instead of one per poll.
+
+    The per-shift state is a plain dict so it can live on the session and be
+    serialized with it.
+    """
+
+    def __init__(self, raise_hold=0.0, clear_hold=10.0, min_active=30.0):
+        self.raise_hold = raise_hold
+        self.clear_hold = clear_hold
+        self.min_active = min_active
+
+    def update(self, state, raised, held, now):
+        """
+        Advances `state` in place for one frame.
+        Returns (newly_raised, newly_cleared) lists of alert types.
+        """
+        newly_raised, newly_cleared = [], []
+
+        for alert_type in raised:
+            entry = state.get(alert_type)
+            if entry is None:
+                entry = state[alert_type] = {"state": PENDING, "since": now, "raised_at": None}
+            if entry["state"] == PENDING and now - entry["since"] >= self.raise_hold:
+                entry.update(state=ACTIVE, since=now, raised_at=now)
+                newly_raised.append(alert_type)
+
+        for alert_type in list(state):
+            entry = state[alert_type]
+            if entry["state"] == PENDING:
+                if alert_type not in raised:
+                    del state[alert_type]
+            elif alert_type in held or alert_type in raised:
+                if entry["state"] == CLEARING:
+                    entry.update(state=ACTIVE, since=now)
+            elif entry["state"] == ACTIVE:
+                entry.update(state=CLEARING, since=now)
+            if (entry["state"] == CLEARING and now - entry["since"] >= self.clear_hold
+                    and now - entry["raised_at"] >= self.min_active):
+                del state[alert_type]
+                newly_cleared.append(alert_type)
+
+        return newly_raised, newly_cleared
+
+    @staticmethod
+    def active(state):
+        """Alert types currently raised (including those waiting to clear)."""
+        return [t for t, entry in state.items() if entry["state"] != PENDING]
@@ -0,0 +1,523 @@
+# services/async_support.py
+"""
+Asyncio counterparts of the backend services, used by backend_server_async.py.
+
+The sync modules stay the source of truth for behaviour (alert rules, session
+registry, prediction cache, circuit breaker, latency histogram); the classes
+here only swap the blocking I/O for asyncpg, httpx, redis.asyncio and asyncio
+queues. Local file I/O (the event spill file) runs in the default executor.
+"""
+import asyncio
+import json
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import date
+
+import asyncpg
+import httpx
+
+try:
+    import redis.asyncio as redis_asyncio
+except ImportError:  # Only needed for the shared multi-worker session backend.
+    redis_asyncio = None
+
+from services.db_pool import PoolExhaustedError
+from services.event_sink import EventSink
+from services.schedule_ingest import TASK_COLUMNS, geofence_wkt
+from services.sessions import InMemorySessionRegistry, RedisSessionRegistry, Session
+from services.telemetry_stream import TelemetryHub
+from services.upstream import RETRYABLE_STATUS, CircuitOpenError, UpstreamClient, UpstreamResponseError
+
+
+# --- Database ---
+async def _init_connection(conn):
+    # Decode json/jsonb to Python objects, matching psycopg2's behaviour.
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(type_name, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+class AsyncConnectionPool:
+    """
+    Thin wrapper around an asyncpg pool with the same knobs and stats() shape as
+    services.db_pool.ConnectionPool. A checkout that waits longer than
+    `wait_timeout` raises PoolExhaustedError, so the server returns 503 either way.
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, wait_timeout=5.0, max_idle=300.0):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.wait_timeout = wait_timeout
+        self.max_idle = max_idle
+        self._pool = None
+        self._metrics = {"checkouts": 0, "timeouts": 0}
+
+    async def start(self):
+        config = self.db_config
+        self._pool = await asyncpg.create_pool(
+            database=config.get("dbname"), user=config.get("user"), password=config.get("password"),
+            host=config.get("host"), port=config.get("port"),
+            min_size=self.minconn, max_size=self.maxconn,
+            max_inactive_connection_lifetime=self.max_idle, init=_init_connection
+        )
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+
+    @asynccontextmanager
+    async def connection(self):
+        try:
+            conn = await self._pool.acquire(timeout=self.wait_timeout)
+        except asyncio.TimeoutError:
+            self._metrics["timeouts"] += 1
+            raise PoolExhaustedError(f"No database connection available within {self.wait_timeout}s.")
+        self._metrics["checkouts"] += 1
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+
+    def stats(self):
+        size = self._pool.get_size() if self._pool else 0
+        idle = self._pool.get_idle_size() if self._pool else 0
+        return dict(
+            self._metrics, in_use=size - idle, idle=idle, max_size=self.maxconn,
+            saturation=round((size - idle) / self.maxconn, 3) if self.maxconn else 0.0
+        )
+
+
+async def insert_tasks_async(conn, tasks):
+    """
+    Inserts a whole schedule in one round trip: every column is sent as an array
+    and expanded with unnest() WITH ORDINALITY, so task_ids come back in input order.
+    """
+    if not tasks:
+        return []
+    rows = await conn.fetch(
+        f"""
+        INSERT INTO scheduled_tasks ({', '.join(TASK_COLUMNS)})
+        SELECT d, o, m, t, l, ST_GeomFromText(g, 4326), i::jsonb
+        FROM unnest($1::date[], $2::text[], $3::text[], $4::text[], $5::int[], $6::text[], $7::text[])
+             WITH ORDINALITY AS u(d, o, m, t, l, g, i, ord)
+        ORDER BY ord
+        RETURNING task_id;
+        """,
+        [_as_date(task['assigned_date']) for task in tasks],
+        [task['operator_id'] for task in tasks],
+        [task['machine_id'] for task in tasks],
+        [task['task_type'] for task in tasks],
+        [task['load_cycles_planned'] for task in tasks],
+        [geofence_wkt(task['geofence_points']) for task in tasks],
+        [json.dumps(task['task_inputs']) for task in tasks]
+    )
+    # Serial ids are allocated in ORDER BY order, so sorting restores input order.
+    return sorted(row['task_id'] for row in rows)
+
+
+def _as_date(value):
+    # asyncpg wants date objects; the JSON API sends ISO strings.
+    return date.fromisoformat(value) if isinstance(value, str) else value
+
+
+# --- Upstream HTTP ---
+class AsyncUpstreamClient(UpstreamClient):
+    """
+    UpstreamClient on top of httpx.AsyncClient. Timeouts, jittered retries, the
+    circuit breaker, last-known-good fallback and the latency histogram all
+    behave as in the sync client; waiting never blocks the event loop.
+    """
+
+    def _make_session(self, pool_size):
+        connect, read = self.timeout
+        return httpx.AsyncClient(
+            timeout=httpx.Timeout(read, connect=connect),
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size)
+        )
+
+    async def aclose(self):
+        await self.session.aclose()
+
+    async def get_json(self, url, fallback_key=None, **kwargs):
+        return await self.request_json("GET", url, fallback_key=fallback_key, **kwargs)
+
+    async def post_json(self, url, json=None, fallback_key=None, **kwargs):
+        return await self.request_json("POST", url, fallback_key=fallback_key, json=json, **kwargs)
+
+    async def request_json(self, method, url, fallback_key=None, **kwargs):
+        try:
+            data = await self._call(method, url, **kwargs)
+        except (httpx.HTTPError, CircuitOpenError, UpstreamResponseError):
+            return self._fallback(fallback_key)
+        self._remember(fallback_key, data)
+        return data, False
+
+    @staticmethod
+    def _retryable(error):
+        # Only failures to connect; a read timeout means the upstream already has the request.
+        if isinstance(error, (httpx.ConnectError, httpx.ConnectTimeout)):
+            return True
+        return isinstance(error, httpx.HTTPStatusError) and error.response.status_code in RETRYABLE_STATUS
+
+    async def _call(self, method, url, **kwargs):
+        self._check_breaker()
+
+        timeout = kwargs.pop("timeout", self.timeout)
+        deadline = self._deadline_for(timeout)
+        healthy = False
+        attempt = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                connect, read = self._attempt_timeout(timeout, deadline)
+                try:
+                    response = await self.session.request(
+                        method, url, timeout=httpx.Timeout(read, connect=connect), **kwargs)
+                    # A 4xx means the request was bad, not that the upstream is unhealthy.
+                    healthy = 400 <= response.status_code < 500
+                    response.raise_for_status()
+                    data = self._decode(response)
+                except (httpx.HTTPError, UpstreamResponseError) as e:
+                    self._record(started, ok=False)
+                    attempt += 1
+                    delay = None if healthy or not self._retryable(e) else self._retry_delay(attempt, deadline)
+                    if delay is None:
+                        raise
+                    await asyncio.sleep(delay)
+                    continue
+                self._record(started, ok=True)
+                healthy = True
+                return data
+        finally:
+            self._settle(healthy)
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key into one in-flight coroutine."""
+
+    def __init__(self):
+        self._inflight = {}
+        self.metrics = {"calls": 0, "coalesced": 0}
+
+    async def run(self, key, compute):
+        future = self._inflight.get(key)
+        if future is not None:
+            self.metrics["coalesced"] += 1
+            return await asyncio.shield(future)
+        self.metrics["calls"] += 1
+        future = self._inflight[key] = asyncio.ensure_future(compute())
+        future.add_done_callback(lambda f: self._inflight.pop(key) if self._inflight.get(key) is f else None)
+        return await asyncio.shield(future)
+
+
+# --- Sessions ---
+class AsyncSessionRegistry:
+    """
+    Awaitable interface to the in-process session registry. Its methods are
+    plain dict operations, so they are called directly on the event loop.
+    """
+
+    def __init__(self, registry):
+        self._registry = registry
+
+    async def put(self, session):
+        self._registry.put(session)
+
+    async def get(self, shift_id):
+        return self._registry.get(shift_id)
+
+    async def get_by_machine(self, machine_id):
+        return self._registry.get_by_machine(machine_id)
+
+    async def save(self, session):
+        self._registry.save(session)
+
+    async def remove(self, shift_id):
+        self._registry.remove(shift_id)
+
+    async def all(self):
+        return self._registry.all()
+
+    async def count(self):
+        return len(self._registry)
+
+    async def aclose(self):
+        pass
+
+
+class AsyncRedisSessionRegistry(RedisSessionRegistry):
+    """
+    RedisSessionRegistry on redis.asyncio. Keys, the expiry index and the
+    per-worker cache are the same as in the sync registry, so Flask and ASGI
+    workers can share one Redis.
+    """
+
+    def __init__(self, url, ttl_seconds=8 * 3600, local_cache_size=1024):
+        if redis_asyncio is None:
+            raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package.")
+        self.ttl_seconds = ttl_seconds
+        self.local_cache_size = local_cache_size
+        self._client = redis_asyncio.Redis.from_url(url)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    async def put(self, session):
+        fields = self._encode(session)
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(session.shift_id))
+        self._queue_write(pipe, session, fields)
+        await pipe.execute()
+        session._stored = fields
+        self._cache(session)
+
+    async def get(self, shift_id):
+        key = self._key(shift_id)
+        pipe = self._client.pipeline()
+        pipe.hgetall(key)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.zadd(self.INDEX_KEY, {shift_id: time.time() + self.ttl_seconds}, xx=True)
+        raw = (await pipe.execute())[0]
+        if not raw:
+            await self._client.zrem(self.INDEX_KEY, shift_id)
+        return self._from_raw(shift_id, raw)
+
+    async def get_by_machine(self, machine_id):
+        shift_id = await self._client.get(self._machine_key(machine_id))
+        return await self.get(int(shift_id)) if shift_id is not None else None
+
+    async def save(self, session):
+        fields = self._encode(session)
+        changed = self._changed(session, fields)
+        pipe = self._client.pipeline()
+        pipe.exists(self._key(session.shift_id))
+        self._queue_write(pipe, session, changed)
+        if not (await pipe.execute())[0]:
+            pipe = self._client.pipeline()
+            self._queue_write(pipe, session, fields)
+            await pipe.execute()
+        session._stored = fields
+        self._cache(session)
+
+    async def remove(self, shift_id):
+        session = await self.get(shift_id)
+        keys = [self._key(shift_id)]
+        if session and session.machine_id:
+            keys.append(self._machine_key(session.machine_id))
+        pipe = self._client.pipeline()
+        pipe.delete(*keys)
+        pipe.zrem(self.INDEX_KEY, shift_id)
+        await pipe.execute()
+        self._forget(shift_id)
+
+    async def all(self):
+        pipe = self._client.pipeline()
+        pipe.zremrangebyscore(self.INDEX_KEY, "-inf", time.time())
+        pipe.zrange(self.INDEX_KEY, 0, -1)
+        shift_ids = [int(shift_id) for shift_id in (await pipe.execute())[1]]
+        if not shift_ids:
+            return []
+        pipe = self._client.pipeline()
+        for shift_id in shift_ids:
+            pipe.hgetall(self._key(shift_id))
+        return [Session.from_dict(self._decode(raw)[1]) for raw in await pipe.execute() if raw]
+
+    async def count(self):
+        pipe = self._client.pipeline()
+        pipe.zremrangebyscore(self.INDEX_KEY, "-inf", time.time())
+        pipe.zcard(self.INDEX_KEY)
+        return (await pipe.execute())[1]
+
+    async def aclose(self):
+        await self._client.aclose()
+
+
+def create_async_registry(backend="memory", redis_url=None, ttl_seconds=8 * 3600):
+    """Builds the awaitable session registry selected by configuration."""
+    if backend == "redis":
+        return AsyncRedisSessionRegistry(redis_url, ttl_seconds=ttl_seconds)
+    return AsyncSessionRegistry(InMemorySessionRegistry(ttl_seconds=ttl_seconds))
+
+
+# --- Events ---
+class AsyncEventSink(EventSink):
+    """
+    EventSink whose worker is an asyncio task writing through asyncpg's
+    executemany. `submit()` stays a plain call so the shared alert code can use
+    either sink; the spill file format and replay rules are unchanged, but
+    spill file reads and writes run in the default executor, off the event loop.
+    """
+
+    def __init__(self, db_pool, spill_path, **kwargs):
+        super().__init__(db_pool, spill_path, **kwargs)
+        self._queue = asyncio.Queue(maxsize=kwargs.get("max_queue", 10000))
+        self._task = None
+
+    def _register_shutdown(self):
+        # stop() is a coroutine here; the server awaits it in after_serving.
+        pass
+
+    def submit(self, shift_id, event_type, details):
+        self._ensure_running()
+        event = {
+            "shift_id": shift_id, "event_type": event_type,
+            "details": dict(details, occurred_at=time.time())
+        }
+        self.metrics["submitted"] += 1
+        try:
+            self._queue.put_nowait(event)
+        except asyncio.QueueFull:
+            self.metrics["backpressure_spills"] += 1
+            asyncio.get_running_loop().run_in_executor(None, self._spill, [event])
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        batch = self._drain()
+        if batch:
+            await self._write(batch)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        last_replay_attempt = 0.0
+        while True:
+            batch = await self._take_batch()
+            if batch and not await self._write(batch):
+                continue
+            if batch or time.monotonic() - last_replay_attempt >= self.replay_interval:
+                last_replay_attempt = time.monotonic()
+                await self._replay_spill()
+
+    async def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch + self._drain(self.batch_size - len(batch))
+
+    def _drain(self, limit=None):
+        batch = []
+        while not self._queue.empty() and (limit is None or len(batch) < limit):
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _insert(self, batch):
+        async with self.db_pool.connection() as conn:
+            await conn.executemany(
+                "INSERT INTO events (shift_id, event_type, details) VALUES ($1, $2, $3);",
+                [(e["shift_id"], e["event_type"], e["details"]) for e in batch]
+            )
+
+    async def _write(self, batch):
+        try:
+            await self._insert(batch)
+        except Exception as e:
+            print(f"Event sink: database unavailable, spilling {len(batch)} events: {e}")
+            self.metrics["insert_failures"] += 1
+            await asyncio.to_thread(self._spill, batch)
+            return False
+        self.metrics["inserted"] += len(batch)
+        self.metrics["batches"] += 1
+        return True
+
+    async def _replay_spill(self):
+        events = await asyncio.to_thread(self._claim_spill)
+        if events is None:
+            return
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            try:
+                await self._insert(batch)
+            except Exception as e:
+                print(f"Event sink: replay interrupted, keeping {len(events) - start} events on disk: {e}")
+                await asyncio.to_thread(self._spill, events[start:])
+                break
+            self.metrics["replayed"] += len(batch)
+        await asyncio.to_thread(self._finish_replay)
+
+
+# --- Telemetry streaming ---
+class AsyncSubscription:
+    """asyncio version of telemetry_stream.Subscription: bounded, drops the oldest frame."""
+
+    def __init__(self, key, maxsize=32):
+        self.key = key
+        self._queue = asyncio.Queue(maxsize=maxsize)
+
+    def publish(self, message):
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except asyncio.QueueFull:
+                self._queue.get_nowait()
+
+    async def get(self, timeout):
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+
+class AsyncTelemetryHub(TelemetryHub):
+    """
+    TelemetryHub whose ingest loop is an asyncio task. `fetch_frame` and
+    `process_frame` are coroutine functions.
+    """
+
+    subscription_class = AsyncSubscription
+
+    def _ensure_running(self):
+        if self._thread is None or self._thread.done():
+            self._thread = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        while True:
+            started = time.monotonic()
+            with self._lock:
+                keys = set(self._subscribers)
+            if keys:
+                try:
+                    frame = await self.fetch_frame()
+                except Exception as e:
+                    self.metrics["fetch_errors"] += 1
+                    print(f"Telemetry ingest error: {e}")
+                else:
+                    await self._dispatch(frame, keys)
+            await asyncio.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+
+    async def _dispatch(self, frame, keys):
+        changed_keys = self._changed_keys(frame, keys)
+        try:
+            messages = await self.process_frame(frame, keys, changed_keys)
+        except Exception as e:
+            print(f"Telemetry processing error: {e}")
+            return
+        self._publish(messages)
+
+
+async def sse_stream_async(hub, key, keepalive=15.0):
+    """Async generator yielding Server-Sent Events for one subscriber until the client disconnects."""
+    sub = hub.subscribe(key)
+    try:
+        yield "retry: 2000\n\n"
+        while True:
+            message = await sub.get(timeout=keepalive)
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"data: {json.dumps(message)}\n\n"
+    finally:
+        hub.unsubscribe(sub)
@@ -0,0 +1,173 @@
+# services/db_pool.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2 import extensions
+
+
+class PoolExhaustedError(Exception):
+    """Raised when no connection could be checked out within the wait timeout."""
+
+
+class ConnectionPool:
+    """
+    A bounded, thread-safe pool of psycopg2 connections.
+
+    - At most `maxconn` connections are open at any time; callers wait up to
+      `wait_timeout` seconds for one to be returned before giving up.
+    - Connections that sat idle longer than `health_check_after` seconds are
+      pinged with `SELECT 1` before being handed out, and replaced if dead.
+    - Idle connections beyond `minconn` are closed once they have been unused
+      for `max_idle` seconds.
+    """
+
+    def __init__(self, db_config, minconn=1, maxconn=10, wait_timeout=5.0,
+                 max_idle=300.0, health_check_after=30.0):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.wait_timeout = wait_timeout
+        self.max_idle = max_idle
+        self.health_check_after = health_check_after
+
+        self._idle = deque()  # (connection, returned_at), most recently used on the right
+        self._in_use = 0
+        self._cond = threading.Condition()
+        self._metrics = {
+            "checkouts": 0, "waits": 0, "timeouts": 0,
+            "created": 0, "closed_idle": 0, "closed_broken": 0,
+            "total_wait_seconds": 0.0,
+        }
+
+    # --- Checkout / return ---
+    def getconn(self):
+        """Checks out a healthy connection, opening a new one if below the limit."""
+        deadline = time.monotonic() + self.wait_timeout
+        waited = False
+        with self._cond:
+            self._reap_idle_locked()
+            while not self._idle and self._in_use >= self.maxconn:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self._metrics["timeouts"] += 1
+                    raise PoolExhaustedError(
+                        f"No database connection available after {self.wait_timeout}s "
+                        f"({self._in_use}/{self.maxconn} in use)."
+                    )
+                waited = True
+                self._cond.wait(remaining)
+            if waited:
+                self._metrics["waits"] += 1
+                self._metrics["total_wait_seconds"] += self.wait_timeout - max(deadline - time.monotonic(), 0)
+            idle_entry = self._idle.pop() if self._idle else None
+            self._in_use += 1
+            self._metrics["checkouts"] += 1
+
+        # Connecting and pinging happen outside the lock so slow I/O never blocks other callers.
+        try:
+            if idle_entry is not None:
+                conn, returned_at = idle_entry
+                if self._is_healthy(conn, time.monotonic() - returned_at):
+                    return conn
+                self._discard(conn, "closed_broken")
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+    def putconn(self, conn):
+        """Returns a connection to the pool, resetting any open transaction."""
+        if not conn.closed:
+            try:
+                if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._discard(conn, "closed_broken")
+        with self._cond:
+            self._in_use -= 1
+            if not conn.closed:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        """
+        Context manager that checks out a connection and always returns it.
+        Any uncommitted work is rolled back on exit, so routes must commit explicitly.
+        """
+        conn = self.getconn()
+        try:
+            yield conn
+        except Exception:
+            if not conn.closed:
+                try:
+                    conn.rollback()
+                except psycopg2.Error:
+                    pass
+            raise
+        finally:
+            self.putconn(conn)
+
+    # --- Maintenance ---
+    def close_all(self):
+        """Closes every idle connection. Checked-out connections are closed when returned."""
+        with self._cond:
+            while self._idle:
+                conn, _ = self._idle.popleft()
+                conn.close()
+
+    def stats(self):
+        """Returns a snapshot of pool occupancy and saturation counters."""
+        with self._cond:
+            snapshot = dict(self._metrics)
+            snapshot.update({
+                "in_use": self._in_use,
+                "idle": len(self._idle),
+                "max_size": self.maxconn,
+                "saturation": round(self._in_use / self.maxconn, 3) if self.maxconn else 0.0,
+            })
+        return snapshot
+
+    # --- Internals ---
+    def _connect(self):
+        conn = psycopg2.connect(**self.db_config)
+        with self._cond:
+            self._metrics["created"] += 1
+        return conn
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.health_check_after:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1;")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _discard(self, conn, reason):
+        try:
+            conn.close()
+        except psycopg2.Error:
+            pass
+        with self._cond:
+            self._metrics[reason] += 1
+
+    def _reap_idle_locked(self):
+        # The oldest idle connections sit on the left of the deque.
+        now = time.monotonic()
+        while len(self._idle) + self._in_use > self.minconn and self._idle:
+            conn, returned_at = self._idle[0]
+            if now - returned_at < self.max_idle:
+                break
+            self._idle.popleft()
+            conn.close()
+            self._metrics["closed_idle"] += 1
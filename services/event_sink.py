@@ -0,0 +1,197 @@
+# services/event_sink.py
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+import psycopg2.extras
+
+
+class EventSink:
+    """
+    Background writer for the `events` table.
+
+    Requests call `submit()` and return immediately. A worker thread drains the
+    queue and batch-inserts rows every `flush_interval` seconds or whenever
+    `batch_size` rows are waiting. If the database is unavailable, the batch is
+    appended to a local JSON-lines spill file and replayed once inserts succeed
+    again, so a DB hiccup no longer loses alerts.
+
+    The queue is bounded: when it is full, `submit()` waits briefly and then
+    writes straight to the spill file rather than growing memory without limit.
+    Spill lines that cannot be parsed (e.g. cut off by a crash) are skipped and
+    counted in `corrupt_spill_lines`.
+    """
+
+    def __init__(self, db_pool, spill_path, batch_size=500, flush_interval=0.25,
+                 max_queue=10000, submit_timeout=0.05, replay_interval=5.0):
+        self.db_pool = db_pool
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.submit_timeout = submit_timeout
+        self.replay_interval = replay_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._spill_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.metrics = {
+            "submitted": 0, "inserted": 0, "batches": 0, "spilled": 0,
+            "replayed": 0, "insert_failures": 0, "backpressure_spills": 0, "corrupt_spill_lines": 0
+        }
+        self._register_shutdown()
+
+    def _register_shutdown(self):
+        # Once per sink; the worker thread may be restarted many times.
+        atexit.register(self.stop)
+
+    def submit(self, shift_id, event_type, details):
+        """Queues one event for persistence. Never touches the database on the caller's thread."""
+        self._ensure_running()
+        event = {
+            "shift_id": shift_id, "event_type": event_type,
+            "details": dict(details, occurred_at=time.time())
+        }
+        self.metrics["submitted"] += 1
+        try:
+            self._queue.put(event, timeout=self.submit_timeout)
+        except queue.Full:
+            self.metrics["backpressure_spills"] += 1
+            self._spill([event])
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Drains everything currently queued. Used at shutdown."""
+        while True:
+            batch = self._take_batch(block=False)
+            if not batch:
+                return
+            self._write(batch)
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # --- Worker ---
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="event-sink", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        last_replay_attempt = 0.0
+        while not self._stop.is_set():
+            batch = self._take_batch(block=True)
+            if batch and not self._write(batch):
+                continue
+            # Replay right after a successful insert, and periodically while idle.
+            if batch or time.monotonic() - last_replay_attempt >= self.replay_interval:
+                last_replay_attempt = time.monotonic()
+                self._replay_spill()
+
+    def _take_batch(self, block):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self._queue.get(timeout=timeout))
+                else:
+                    batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, batch):
+        with self.db_pool.connection() as conn, conn.cursor() as cur:
+            psycopg2.extras.execute_values(
+                cur,
+                "INSERT INTO events (shift_id, event_type, details) VALUES %s;",
+                [(e["shift_id"], e["event_type"], psycopg2.extras.Json(e["details"])) for e in batch],
+                page_size=self.batch_size
+            )
+            conn.commit()
+
+    def _write(self, batch):
+        """Inserts a batch, spilling it to disk on failure. Returns True if the DB accepted it."""
+        try:
+            self._insert(batch)
+        except Exception as e:
+            print(f"Event sink: database unavailable, spilling {len(batch)} events: {e}")
+            self.metrics["insert_failures"] += 1
+            self._spill(batch)
+            return False
+        self.metrics["inserted"] += len(batch)
+        self.metrics["batches"] += 1
+        return True
+
+    # --- Spill file ---
+    def _spill(self, events):
+        with self._spill_lock:
+            with open(self.spill_path, "a", encoding="utf-8") as f:
+                for event in events:
+                    f.write(json.dumps(event) + "\n")
+        self.metrics["spilled"] += len(events)
+
+    def _claim_spill(self):
+        """Moves the spill file aside for replay and returns its events, or None if there is nothing to replay."""
+        # Move the file aside first so events spilled during replay are not lost or re-read.
+        # A leftover .replaying file means a previous replay was cut short; finish it first.
+        replay_path = self.spill_path + ".replaying"
+        with self._spill_lock:
+            if not os.path.exists(replay_path):
+                if not os.path.exists(self.spill_path):
+                    return None
+                os.replace(self.spill_path, replay_path)
+        events = []
+        with open(replay_path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                event = self._parse_spill_line(line)
+                if event is None:
+                    self.metrics["corrupt_spill_lines"] += 1
+                    print(f"Event sink: skipping unreadable spill line: {line[:200]!r}")
+                else:
+                    events.append(event)
+        return events
+
+    @staticmethod
+    def _parse_spill_line(line):
+        """The event stored on one spill line, or None if the line is not a complete event."""
+        try:
+            event = json.loads(line)
+        except ValueError:
+            return None
+        if not isinstance(event, dict) or not {"shift_id", "event_type", "details"} <= event.keys():
+            return None
+        return event
+
+    def _finish_replay(self):
+        os.remove(self.spill_path + ".replaying")
+
+    def _replay_spill(self):
+        events = self._claim_spill()
+        if events is None:
+            return
+        for start in range(0, len(events), self.batch_size):
+            batch = events[start:start + self.batch_size]
+            try:
+                self._insert(batch)
+            except Exception as e:
+                print(f"Event sink: replay interrupted, keeping {len(events) - start} events on disk: {e}")
+                self._spill(events[start:])
+                break
+            self.metrics["replayed"] += len(batch)
+        self._finish_replay()
@@ -0,0 +1,123 @@
+# services/geofence.py
+import re
+
+import numpy as np
+
+_RING_PATTERN = re.compile(r"\(([^()]+)\)")
+
+# Points are tested against edges in chunks so a long track replay never builds
+# a (points x edges) matrix larger than this many cells at once.
+BATCH_CELLS = 4_000_000
+
+
+def track_arrays(points):
+    """
+    (lons, lats) float arrays for a list of [lon, lat] pairs, e.g. a request
+    body's track. Raises ValueError for anything else.
+    """
+    error = "points must be a non-empty list of [lon, lat] number pairs"
+    if (not isinstance(points, list) or not points
+            or not all(isinstance(p, (list, tuple)) and len(p) >= 2 for p in points)):
+        raise ValueError(error)
+    try:
+        # Extra elements per point (e.g. altitude) are ignored.
+        track = np.array([p[:2] for p in points], dtype=np.float64)
+    except (TypeError, ValueError):
+        raise ValueError(error)
+    if not np.isfinite(track).all():
+        raise ValueError(error)
+    return track[:, 0], track[:, 1]
+
+
+class PreparedGeofence:
+    """
+    An in-memory polygon compiled once from WKT, for fast point-in-polygon checks.
+
+    Supports POLYGON (with holes) and MULTIPOLYGON input. Containment uses the
+    even-odd rule over every ring, so holes and separate parts need no special
+    casing. A bounding-box test rejects far-away points before any edge math.
+    """
+
+    def __init__(self, rings):
+        rings = [np.asarray(r, dtype=np.float64) for r in rings if len(r) >= 3]
+        if not rings:
+            raise ValueError("Geofence must contain at least one ring with 3 or more points.")
+
+        # Edge arrays: (x1, y1) -> (x2, y2) for every ring, closing each one.
+        starts = np.concatenate(rings)
+        ends = np.concatenate([np.roll(r, -1, axis=0) for r in rings])
+        self.x1, self.y1 = starts[:, 0].copy(), starts[:, 1].copy()
+        self.x2, self.y2 = ends[:, 0].copy(), ends[:, 1].copy()
+
+        # Only edges that cross some horizontal line can flip the parity; the
+        # slope is precomputed for those so the per-point work is one multiply.
+        crossing = self.y1 != self.y2
+        self.x1, self.y1, self.x2, self.y2 = (
+            self.x1[crossing], self.y1[crossing], self.x2[crossing], self.y2[crossing]
+        )
+        self.inv_slope = (self.x2 - self.x1) / (self.y2 - self.y1)
+
+        all_points = np.concatenate(rings)
+        self.min_x, self.min_y = all_points.min(axis=0)
+        self.max_x, self.max_y = all_points.max(axis=0)
+
+        # Plain-Python copy of the edges for the single-point path, where NumPy's
+        # per-call overhead would dominate for a handful of edges.
+        self._edges = list(zip(
+            self.x1.tolist(), self.y1.tolist(), self.y2.tolist(), self.inv_slope.tolist()
+        ))
+
+    @classmethod
+    def from_wkt(cls, wkt):
+        """Parses a POLYGON/MULTIPOLYGON WKT string (as returned by ST_AsText)."""
+        rings = []
+        for ring_text in _RING_PATTERN.findall(wkt):
+            ring = [tuple(float(v) for v in pair.split()[:2]) for pair in ring_text.split(",")]
+            if len(ring) > 1 and ring[0] == ring[-1]:
+                ring = ring[:-1]
+            rings.append(ring)
+        return cls(rings)
+
+    @classmethod
+    def from_points(cls, points):
+        """Builds a geofence from a single ring of [lon, lat] pairs."""
+        ring = [tuple(p) for p in points]
+        if len(ring) > 1 and ring[0] == ring[-1]:
+            ring = ring[:-1]
+        return cls([ring])
+
+    def contains(self, lon, lat):
+        """Returns True if a single point lies inside the geofence."""
+        if lon < self.min_x or lon > self.max_x or lat < self.min_y or lat > self.max_y:
+            return False
+        inside = False
+        for x1, y1, y2, inv_slope in self._edges:
+            if (y1 > lat) != (y2 > lat) and lon < x1 + (lat - y1) * inv_slope:
+                inside = not inside
+        return inside
+
+    def contains_many(self, lons, lats):
+        """
+        Vectorized containment for many points at once, e.g. a replayed GPS track.
+        Returns a boolean array aligned with the inputs.
+        """
+        lons = np.asarray(lons, dtype=np.float64)
+        lats = np.asarray(lats, dtype=np.float64)
+        result = np.zeros(lons.shape, dtype=bool)
+
+        in_bbox = (lons >= self.min_x) & (lons <= self.max_x) & (lats >= self.min_y) & (lats <= self.max_y)
+        candidates = np.flatnonzero(in_bbox)
+        chunk = max(1, BATCH_CELLS // max(len(self.x1), 1))
+
+        for start in range(0, len(candidates), chunk):
+            idx = candidates[start:start + chunk]
+            px = lons[idx][:, None]
+            py = lats[idx][:, None]
+            straddles = (self.y1 > py) != (self.y2 > py)
+            crosses = px < self.x1 + (py - self.y1) * self.inv_slope
+            result[idx] = np.count_nonzero(straddles & crosses, axis=1) % 2 == 1
+        return result
+
+    def breaches(self, lons, lats):
+        """Boolean array marking points that fall outside the geofence."""
+        return ~self.contains_many(lons, lats)
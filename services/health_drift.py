@@ -0,0 +1,251 @@
+# services/health_drift.py
+import math
+import threading
+import time
+from collections import deque
+
+import numpy as np
+
+from services.alert_rules import METRIC_EXTRACTORS
+
+# Metric -> event type prefix and per-metric limits.
+#   min_std:  floor for the noise deviation, so a very steady signal does not
+#             turn tiny fluctuations into a huge z-score
+#   max_rate: sustained rate of change (units per second, smoothed) that raises a RATE event
+DRIFT_METRICS = {
+    "engine_temp_c": {"label": "ENGINE_TEMP", "min_std": 0.5, "max_rate": 0.5},
+    "engine_rpm": {"label": "ENGINE_RPM", "min_std": 25.0, "max_rate": 150.0},
+}
+
+# Kinds of event, in the order of the flag columns.
+KINDS = ("SPIKE", "DRIFT", "RATE")
+
+
+class HealthDriftDetector:
+    """
+    Streaming per-machine health monitor over the live telemetry feed.
+
+    Each machine keeps, per metric, exponentially weighted windows that are
+    updated in O(1) per sample and never revisit raw data: a slow baseline
+    mean (`baseline_s` time constant), a fast mean for the recent level
+    (`fast_s`), the noise variance around that level (`baseline_s`) and a
+    smoothed rate of change (`rate_s`). Weights follow the time since the
+    machine's previous sample, so irregular polling is handled. After
+    `warmup` samples a machine raises:
+      SPIKE  a sample more than `spike_z` noise deviations from the recent level
+      DRIFT  the recent level is more than `drift_z` noise deviations from the baseline
+      RATE   the smoothed rate of change exceeds the metric's `max_rate`
+    Events are transitions only ("raised" / "cleared"), like live alerts, and
+    clear once the measure drops below `clear_ratio` of its threshold.
+
+    State lives in NumPy arrays with one row per machine, so a tick of the whole
+    fleet (`update_frames` / `update_arrays`) is a handful of vectorized
+    operations whatever the number of machines.
+    """
+
+    def __init__(self, metrics=None, baseline_s=300.0, fast_s=30.0, rate_s=10.0,
+                 spike_z=4.0, drift_z=3.0, clear_ratio=0.8, warmup=30, capacity=1024, recent_events=1000):
+        self.metrics = dict(metrics or DRIFT_METRICS)
+        self.names = list(self.metrics)
+        self.min_std = np.array([self.metrics[m]["min_std"] for m in self.names])
+        self.max_rate = np.array([self.metrics[m]["max_rate"] for m in self.names])
+        self.baseline_s, self.fast_s, self.rate_s = baseline_s, fast_s, rate_s
+        self.spike_z, self.drift_z, self.clear_ratio, self.warmup = spike_z, drift_z, clear_ratio, warmup
+        # (metric, kind) thresholds, in KINDS order.
+        self._thresholds = np.column_stack([np.full(len(self.names), spike_z), np.full(len(self.names), drift_z),
+                                            self.max_rate])
+        self._slots = {}  # machine_id -> row
+        self._ids = []
+        self._lock = threading.Lock()
+        self._allocate(capacity)
+        self.recent_events = deque(maxlen=recent_events)
+        self.stats = {"samples": 0, "ticks": 0, "raised": 0, "cleared": 0}
+
+    def _allocate(self, capacity):
+        m = len(self.names)
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.last_ts = np.zeros(capacity)
+        self.last = np.zeros((capacity, m))
+        self.mean = np.zeros((capacity, m))
+        self.var = np.zeros((capacity, m))
+        self.fast = np.zeros((capacity, m))
+        self.rate = np.zeros((capacity, m))
+        self.active = np.zeros((capacity, m, len(KINDS)), dtype=bool)
+
+    def _grow(self, needed):
+        capacity = len(self.count)
+        if needed <= capacity:
+            return
+        old = {k: getattr(self, k) for k in ("count", "last_ts", "last", "mean", "var", "fast", "rate", "active")}
+        self._allocate(max(needed, capacity * 2))
+        for k, values in old.items():
+            getattr(self, k)[:capacity] = values
+
+    def _slots_for(self, machine_ids):
+        slots = np.empty(len(machine_ids), dtype=np.intp)
+        for i, machine_id in enumerate(machine_ids):
+            slot = self._slots.get(machine_id)
+            if slot is None:
+                slot = self._slots[machine_id] = len(self._ids)
+                self._ids.append(machine_id)
+            slots[i] = slot
+        self._grow(len(self._ids))
+        return slots
+
+    def machine_count(self):
+        return len(self._ids)
+
+    # --- Updates ---
+    def update(self, frame, ts=None):
+        """Folds one simulator frame (the /get_current_data shape) in; returns the events it caused."""
+        return self.update_frames([frame], ts)
+
+    def update_frames(self, frames, ts=None):
+        """Folds in one frame per machine, e.g. a fleet-wide poll; returns the events they caused."""
+        ts = time.time() if ts is None else ts
+        frames = [f for f in frames if f.get('identity', {}).get('machine_id')]
+        if not frames:
+            return []
+        values = np.array([[METRIC_EXTRACTORS[m](f) for m in self.names] for f in frames], dtype=np.float64)
+        return self.update_arrays([f['identity']['machine_id'] for f in frames], np.full(len(frames), ts), values)
+
+    def update_arrays(self, machine_ids, ts, values):
+        """
+        Column form: `ts` (n,) and `values` (n, len(metrics)) for `machine_ids`.
+        A machine may appear more than once; its samples are applied in order.
+        """
+        ts = np.asarray(ts, dtype=np.float64)
+        values = np.asarray(values, dtype=np.float64).reshape(len(ts), len(self.names))
+        if len(ts) == 0:
+            return []
+        with self._lock:
+            slots = self._slots_for(machine_ids)
+            if len(slots) == 1:
+                events = self._step(slots, ts, values)
+                self.stats["samples"] += 1
+                self.stats["ticks"] += 1
+                return events
+            # A machine's repeats go in later rounds, so every vectorized step
+            # sees distinct rows: rank = how many earlier samples of the same machine.
+            order = np.argsort(slots, kind="stable")
+            sorted_slots = slots[order]
+            starts = np.flatnonzero(np.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+            rank = np.empty(len(slots), dtype=np.intp)
+            rank[order] = np.arange(len(slots)) - np.repeat(starts, np.diff(np.r_[starts, len(slots)]))
+            if rank.max() == 0:
+                events = self._step(slots, ts, values)
+            else:
+                events = []
+                for r in range(int(rank.max()) + 1):
+                    rows = np.flatnonzero(rank == r)
+                    events.extend(self._step(slots[rows], ts[rows], values[rows]))
+            self.stats["samples"] += len(ts)
+            self.stats["ticks"] += 1
+        return events
+
+    def _step(self, slots, ts, x):
+        first = self.count[slots] == 0
+        if first.any():
+            s = slots[first]
+            self.mean[s] = self.fast[s] = self.last[s] = x[first]
+            self.var[s] = self.rate[s] = 0.0
+            self.last_ts[s] = ts[first]
+            self.count[s] = 1
+            slots, ts, x = slots[~first], ts[~first], x[~first]
+            if len(slots) == 0:
+                return []
+
+        dt = np.maximum(ts - self.last_ts[slots], 0.0)[:, None]
+        # Until a machine has `warmup` samples its windows are plain running
+        # averages (weight 1/n), so the first readings don't leave a biased
+        # noise estimate behind.
+        warming = (self.count[slots] < self.warmup)[:, None]
+        running = 1.0 / (self.count[slots] + 1)[:, None]
+        a_slow = np.maximum(-np.expm1(-dt / self.baseline_s), np.where(warming, running, 0.0))
+        a_fast = np.maximum(-np.expm1(-dt / self.fast_s), np.where(warming, running, 0.0))
+        a_rate = -np.expm1(-dt / self.rate_s)
+
+        mean, fast, var = self.mean[slots], self.fast[slots], self.var[slots]
+        # Deviations are measured in units of the sensor noise around the recent
+        # level (the fast mean), not of the spread around the baseline: a slow
+        # drift would otherwise widen its own yardstick and never stand out.
+        std = np.sqrt(np.maximum(var, self.min_std ** 2))
+        limit = self.spike_z * std
+        residual = x - fast
+        z = residual / std
+
+        # Every window moves at most `limit` per sample, so one outlier neither
+        # drags the level, baseline and noise estimate nor reads as a steep rate;
+        # a real shift or ramp still gets there over several samples.
+        residual = np.clip(residual, -limit, limit)
+        step = np.clip(x - self.last[slots], -limit, limit)
+        instant_rate = np.divide(step, dt, out=np.zeros_like(x), where=dt > 0)
+        rate = self.rate[slots] + a_rate * (instant_rate - self.rate[slots])
+        fast = fast + a_fast * residual
+        self.var[slots] = var + a_slow * (residual ** 2 - var)
+        self.mean[slots] = mean + a_slow * np.clip(x - mean, -limit, limit)
+        self.fast[slots], self.rate[slots], self.last[slots] = fast, rate, x
+        self.last_ts[slots] = ts
+        self.count[slots] += 1
+
+        # An active event clears only once its measure is back under
+        # `clear_ratio` of the threshold, so values hovering around it don't flap.
+        active = self.active[slots]
+        ratio = np.where(active, self.clear_ratio, 1.0)
+        warm = (self.count[slots] > self.warmup)[:, None, None]
+        measures = np.stack([np.abs(z), np.abs(fast - mean) / std, np.abs(rate)], axis=-1)
+        flags = warm & (measures > self._thresholds * ratio)
+        changed = flags != active
+        if not changed.any():
+            return []
+        self.active[slots] = flags
+
+        events = []
+        for row, metric, kind in zip(*np.nonzero(changed)):
+            raised = bool(flags[row, metric, kind])
+            slot = slots[row]
+            name = self.names[metric]
+            events.append({
+                "machine_id": self._ids[slot],
+                "type": f"{self.metrics[name]['label']}_{KINDS[kind]}",
+                "state": "raised" if raised else "cleared",
+                "metric": name,
+                "value": float(x[row, metric]),
+                "baseline_mean": round(float(mean[row, metric]), 3),
+                "fast_mean": round(float(fast[row, metric]), 3),
+                "noise_std": round(float(std[row, metric]), 3),
+                "z_score": round(float(z[row, metric]), 2),
+                "rate_per_s": round(float(rate[row, metric]), 3),
+                "ts": float(ts[row]),
+            })
+            self.stats["raised" if raised else "cleared"] += 1
+        self.recent_events.extend(events)
+        return events
+
+    # --- Queries ---
+    def snapshot(self, machine_id):
+        """Current baseline, fast mean, rate and active events of one machine, or None if it was never seen."""
+        with self._lock:
+            slot = self._slots.get(machine_id)
+            if slot is None:
+                return None
+            metrics = {}
+            for i, name in enumerate(self.names):
+                std = math.sqrt(max(self.var[slot, i], self.min_std[i] ** 2))
+                metrics[name] = {
+                    "last": float(self.last[slot, i]),
+                    "baseline_mean": round(float(self.mean[slot, i]), 3),
+                    "fast_mean": round(float(self.fast[slot, i]), 3),
+                    "noise_std": round(std, 3),
+                    "rate_per_s": round(float(self.rate[slot, i]), 3),
+                    "active": [KINDS[k] for k in np.flatnonzero(self.active[slot, i])],
+                }
+            return {"machine_id": machine_id, "samples": int(self.count[slot]),
+                    "warm": bool(self.count[slot] > self.warmup), "last_ts": float(self.last_ts[slot]),
+                    "metrics": metrics}
+
+    def events(self, machine_id=None, limit=100):
+        """Most recent events, newest last, optionally for one machine."""
+        with self._lock:
+            events = [e for e in self.recent_events if machine_id is None or e["machine_id"] == machine_id]
+        return events[-limit:]
@@ -0,0 +1,74 @@
+# services/live_alerts.py
+import os
+import time
+
+from services.alert_rules import RuleEngine
+from services.alert_state import AlertTracker
+
+# --- Alert Thresholds ---
+ALERT_THRESHOLDS = {
+    "PROXIMITY_NEAR": 3.0, "HIGH_NOISE": 90.0,
+    "HIGH_AQI": 200.0, "HIGH_ENGINE_TEMP": 115.0
+}
+
+# Per machine-type overrides of ALERT_THRESHOLDS, keyed by machine id prefix (e.g. "EXC").
+MACHINE_TYPE_THRESHOLDS = {}
+
+alert_rules = RuleEngine(ALERT_THRESHOLDS, machine_type_overrides=MACHINE_TYPE_THRESHOLDS)
+
+# Once raised, an alert stays held until the value moves this far back past the
+# threshold, so readings hovering around it don't flap.
+ALERT_HYSTERESIS = {
+    "PROXIMITY_NEAR": 0.5, "HIGH_NOISE": -3.0,
+    "HIGH_AQI": -10.0, "HIGH_ENGINE_TEMP": -2.0
+}
+
+alert_tracker = AlertTracker(
+    raise_hold=float(os.getenv("ALERT_RAISE_HOLD_S", 0)),
+    clear_hold=float(os.getenv("ALERT_CLEAR_HOLD_S", 10)),
+    min_active=float(os.getenv("ALERT_MIN_ACTIVE_S", 30))
+)
+
+
+GEOFENCE_ALERT = {"type": "GEOFENCE_BREACH", "message": "Machine is outside designated work area."}
+
+
+def _outside_geofence(session, sensor_data):
+    return bool(session.geofence) and not session.geofence.contains(
+        sensor_data['location']['gps']['longitude'], sensor_data['location']['gps']['latitude'])
+
+
+def frame_is_for(session, sensor_data):
+    """True if a telemetry frame was reported by the machine the session is running."""
+    return sensor_data.get('identity', {}).get('machine_id') == session.machine_id
+
+
+def update_alerts(session, sensor_data, submit_event):
+    """
+    Runs one frame through the session's alert state machine and hands only the
+    transitions to `submit_event(shift_id, event_type, details)`.
+    Returns (newly_raised_alerts, newly_cleared_types).
+    """
+    thresholds = session.thresholds or alert_rules.thresholds_for(session.machine_id)
+    hold_thresholds = {k: v + ALERT_HYSTERESIS.get(k, 0) for k, v in thresholds.items()}
+    # One pass over the frame: the rules under both threshold tables, and the geofence once.
+    alerts, held = alert_rules.evaluate_frame_held(sensor_data, thresholds, hold_thresholds)
+    if _outside_geofence(session, sensor_data):
+        alerts.append(dict(GEOFENCE_ALERT))
+        held.add(GEOFENCE_ALERT['type'])
+    current = {a['type']: a for a in alerts}
+
+    raised, cleared = alert_tracker.update(session.alert_state, set(current), held, time.time())
+    new_alerts = [current[t] for t in raised]
+    for alert in new_alerts:
+        submit_event(session.shift_id, alert['type'], dict(alert, state="raised"))
+    for alert_type in cleared:
+        submit_event(session.shift_id, alert_type, {"type": alert_type, "state": "cleared"})
+    return new_alerts, cleared
+
+
+def live_status_payload(session, sensor_data, new_alerts, cleared):
+    return {
+        "live_data": sensor_data, "alerts": new_alerts, "cleared_alerts": cleared,
+        "active_alerts": AlertTracker.active(session.alert_state)
+    }
@@ -0,0 +1,193 @@
+# services/prediction_cache.py
+import asyncio
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def build_ml_payload(task_data):
+    """Builds the ML model API payload from a scheduled_tasks row."""
+    task_inputs = task_data['task_inputs']
+    return {
+        "Machine_ID": task_data['machine_id'],
+        "Operator_ID": task_data['operator_id'],
+        "RPM": task_inputs.get('average_rpm', 1800), # Use a default if not provided
+        "Task_Type": task_data['task_type'],
+        "Soil_Type": task_inputs.get('soil_type'),
+        "Terrain": task_inputs.get('terrain'),
+        "Load_Cycles": task_data['load_cycles_planned'],
+        "Temperature_C": task_inputs.get('temperature_c'),
+        "Precipitation_mm": task_inputs.get('precipitation_mm')
+    }
+
+
+def payload_key(payload):
+    """Stable hash of an ML request payload."""
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class _Flight:
+    """One in-progress upstream call that concurrent callers wait on."""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class PredictionCache:
+    """
+    LRU + TTL cache for ML predictions with single-flight request coalescing.
+
+    Predictions are keyed by a hash of the ML payload, so changed task inputs
+    naturally map to a new entry. When several requests miss on the same key at
+    once, only the first calls upstream; the rest wait for and share its result.
+    Failures are never cached.
+
+    Task payloads are not cached: callers rebuild them from scheduled_tasks on
+    every request, so an edit made through any worker is seen by all of them.
+    """
+
+    def __init__(self, maxsize=4096, ttl_seconds=3600):
+        self.maxsize = maxsize
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()   # key -> (value, expires_at)
+        self._inflight = {}
+        self._async_inflight = {}
+        self._lock = threading.Lock()
+        self.metrics = {
+            "hits": 0, "misses": 0, "coalesced": 0, "upstream_calls": 0,
+            "upstream_errors": 0, "upstream_latency_total_ms": 0.0, "upstream_latency_max_ms": 0.0
+        }
+
+    # --- Predictions ---
+    def get_or_compute(self, key, compute):
+        """Returns the cached value for `key`, calling `compute()` at most once per miss."""
+        with self._lock:
+            value = self._lookup(self._entries, key)
+            if value is not None:
+                self.metrics["hits"] += 1
+                return value
+            flight = self._inflight.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._inflight[key] = _Flight()
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+
+        started = time.perf_counter()
+        try:
+            flight.result = compute()
+            with self._lock:
+                self._store(self._entries, key, flight.result)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            with self._lock:
+                self.metrics["upstream_errors"] += 1
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._inflight.pop(key, None)
+                self.metrics["upstream_calls"] += 1
+                self.metrics["upstream_latency_total_ms"] += elapsed_ms
+                self.metrics["upstream_latency_max_ms"] = max(self.metrics["upstream_latency_max_ms"], elapsed_ms)
+            flight.done.set()
+
+    async def get_or_compute_async(self, key, compute):
+        """
+        Asyncio counterpart of get_or_compute for the ASGI server: `compute` is a
+        coroutine function, and coalesced callers await the leader's future
+        instead of blocking a thread.
+        """
+        with self._lock:
+            value = self._lookup(self._entries, key)
+            if value is not None:
+                self.metrics["hits"] += 1
+                return value
+            future = self._async_inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._async_inflight[key] = asyncio.get_running_loop().create_future()
+                self.metrics["misses"] += 1
+            else:
+                self.metrics["coalesced"] += 1
+
+        if not leader:
+            # shield() keeps one cancelled waiter from cancelling the shared call.
+            return await asyncio.shield(future)
+
+        started = time.perf_counter()
+        try:
+            result = await compute()
+            with self._lock:
+                self._store(self._entries, key, result)
+            future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            with self._lock:
+                self.metrics["upstream_errors"] += 1
+            future.set_exception(e)
+            # Mark the exception retrieved so a leader with no followers doesn't log a warning.
+            future.exception()
+            raise
+        finally:
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._lock:
+                self._async_inflight.pop(key, None)
+                self.metrics["upstream_calls"] += 1
+                self.metrics["upstream_latency_total_ms"] += elapsed_ms
+                self.metrics["upstream_latency_max_ms"] = max(self.metrics["upstream_latency_max_ms"], elapsed_ms)
+
+    def peek(self, key):
+        """Returns a cached prediction without computing on a miss; counts as a hit or miss."""
+        with self._lock:
+            value = self._lookup(self._entries, key)
+            self.metrics["hits" if value is not None else "misses"] += 1
+            return value
+
+    def put(self, key, value):
+        """Stores a prediction obtained outside get_or_compute, e.g. from a batch call."""
+        with self._lock:
+            self._store(self._entries, key, value)
+
+    def stats(self):
+        with self._lock:
+            snapshot = dict(self.metrics)
+            lookups = snapshot["hits"] + snapshot["misses"] + snapshot["coalesced"]
+            snapshot["hit_ratio"] = round(snapshot["hits"] / lookups, 4) if lookups else 0.0
+            calls = snapshot["upstream_calls"]
+            snapshot["upstream_latency_avg_ms"] = round(snapshot["upstream_latency_total_ms"] / calls, 2) if calls else 0.0
+            snapshot["size"] = len(self._entries)
+        return snapshot
+
+    # --- Internals (caller holds the lock) ---
+    def _lookup(self, table, key):
+        entry = table.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at < time.monotonic():
+            del table[key]
+            return None
+        table.move_to_end(key)
+        return value
+
+    def _store(self, table, key, value):
+        table[key] = (value, time.monotonic() + self.ttl_seconds)
+        table.move_to_end(key)
+        while len(table) > self.maxsize:
+            table.popitem(last=False)
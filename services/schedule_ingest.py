@@ -0,0 +1,120 @@
+# services/schedule_ingest.py
+import io
+import json
+
+import psycopg2.extras
+
+TASK_COLUMNS = [
+    "assigned_date", "operator_id", "machine_id", "task_type",
+    "load_cycles_planned", "geofence", "task_inputs"
+]
+
+# Uploads larger than this go through COPY + INSERT...SELECT instead of multi-row VALUES.
+COPY_THRESHOLD = 5000
+VALUES_PAGE_SIZE = 1000
+
+
+def geofence_wkt(points):
+    """Builds a POLYGON WKT string from a list of [lon, lat] pairs."""
+    return "POLYGON((" + ", ".join(f"{p[0]} {p[1]}" for p in points) + "))"
+
+
+def insert_tasks_rowwise(cur, tasks):
+    """The original one-INSERT-per-task path. Kept for comparison in the benchmark."""
+    task_ids = []
+    for task in tasks:
+        cur.execute(
+            """
+            INSERT INTO scheduled_tasks (assigned_date, operator_id, machine_id, task_type, load_cycles_planned, geofence, task_inputs)
+            VALUES (%s, %s, %s, %s, %s, ST_GeomFromText(%s, 4326), %s) RETURNING task_id;
+            """,
+            (
+                task['assigned_date'], task['operator_id'], task['machine_id'],
+                task['task_type'], task['load_cycles_planned'],
+                geofence_wkt(task['geofence_points']), psycopg2.extras.Json(task['task_inputs'])
+            )
+        )
+        task_ids.append(cur.fetchone()[0])
+    return task_ids
+
+
+def insert_tasks_values(cur, tasks, page_size=VALUES_PAGE_SIZE):
+    """
+    Inserts tasks with multi-row INSERT ... VALUES statements, one per page.
+    RETURNING rows come back in VALUES order, so task_ids line up with the input.
+    """
+    rows = [
+        (
+            task['assigned_date'], task['operator_id'], task['machine_id'],
+            task['task_type'], task['load_cycles_planned'],
+            geofence_wkt(task['geofence_points']), psycopg2.extras.Json(task['task_inputs'])
+        )
+        for task in tasks
+    ]
+    returned = psycopg2.extras.execute_values(
+        cur,
+        f"INSERT INTO scheduled_tasks ({', '.join(TASK_COLUMNS)}) VALUES %s RETURNING task_id;",
+        rows,
+        template="(%s, %s, %s, %s, %s, ST_GeomFromText(%s, 4326), %s)",
+        page_size=page_size,
+        fetch=True
+    )
+    return [row[0] for row in returned]
+
+
+def _copy_field(value):
+    """Escapes a value for PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    return (
+        str(value).replace("\\", "\\\\").replace("\t", "\\t")
+        .replace("\n", "\\n").replace("\r", "\\r")
+    )
+
+
+def insert_tasks_copy(cur, tasks):
+    """
+    Streams tasks into a temporary staging table with COPY, then moves them into
+    scheduled_tasks with a single INSERT ... SELECT.
+
+    The staging table mirrors the real column types, so geofences are loaded as
+    EWKT and parsed by PostGIS during COPY. Rows are inserted in `ord` order, so
+    the serial task_ids are assigned in upload order; sorting the returned ids
+    restores that order regardless of how RETURNING emits them.
+    """
+    columns = ", ".join(TASK_COLUMNS)
+    cur.execute(
+        f"CREATE TEMP TABLE schedule_staging ON COMMIT DROP AS "
+        f"SELECT {columns} FROM scheduled_tasks WITH NO DATA;"
+    )
+    cur.execute("ALTER TABLE schedule_staging ADD COLUMN ord integer;")
+
+    buf = io.StringIO()
+    for ord_, task in enumerate(tasks):
+        fields = (
+            task['assigned_date'], task['operator_id'], task['machine_id'],
+            task['task_type'], task['load_cycles_planned'],
+            "SRID=4326;" + geofence_wkt(task['geofence_points']),
+            json.dumps(task['task_inputs']), ord_
+        )
+        buf.write("\t".join(_copy_field(f) for f in fields))
+        buf.write("\n")
+    buf.seek(0)
+    cur.copy_expert(f"COPY schedule_staging ({columns}, ord) FROM STDIN;", buf)
+
+    cur.execute(
+        f"INSERT INTO scheduled_tasks ({columns}) "
+        f"SELECT {columns} FROM schedule_staging ORDER BY ord RETURNING task_id;"
+    )
+    task_ids = sorted(row[0] for row in cur.fetchall())
+    cur.execute("DROP TABLE schedule_staging;")
+    return task_ids
+
+
+def insert_tasks(cur, tasks):
+    """Bulk-inserts scheduled tasks and returns their task_ids in input order."""
+    if not tasks:
+        return []
+    if len(tasks) > COPY_THRESHOLD:
+        return insert_tasks_copy(cur, tasks)
+    return insert_tasks_values(cur, tasks)
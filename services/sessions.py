@@ -0,0 +1,320 @@
+# services/sessions.py
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from services.geofence import PreparedGeofence
+
+try:
+    import redis
+except ImportError:  # Only needed for the shared multi-worker backend.
+    redis = None
+
+
+class InvalidShiftId(ValueError):
+    """A shift_id parameter that is not an integer; the servers answer 400."""
+
+
+def parse_shift_id(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise InvalidShiftId(f"shift_id must be an integer, got {value!r}.") from None
+
+
+class InvalidGeofence(ValueError):
+    """A task geofence whose WKT cannot be compiled; the servers answer 400."""
+
+
+class Session:
+    """Live state for one logged-in shift on one machine."""
+
+    def __init__(self, shift_id, machine_id=None, operator_id=None, task_id=None,
+                 geofence_wkt=None, thresholds=None, last_telemetry=None, last_seen=None,
+                 alert_state=None):
+        self.shift_id = shift_id
+        self.machine_id = machine_id
+        self.operator_id = operator_id
+        self.task_id = task_id
+        self.geofence_wkt = geofence_wkt
+        self.thresholds = thresholds or {}
+        self.last_telemetry = last_telemetry
+        self.last_seen = last_seen or time.time()
+        self.alert_state = alert_state or {}
+        self._geofence = None
+        self._geofence_source = None
+        # Encoded fields as last read from / written to a shared backend, so a
+        # save can send only what this copy changed.
+        self._stored = {}
+
+    @property
+    def geofence(self):
+        """The compiled geofence, rebuilt only when the WKT changes."""
+        if not self.geofence_wkt:
+            return None
+        if self._geofence_source != self.geofence_wkt:
+            self._geofence = PreparedGeofence.from_wkt(self.geofence_wkt)
+            self._geofence_source = self.geofence_wkt
+        return self._geofence
+
+    def set_task(self, task_id, geofence_wkt):
+        """
+        Switches the active task and compiles its geofence up front. Raises
+        InvalidGeofence, leaving the session unchanged, if the WKT is unusable.
+        """
+        try:
+            prepared = PreparedGeofence.from_wkt(geofence_wkt) if geofence_wkt else None
+        except (ValueError, IndexError) as e:
+            raise InvalidGeofence(f"Task {task_id} has an unusable geofence: {e}") from None
+        self.task_id = task_id
+        self.geofence_wkt = geofence_wkt
+        self._geofence = prepared
+        self._geofence_source = geofence_wkt
+
+    def to_dict(self):
+        return {
+            "shift_id": self.shift_id, "machine_id": self.machine_id,
+            "operator_id": self.operator_id, "task_id": self.task_id,
+            "geofence_wkt": self.geofence_wkt, "thresholds": self.thresholds,
+            "last_telemetry": self.last_telemetry, "last_seen": self.last_seen,
+            "alert_state": self.alert_state
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+
+class InMemorySessionRegistry:
+    """
+    Sessions keyed by shift_id with a machine_id index, held in this process.
+
+    Entries are kept in least-recently-touched order so expired sessions can be
+    evicted from the front without scanning the whole registry.
+    """
+
+    def __init__(self, ttl_seconds=8 * 3600):
+        self.ttl_seconds = ttl_seconds
+        self._sessions = OrderedDict()
+        self._by_machine = {}
+        self._lock = threading.Lock()
+
+    def put(self, session):
+        session.last_seen = time.time()
+        with self._lock:
+            self._evict_expired_locked(session.last_seen)
+            self._sessions[session.shift_id] = session
+            self._sessions.move_to_end(session.shift_id)
+            if session.machine_id:
+                self._by_machine[session.machine_id] = session.shift_id
+
+    def get(self, shift_id):
+        now = time.time()
+        with self._lock:
+            self._evict_expired_locked(now)
+            session = self._sessions.get(shift_id)
+            if session is not None:
+                session.last_seen = now
+                self._sessions.move_to_end(shift_id)
+            return session
+
+    def get_by_machine(self, machine_id):
+        shift_id = self._by_machine.get(machine_id)
+        return self.get(shift_id) if shift_id is not None else None
+
+    def save(self, session):
+        """Persists changes made to a session object. A no-op beyond touching it in memory."""
+        self.put(session)
+
+    def remove(self, shift_id):
+        with self._lock:
+            session = self._sessions.pop(shift_id, None)
+            if session and self._by_machine.get(session.machine_id) == shift_id:
+                del self._by_machine[session.machine_id]
+
+    def all(self):
+        with self._lock:
+            self._evict_expired_locked(time.time())
+            return list(self._sessions.values())
+
+    def __len__(self):
+        return len(self._sessions)
+
+    def _evict_expired_locked(self, now):
+        while self._sessions:
+            shift_id, oldest = next(iter(self._sessions.items()))
+            if now - oldest.last_seen < self.ttl_seconds:
+                break
+            self._sessions.popitem(last=False)
+            if self._by_machine.get(oldest.machine_id) == shift_id:
+                del self._by_machine[oldest.machine_id]
+
+
+class RedisSessionRegistry:
+    """
+    Sessions stored in Redis so every gunicorn worker sees the same state.
+
+    Each session is a hash of JSON-encoded fields whose key expiry is refreshed
+    on access, which gives TTL eviction for free. `save` writes back only the
+    fields this copy changed, so the telemetry hub updating alert_state and a
+    request setting the task at the same time don't overwrite each other. A sorted set of shift ids scored by expiry
+    time backs `all()` and `len()` without scanning the keyspace. Compiled
+    geofences are cached per worker (the `local_cache_size` most recently
+    used sessions) and only rebuilt when the stored WKT changes.
+    """
+
+    KEY_PREFIX = "session:"
+    INDEX_KEY = "session-index"
+
+    def __init__(self, url, ttl_seconds=8 * 3600, local_cache_size=1024):
+        if redis is None:
+            raise RuntimeError("SESSION_BACKEND=redis requires the 'redis' package.")
+        self.ttl_seconds = ttl_seconds
+        self.local_cache_size = local_cache_size
+        self._client = redis.Redis.from_url(url)
+        self._local = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _key(self, shift_id):
+        return f"{self.KEY_PREFIX}{shift_id}"
+
+    def _machine_key(self, machine_id):
+        return f"{self.KEY_PREFIX}machine:{machine_id}"
+
+    def _cache(self, session):
+        with self._lock:
+            self._local[session.shift_id] = session
+            self._local.move_to_end(session.shift_id)
+            while len(self._local) > self.local_cache_size:
+                self._local.popitem(last=False)
+
+    def _cached(self, shift_id):
+        with self._lock:
+            session = self._local.get(shift_id)
+            if session is not None:
+                self._local.move_to_end(shift_id)
+            return session
+
+    def _forget(self, shift_id):
+        with self._lock:
+            self._local.pop(shift_id, None)
+
+    @staticmethod
+    def _encode(session):
+        session.last_seen = time.time()
+        return {key: json.dumps(value) for key, value in session.to_dict().items()}
+
+    @staticmethod
+    def _decode(raw):
+        """(stored, data) for an HGETALL reply: the encoded fields and their values."""
+        stored = {key.decode(): value.decode() for key, value in raw.items()}
+        return stored, {key: json.loads(value) for key, value in stored.items()}
+
+    @staticmethod
+    def _changed(session, fields):
+        return {key: value for key, value in fields.items() if session._stored.get(key) != value}
+
+    def _queue_write(self, pipe, session, fields):
+        key = self._key(session.shift_id)
+        pipe.hset(key, mapping=fields)
+        pipe.expire(key, self.ttl_seconds)
+        if session.machine_id:
+            pipe.set(self._machine_key(session.machine_id), session.shift_id, ex=self.ttl_seconds)
+        pipe.zadd(self.INDEX_KEY, {session.shift_id: session.last_seen + self.ttl_seconds})
+
+    def put(self, session):
+        fields = self._encode(session)
+        pipe = self._client.pipeline()
+        pipe.delete(self._key(session.shift_id))
+        self._queue_write(pipe, session, fields)
+        pipe.execute()
+        session._stored = fields
+        self._cache(session)
+
+    def get(self, shift_id):
+        key = self._key(shift_id)
+        pipe = self._client.pipeline()
+        pipe.hgetall(key)
+        pipe.expire(key, self.ttl_seconds)
+        pipe.zadd(self.INDEX_KEY, {shift_id: time.time() + self.ttl_seconds}, xx=True)
+        raw = pipe.execute()[0]
+        if not raw:
+            self._client.zrem(self.INDEX_KEY, shift_id)
+        return self._from_raw(shift_id, raw)
+
+    def _from_raw(self, shift_id, raw):
+        """The session for a stored hash, reusing this worker's copy (and its compiled geofence)."""
+        if not raw:
+            self._forget(shift_id)
+            return None
+        stored, data = self._decode(raw)
+        session = self._cached(shift_id)
+        if session is None:
+            session = Session.from_dict(data)
+            self._cache(session)
+        else:
+            # Refresh fields from the shared copy but keep the compiled geofence.
+            for key, value in data.items():
+                setattr(session, key, value)
+        session._stored = stored
+        return session
+
+    def get_by_machine(self, machine_id):
+        shift_id = self._client.get(self._machine_key(machine_id))
+        return self.get(int(shift_id)) if shift_id is not None else None
+
+    def save(self, session):
+        """Writes back the fields changed since this worker read or last saved the session."""
+        fields = self._encode(session)
+        changed = self._changed(session, fields)
+        pipe = self._client.pipeline()
+        pipe.exists(self._key(session.shift_id))
+        self._queue_write(pipe, session, changed)
+        if not pipe.execute()[0]:
+            # It expired in between; write it back whole rather than as a partial hash.
+            pipe = self._client.pipeline()
+            self._queue_write(pipe, session, fields)
+            pipe.execute()
+        session._stored = fields
+        self._cache(session)
+
+    def remove(self, shift_id):
+        session = self.get(shift_id)
+        keys = [self._key(shift_id)]
+        if session and session.machine_id:
+            keys.append(self._machine_key(session.machine_id))
+        pipe = self._client.pipeline()
+        pipe.delete(*keys)
+        pipe.zrem(self.INDEX_KEY, shift_id)
+        pipe.execute()
+        self._forget(shift_id)
+
+    def _live_ids(self):
+        # Index entries whose expiry has passed belong to keys Redis already dropped.
+        pipe = self._client.pipeline()
+        pipe.zremrangebyscore(self.INDEX_KEY, "-inf", time.time())
+        pipe.zrange(self.INDEX_KEY, 0, -1)
+        return [int(shift_id) for shift_id in pipe.execute()[1]]
+
+    def all(self):
+        shift_ids = self._live_ids()
+        if not shift_ids:
+            return []
+        pipe = self._client.pipeline()
+        for shift_id in shift_ids:
+            pipe.hgetall(self._key(shift_id))
+        return [Session.from_dict(self._decode(raw)[1]) for raw in pipe.execute() if raw]
+
+    def __len__(self):
+        pipe = self._client.pipeline()
+        pipe.zremrangebyscore(self.INDEX_KEY, "-inf", time.time())
+        pipe.zcard(self.INDEX_KEY)
+        return pipe.execute()[1]
+
+
+def create_registry(backend="memory", redis_url=None, ttl_seconds=8 * 3600):
+    """Builds the session registry selected by configuration."""
+    if backend == "redis":
+        return RedisSessionRegistry(redis_url, ttl_seconds=ttl_seconds)
+    return InMemorySessionRegistry(ttl_seconds=ttl_seconds)
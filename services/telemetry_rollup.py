@@ -0,0 +1,284 @@
+# services/telemetry_rollup.py
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from services.alert_rules import METRIC_EXTRACTORS
+from services.telemetry_store import HISTORY_METRICS
+
+# Bucket width (seconds) -> how many buckets are kept: 1 hour of 1s, 7 days of 1m, 1 year of 1h.
+DEFAULT_RESOLUTIONS = OrderedDict([(1, 3600), (60, 7 * 24 * 60), (3600, 365 * 24)])
+
+# Default number of points a query returns when no step is given.
+DEFAULT_MAX_POINTS = 500
+
+
+def _empty_buckets(count, n):
+    # One row per bucket: [count, sum_1..n, min_1..n, max_1..n]
+    buckets = np.empty((count, 1 + 3 * n))
+    buckets[:, :1 + n] = 0
+    buckets[:, 1 + n:1 + 2 * n] = np.inf
+    buckets[:, 1 + 2 * n:] = -np.inf
+    return buckets
+
+
+class _Series:
+    """
+    Rolling buckets of one key at one resolution, in ring arrays: bucket
+    `index` lives in row `index % capacity`, and `indexes` records which bucket
+    each row currently holds. Rows older than the newest bucket minus
+    `retention` are stale and get reset when their slot is reused, so any
+    insert, in order or not, is O(1).
+
+    The ring starts at `INITIAL_CAPACITY` rows and doubles (up to `retention`)
+    whenever the span of buckets it must hold outgrows it, so a key seen a few
+    times costs a few rows rather than a full retention window.
+    """
+
+    EMPTY = np.iinfo(np.int64).min
+    INITIAL_CAPACITY = 16
+
+    def __init__(self, resolution, retention, n):
+        self.resolution = resolution
+        self.retention = retention
+        self.n = n
+        self._allocate(min(retention, self.INITIAL_CAPACITY))
+        self.first = None   # oldest bucket index ever inserted
+        self.latest = None  # newest bucket index ever inserted
+
+    def _allocate(self, capacity):
+        self.capacity = capacity
+        self.indexes = np.full(capacity, self.EMPTY, dtype=np.int64)
+        self.data = _empty_buckets(capacity, self.n)
+
+    def _fit(self, low, high):
+        """Updates first/latest for buckets low..high and grows the ring so every live bucket has its own row."""
+        self.latest = high if self.latest is None else max(self.latest, high)
+        self.first = low if self.first is None else min(self.first, low)
+        # Live buckets fall in (latest - retention, latest]; ones at least as new
+        # as `first` can exist, and any `capacity` consecutive indexes map to distinct rows.
+        span = self.latest - max(self.first, self.latest - self.retention + 1) + 1
+        if span <= self.capacity:
+            return
+        old_indexes, old_data = self.indexes, self.data
+        self._allocate(min(self.retention, max(span, 2 * self.capacity)))
+        live = old_indexes > self.latest - self.retention
+        slots = old_indexes[live] % self.capacity
+        self.indexes[slots] = old_indexes[live]
+        self.data[slots] = old_data[live]
+
+    @property
+    def evicted_before(self):
+        """Data older than this (epoch seconds) has been dropped."""
+        if self.latest is None or self.latest - self.retention < self.first:
+            return float("-inf")
+        return (self.latest - self.retention + 1) * self.resolution
+
+    def _claim(self, indexes):
+        """Rows for bucket `indexes` (unique), resetting slots that held older buckets; -1 for expired ones."""
+        self._fit(int(indexes.min()), int(indexes.max()))
+        live = indexes > self.latest - self.retention
+        slots = indexes % self.capacity
+        reuse = live & (self.indexes[slots] != indexes)
+        self.data[slots[reuse]] = _empty_buckets(1, self.n)
+        self.indexes[slots[reuse]] = indexes[reuse]
+        return np.where(live, slots, -1)
+
+    def bucket(self, index):
+        """The row of bucket `index`, or None if it is already past retention."""
+        # Scalar twin of _claim for the per-frame path.
+        if self.latest is None or index > self.latest or index < self.first:
+            self._fit(index, index)
+        if index <= self.latest - self.retention:
+            return None
+        slot = index % self.capacity
+        row = self.data[slot]
+        if self.indexes[slot] != index:
+            self.indexes[slot] = index
+            n = self.n
+            row[:1 + n] = 0
+            row[1 + n:1 + 2 * n] = np.inf
+            row[1 + 2 * n:] = -np.inf
+        return row
+
+    def merge(self, indexes, counts, sums, mins, maxs):
+        """Folds pre-aggregated buckets (unique `indexes`) in."""
+        slots = self._claim(indexes)
+        keep = slots >= 0
+        slots = slots[keep]
+        n = sums.shape[1]
+        self.data[slots, 0] += counts[keep]
+        self.data[slots, 1:1 + n] += sums[keep]
+        self.data[slots, 1 + n:1 + 2 * n] = np.minimum(self.data[slots, 1 + n:1 + 2 * n], mins[keep])
+        self.data[slots, 1 + 2 * n:] = np.maximum(self.data[slots, 1 + 2 * n:], maxs[keep])
+
+    def window(self, start, end):
+        """(indexes, rows) of the live buckets overlapping [start, end), copied."""
+        if self.latest is None:
+            return np.empty(0, dtype=np.int64), self.data[:0].copy()
+        indexes = self.indexes
+        selected = np.flatnonzero((indexes > self.latest - self.retention)
+                                  & ((indexes + 1) * self.resolution > start) & (indexes * self.resolution < end))
+        return indexes[selected], self.data[selected]
+
+
+class TelemetryRollup:
+    """
+    Streaming min/max/mean/count per metric, kept at several resolutions
+    (1s, 1m, 1h by default) for every machine and operator.
+
+    Each accepted frame updates one bucket per resolution, so the cost per
+    frame is constant and nothing is ever recomputed from raw samples. Queries
+    read the coarsest resolution that is at least as fine as the requested
+    step and still covers the requested range, then merge its buckets into
+    step-sized points.
+
+    Rollups live in memory. After a restart `seed_from_store` rebuilds the
+    machine series from the telemetry history; the store does not record who
+    was operating, so operator series start empty and fill from live frames.
+    """
+
+    def __init__(self, resolutions=None, metrics=None):
+        self.resolutions = OrderedDict(sorted((resolutions or DEFAULT_RESOLUTIONS).items()))
+        self.metrics = list(metrics or HISTORY_METRICS)
+        self._series = {}  # (kind, id, resolution) -> _Series
+        self._lock = threading.Lock()
+        self.stats = {"frames": 0, "seeded_samples": 0}
+
+    @staticmethod
+    def keys_for(frame):
+        identity = frame.get('identity', {})
+        keys = [("machine", identity.get('machine_id'))]
+        if identity.get('operator_id'):
+            keys.append(("operator", identity['operator_id']))
+        return [k for k in keys if k[1]]
+
+    def _get_series(self, kind, key_id, resolution):
+        series = self._series.get((kind, key_id, resolution))
+        if series is None:
+            series = self._series[(kind, key_id, resolution)] = _Series(
+                resolution, self.resolutions[resolution], len(self.metrics))
+        return series
+
+    # --- Updates ---
+    def add(self, frame, ts=None):
+        """Folds one telemetry frame into every resolution of its machine and operator."""
+        ts = time.time() if ts is None else ts
+        values = np.array([METRIC_EXTRACTORS[m](frame) for m in self.metrics], dtype=np.float64)
+        n = len(values)
+        with self._lock:
+            for kind, key_id in self.keys_for(frame):
+                for resolution in self.resolutions:
+                    bucket = self._get_series(kind, key_id, resolution).bucket(int(ts // resolution))
+                    if bucket is None:
+                        continue
+                    bucket[0] += 1
+                    bucket[1:1 + n] += values
+                    np.minimum(bucket[1 + n:1 + 2 * n], values, out=bucket[1 + n:1 + 2 * n])
+                    np.maximum(bucket[1 + 2 * n:], values, out=bucket[1 + 2 * n:])
+            self.stats["frames"] += 1
+
+    def seed(self, kind, key_id, rows):
+        """
+        Bulk-loads historical samples (a telemetry_store structured array) so
+        rollups survive restarts. Each resolution only takes rows inside its
+        retention window.
+        """
+        if len(rows) == 0:
+            return
+        now = time.time()
+        with self._lock:
+            for resolution, retention in self.resolutions.items():
+                selected = rows[rows["ts"] >= now - resolution * retention]
+                if len(selected) == 0:
+                    continue
+                order = np.argsort(selected["ts"], kind="stable")
+                selected = selected[order]
+                values = np.column_stack([selected[m].astype(np.float64) for m in self.metrics])
+                indexes = (selected["ts"] // resolution).astype(np.int64)
+                starts = np.flatnonzero(np.r_[True, indexes[1:] != indexes[:-1]])
+                counts = np.diff(np.r_[starts, len(indexes)])
+                sums = np.add.reduceat(values, starts)
+                mins = np.minimum.reduceat(values, starts)
+                maxs = np.maximum.reduceat(values, starts)
+                self._get_series(kind, key_id, resolution).merge(indexes[starts], counts, sums, mins, maxs)
+            self.stats["seeded_samples"] += len(rows)
+
+    def seed_from_store(self, store, until=None):
+        """
+        Rebuilds machine rollups from the telemetry history store, e.g. at
+        startup. Operator rollups are not rebuilt: stored samples carry no
+        operator id. Pass `until` (the time live updates began) so samples are
+        not counted twice.
+        """
+        until = time.time() if until is None else until
+        longest = max(r * k for r, k in self.resolutions.items())
+        for machine_id in store.machines():
+            self.seed("machine", machine_id, store.read(machine_id, until - longest, until))
+
+    # --- Queries ---
+    def choose_resolution(self, kind, key_id, start, step):
+        """The coarsest resolution <= step whose retained buckets still reach back to `start`."""
+        with self._lock:
+            # Prefer resolutions that divide the step, so no bucket straddles two points.
+            candidates = ([r for r in self.resolutions if r <= step and step % r == 0]
+                          or [r for r in self.resolutions if r <= step] or [min(self.resolutions)])
+            for resolution in reversed(candidates):
+                series = self._series.get((kind, key_id, resolution))
+                if series is not None and series.evicted_before <= start:
+                    return resolution
+            # Nothing retains the full range; fall back to the coarsest candidate, which reaches back furthest.
+            return candidates[-1]
+
+    def query(self, kind, key_id, start, end, step=None, metrics=None, max_points=DEFAULT_MAX_POINTS):
+        """
+        Returns {"ts", "count", metric, metric_min, metric_max, ...} with one
+        point per `step` seconds that has data, plus the resolution that was
+        read. Points start at multiples of `step` (epoch-aligned), so they line
+        up exactly with the rollup buckets whenever the resolution divides the step.
+        """
+        metrics = metrics or self.metrics
+        unknown = set(metrics) - set(self.metrics)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+        if step is None:
+            finest = min(self.resolutions)
+            step = finest * max(1, math.ceil((end - start) / max_points / finest))
+        if step <= 0:
+            raise ValueError("step must be positive")
+
+        resolution = self.choose_resolution(kind, key_id, start, step)
+        n = len(self.metrics)
+        with self._lock:
+            series = self._series.get((kind, key_id, resolution))
+            indexes, data = (np.empty(0, dtype=np.int64), None) if series is None else series.window(start, end)
+        result = {"resolution": resolution, "ts": [], "count": []}
+        for m in metrics:
+            result[m], result[f"{m}_min"], result[f"{m}_max"] = [], [], []
+        if len(indexes) == 0:
+            return result
+
+        points = (indexes * resolution // step).astype(np.int64)
+        occupied, inverse = np.unique(points, return_inverse=True)
+        k = len(occupied)
+        counts = np.bincount(inverse, weights=data[:, 0], minlength=k)
+        result["ts"] = (occupied * step).tolist()
+        result["count"] = counts.astype(int).tolist()
+        for m in metrics:
+            j = self.metrics.index(m)
+            sums = np.bincount(inverse, weights=data[:, 1 + j], minlength=k)
+            mins = np.full(k, np.inf)
+            maxs = np.full(k, -np.inf)
+            np.minimum.at(mins, inverse, data[:, 1 + n + j])
+            np.maximum.at(maxs, inverse, data[:, 1 + 2 * n + j])
+            result[m] = (sums / counts).tolist()
+            result[f"{m}_min"] = mins.tolist()
+            result[f"{m}_max"] = maxs.tolist()
+        return result
+
+    def series_count(self):
+        with self._lock:
+            return len(self._series)
@@ -0,0 +1,268 @@
+# services/telemetry_store.py
+import atexit
+import json
+import os
+import re
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+
+from services.alert_rules import METRIC_EXTRACTORS
+
+# Metrics kept per sample, read from a simulator frame. `ts` is the receive time
+# (epoch seconds); the simulator frames carry no timestamp of their own.
+HISTORY_METRICS = ["engine_rpm", "engine_temp_c", "proximity_min_m", "noise_db", "dust_aqi", "fuel_percent"]
+SAMPLE_DTYPE = np.dtype(
+    [("ts", "<f8")] + [(m, "<f4") for m in HISTORY_METRICS] + [("latitude", "<f8"), ("longitude", "<f8")]
+)
+COLUMNS = list(SAMPLE_DTYPE.names)
+
+HOUR_FORMAT = "%Y%m%dT%H"
+
+# Machine ids become directory names, so only plain identifiers are accepted.
+_MACHINE_ID = re.compile(r"^[A-Za-z0-9_-]+$")
+
+
+def hour_partition(ts):
+    """The hourly partition name (UTC) a sample timestamp falls into."""
+    return datetime.fromtimestamp(ts, tz=timezone.utc).strftime(HOUR_FORMAT)
+
+
+def parse_timestamp(value):
+    """Accepts epoch seconds or an ISO-8601 string (naive values are taken as UTC)."""
+    try:
+        return float(value)
+    except ValueError:
+        parsed = datetime.fromisoformat(value)
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.timestamp()
+
+
+def frame_to_sample(frame, ts):
+    gps = frame['location']['gps']
+    return (ts, *(METRIC_EXTRACTORS[m](frame) for m in HISTORY_METRICS), gps['latitude'], gps['longitude'])
+
+
+class TelemetryStore:
+    """
+    Append-only, columnar telemetry history on local disk.
+
+    Samples are buffered in memory per machine and flushed as NumPy
+    structured-array files, one directory per machine per UTC hour:
+
+        <root>/<machine_id>/<YYYYMMDDTHH>/part-<first_ts_ms>.npy
+
+    Files are never rewritten except by `compact()`, which merges the parts
+    of past hours into a single `chunk.npy`. Queries only open the hour
+    directories that overlap the requested range, and also see rows that are
+    still in the buffer.
+
+    `append()` only buffers. A background thread flushes when a buffer
+    reaches `flush_rows` or every `flush_interval` seconds, and compacts the
+    finished hours at each hour rollover, so request threads (and the event
+    loop of the async server) never wait on disk I/O.
+    """
+
+    def __init__(self, root, flush_rows=600, flush_interval=30.0, repeat_interval=1.0):
+        self.root = root
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.repeat_interval = repeat_interval
+        self._buffers = {}     # machine_id -> list of sample tuples
+        self._last = {}        # machine_id -> (ts, content) of the last accepted sample
+        self._last_flush = time.monotonic()
+        self._compacted_hour = None
+        self._lock = threading.Lock()     # guards the buffers
+        self._io_lock = threading.Lock()  # a flush and a read never interleave, so reads see every row once
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self.metrics = {"samples": 0, "dropped_duplicates": 0, "flushes": 0, "files_written": 0, "flush_errors": 0,
+                        "unstorable_ids": 0}
+        atexit.register(self.stop)
+
+    # --- Writes ---
+    def append(self, frame, ts=None):
+        """
+        Records one frame. A frame whose content is identical to the machine's
+        previous sample is a duplicate (many dashboards and the stream hub poll
+        the same reading) and is dropped, unless `repeat_interval` seconds have
+        passed, so a machine whose readings hold steady still shows up in the
+        history. Frames that changed are always kept. Returns whether the sample was
+        new, so callers can apply the same de-duplication to other consumers;
+        that is independent of whether it could be stored (machine ids that are
+        not valid directory names are kept out of the history).
+        """
+        ts = time.time() if ts is None else ts
+        machine_id = frame['identity']['machine_id']
+        content = json.dumps(frame, sort_keys=True, default=str)
+        with self._lock:
+            last_ts, last_content = self._last.get(machine_id, (float("-inf"), None))
+            if content == last_content and ts - last_ts < self.repeat_interval:
+                self.metrics["dropped_duplicates"] += 1
+                return False
+            self._last[machine_id] = (ts, content)
+            if not isinstance(machine_id, str) or not _MACHINE_ID.match(machine_id):
+                self.metrics["unstorable_ids"] += 1
+                return True
+            buffer = self._buffers.setdefault(machine_id, [])
+            buffer.append(frame_to_sample(frame, ts))
+            self.metrics["samples"] += 1
+            due = len(buffer) >= self.flush_rows
+        self._ensure_running()
+        if due:
+            self._wake.set()
+        return True
+
+    def stop(self):
+        """Stops the flusher and writes whatever is still buffered. Used at shutdown."""
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        self.flush()
+
+    # --- Flusher ---
+    def _ensure_running(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telemetry-flush", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Woken early when a buffer fills up; otherwise flushes on the interval.
+            self._wake.wait(max(0.0, self.flush_interval - (time.monotonic() - self._last_flush)))
+            self._wake.clear()
+            if self._stop.is_set():
+                return
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"Telemetry store: flush failed, keeping samples for the next attempt: {e}")
+                self.metrics["flush_errors"] += 1
+                time.sleep(1.0)
+
+    def flush(self):
+        """Writes every buffered sample to its hour partition."""
+        with self._io_lock:
+            with self._lock:
+                buffers, self._buffers = self._buffers, {}
+                self._last_flush = time.monotonic()
+            written = set()
+            try:
+                for machine_id, samples in buffers.items():
+                    if samples:
+                        self._write(machine_id, np.array(samples, dtype=SAMPLE_DTYPE))
+                    written.add(machine_id)
+            except Exception:
+                # Put back what was not written, ahead of anything buffered since.
+                with self._lock:
+                    for machine_id, samples in buffers.items():
+                        if machine_id not in written:
+                            self._buffers[machine_id] = samples + self._buffers.get(machine_id, [])
+                raise
+            self.metrics["flushes"] += 1
+        # Once per hour rollover, merge the finished hours' parts into single chunks.
+        hour = hour_partition(time.time())
+        if hour != self._compacted_hour:
+            self._compacted_hour = hour
+            self.compact()
+
+    def _write(self, machine_id, rows):
+        hours = np.array([hour_partition(ts) for ts in rows["ts"]])
+        for hour in np.unique(hours):
+            part = rows[hours == hour]
+            directory = os.path.join(self.root, machine_id, hour)
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, f"part-{int(part['ts'][0] * 1000)}.npy")
+            # Write to a temp name first so readers never see a half-written part.
+            tmp_path = path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                np.save(f, part)
+            os.replace(tmp_path, path)
+            self.metrics["files_written"] += 1
+
+    def compact(self, before=None):
+        """Merges the part files of every hour that ended before `before` (default: now) into chunk.npy."""
+        current = hour_partition(before or time.time())
+        for machine_id in self.machines():
+            machine_dir = os.path.join(self.root, machine_id)
+            for hour in os.listdir(machine_dir):
+                if hour >= current:
+                    continue
+                directory = os.path.join(machine_dir, hour)
+                parts = sorted(p for p in os.listdir(directory) if p.startswith("part-") and p.endswith(".npy"))
+                if not parts:
+                    continue
+                with self._io_lock:
+                    rows = self._read_dir(directory)
+                    tmp_path = os.path.join(directory, "chunk.npy.tmp")
+                    with open(tmp_path, "wb") as f:
+                        np.save(f, rows)
+                    os.replace(tmp_path, os.path.join(directory, "chunk.npy"))
+                    for p in parts:
+                        os.remove(os.path.join(directory, p))
+
+    # --- Reads ---
+    def machines(self):
+        if not os.path.isdir(self.root):
+            return []
+        return sorted(d for d in os.listdir(self.root) if os.path.isdir(os.path.join(self.root, d)))
+
+    def _read_dir(self, directory):
+        files = sorted(f for f in os.listdir(directory) if f.endswith(".npy"))
+        arrays = [np.load(os.path.join(directory, f), mmap_mode="r") for f in files]
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=SAMPLE_DTYPE)
+
+    def read(self, machine_id, start, end):
+        """All raw samples for a machine with start <= ts < end, sorted by time."""
+        if not _MACHINE_ID.match(machine_id or ""):
+            raise ValueError(f"Invalid machine_id: {machine_id!r}")
+        first, last = hour_partition(start), hour_partition(max(start, end - 1e-6))
+        arrays = []
+        machine_dir = os.path.join(self.root, machine_id)
+        with self._io_lock:
+            if os.path.isdir(machine_dir):
+                for hour in sorted(os.listdir(machine_dir)):
+                    if first <= hour <= last:
+                        arrays.append(self._read_dir(os.path.join(machine_dir, hour)))
+            with self._lock:
+                pending = list(self._buffers.get(machine_id, []))
+        if pending:
+            arrays.append(np.array(pending, dtype=SAMPLE_DTYPE))
+        if not arrays:
+            return np.empty(0, dtype=SAMPLE_DTYPE)
+        rows = np.concatenate(arrays)
+        rows = rows[(rows["ts"] >= start) & (rows["ts"] < end)]
+        return rows[np.argsort(rows["ts"], kind="stable")]
+
+    def query(self, machine_id, start, end, metrics=None, step=None):
+        """
+        Returns {"ts": [...], metric: [...]} for a time range. With `step`
+        (seconds), samples are averaged into step-sized buckets starting at
+        multiples of `step`; empty buckets are omitted.
+        """
+        metrics = metrics or HISTORY_METRICS
+        unknown = set(metrics) - set(COLUMNS)
+        if unknown:
+            raise ValueError(f"Unknown metrics: {', '.join(sorted(unknown))}")
+        if step is not None and step <= 0:
+            raise ValueError("step must be positive")
+        rows = self.read(machine_id, start, end)
+        if not step or len(rows) == 0:
+            return {"ts": rows["ts"].tolist(), **{m: rows[m].tolist() for m in metrics}}
+
+        buckets = (rows["ts"] // step).astype(np.int64)
+        occupied, inverse, counts = np.unique(buckets, return_inverse=True, return_counts=True)
+        result = {"ts": (occupied * step).tolist()}
+        for m in metrics:
+            sums = np.bincount(inverse, weights=rows[m].astype(np.float64), minlength=len(occupied))
+            result[m] = (sums / counts).tolist()
+        return result
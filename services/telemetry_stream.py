@@ -0,0 +1,152 @@
+# services/telemetry_stream.py
+import json
+import queue
+import threading
+import time
+
+
+class Subscription:
+    """A bounded mailbox for one connected dashboard. Slow clients lose the oldest frames, never block ingest."""
+
+    def __init__(self, key, maxsize=32):
+        self.key = key
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def publish(self, message):
+        while True:
+            try:
+                self._queue.put_nowait(message)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Returns the next message, or None if nothing arrived within `timeout` seconds."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class TelemetryHub:
+    """
+    One upstream ingest loop fanned out to any number of streaming clients.
+
+    A background thread calls `fetch_frame()` every `interval` seconds and then
+    `process_frame(frame, keys, changed_keys)` once with the set of subscribed
+    keys (shift_ids) and the subset that has not yet seen this frame. It returns
+    a {key: message} mapping for the keys that need a push; each message goes
+    to every subscriber of its key.
+    Upstream load is therefore tied to the telemetry rate, not the client count.
+    """
+
+    subscription_class = Subscription
+
+    def __init__(self, fetch_frame, process_frame, interval=0.5):
+        self.fetch_frame = fetch_frame
+        self.process_frame = process_frame
+        self.interval = interval
+        self._subscribers = {}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._last_fingerprint = None
+        self._last_messages = {}
+        self.metrics = {"frames_fetched": 0, "frames_changed": 0, "messages_published": 0, "fetch_errors": 0}
+
+    def subscribe(self, key):
+        sub = self.subscription_class(key)
+        with self._lock:
+            self._subscribers.setdefault(key, set()).add(sub)
+            last = self._last_messages.get(key)
+        # New clients get the latest state immediately instead of waiting for a change.
+        if last is not None:
+            sub.publish(last)
+        self._ensure_running()
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            subs = self._subscribers.get(sub.key)
+            if subs:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.key]
+                    self._last_messages.pop(sub.key, None)
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def _ensure_running(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="telemetry-ingest", daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            started = time.monotonic()
+            with self._lock:
+                keys = set(self._subscribers)
+            if keys:
+                self._ingest_once(keys)
+            time.sleep(max(0.0, self.interval - (time.monotonic() - started)))
+
+    def _ingest_once(self, keys):
+        try:
+            frame = self.fetch_frame()
+        except Exception as e:
+            self.metrics["fetch_errors"] += 1
+            print(f"Telemetry ingest error: {e}")
+            return
+        self._dispatch(frame, keys)
+
+    def _dispatch(self, frame, keys):
+        """Processes one fetched frame and publishes the resulting messages."""
+        changed_keys = self._changed_keys(frame, keys)
+        try:
+            messages = self.process_frame(frame, keys, changed_keys)
+        except Exception as e:
+            print(f"Telemetry processing error: {e}")
+            return
+        self._publish(messages)
+
+    def _changed_keys(self, frame, keys):
+        """The subscribed keys that have not seen this frame yet."""
+        self.metrics["frames_fetched"] += 1
+        fingerprint = json.dumps(frame, sort_keys=True)
+        if fingerprint != self._last_fingerprint:
+            self._last_fingerprint = fingerprint
+            self.metrics["frames_changed"] += 1
+            changed_keys = keys
+        else:
+            # Unchanged frames still run through processing so time-based alert
+            # transitions fire; only newly subscribed keys need the frame itself.
+            changed_keys = keys - set(self._last_messages)
+        return changed_keys
+
+    def _publish(self, messages):
+        with self._lock:
+            for key, message in messages.items():
+                self._last_messages[key] = message
+                for sub in self._subscribers.get(key, ()):
+                    sub.publish(message)
+                    self.metrics["messages_published"] += 1
+
+
+def sse_stream(hub, key, keepalive=15.0):
+    """Generator yielding Server-Sent Events for one subscriber until the client disconnects."""
+    sub = hub.subscribe(key)
+    try:
+        yield "retry: 2000\n\n"
+        while True:
+            message = sub.get(timeout=keepalive)
+            if message is None:
+                yield ": keepalive\n\n"
+            else:
+                yield f"data: {json.dumps(message)}\n\n"
+    finally:
+        hub.unsubscribe(sub)
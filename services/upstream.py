@@ -0,0 +1,238 @@
+# services/upstream.py
+import bisect
+import random
+import threading
+import time
+from collections import OrderedDict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open-ended.
+LATENCY_BUCKETS_MS = [5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+RETRYABLE_STATUS = {502, 503, 504}
+
+
+class CircuitOpenError(requests.RequestException):
+    """Raised instead of calling an upstream whose circuit breaker is open."""
+
+
+class UpstreamResponseError(requests.RequestException):
+    """Raised when an upstream answers 2xx with a body that is not valid JSON."""
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and fast-fails calls for
+    `reset_timeout` seconds. After that a single trial call is let through
+    (half-open): success closes the circuit, failure re-opens it.
+    """
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=10.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == self.OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                return True
+            return self.state == self.CLOSED
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self.state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                self.state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+class UpstreamClient:
+    """
+    A keep-alive HTTP client for one upstream service.
+
+    - One requests.Session with its own connection pool, so calls reuse TCP
+      connections instead of opening a new one per request.
+    - Every call has a (connect, read) timeout, and all attempts of one call
+      share a total `deadline` (connect + read timeout unless given).
+    - Failures to connect and 502/503/504 are retried with jittered exponential
+      backoff. A read timeout is not: the upstream already has the request and
+      a retry would only stall the caller again.
+    - A circuit breaker fast-fails while the upstream is down. Any 5xx, timeout,
+      connection or protocol error (including a body that is not JSON) counts
+      as a failure; a 4xx counts as a healthy upstream.
+    - Callers that pass a `fallback_key` get the last-known-good response
+      instead of an error; the `fallback_size` most recently used keys are kept.
+    - Latency is recorded in a per-upstream histogram.
+    """
+
+    def __init__(self, name, timeout=(1.0, 5.0), retries=2, backoff=0.1,
+                 pool_size=20, breaker=None, deadline=None, fallback_size=256):
+        self.name = name
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.deadline = deadline
+        self.fallback_size = fallback_size
+        self.breaker = breaker or CircuitBreaker()
+        self.session = self._make_session(pool_size)
+        self._last_good = OrderedDict()
+        self._lock = threading.Lock()
+        self._histogram = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.metrics = {"calls": 0, "failures": 0, "retries": 0, "short_circuited": 0, "stale_served": 0}
+
+    def _make_session(self, pool_size):
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def get_json(self, url, fallback_key=None, **kwargs):
+        return self.request_json("GET", url, fallback_key=fallback_key, **kwargs)
+
+    def post_json(self, url, json=None, fallback_key=None, **kwargs):
+        return self.request_json("POST", url, fallback_key=fallback_key, json=json, **kwargs)
+
+    def request_json(self, method, url, fallback_key=None, **kwargs):
+        """
+        Performs a request and returns (data, stale). `stale` is True when the
+        call failed and the last-known-good value for `fallback_key` was served.
+        """
+        try:
+            data = self._call(method, url, **kwargs)
+        except requests.RequestException:
+            return self._fallback(fallback_key)
+        self._remember(fallback_key, data)
+        return data, False
+
+    def _remember(self, fallback_key, data):
+        if fallback_key is None:
+            return
+        with self._lock:
+            self._last_good[fallback_key] = data
+            self._last_good.move_to_end(fallback_key)
+            while len(self._last_good) > self.fallback_size:
+                self._last_good.popitem(last=False)
+
+    def _fallback(self, fallback_key):
+        """Serves the last-known-good value for `fallback_key`, or re-raises the active error."""
+        if fallback_key is not None:
+            with self._lock:
+                if fallback_key in self._last_good:
+                    self._last_good.move_to_end(fallback_key)
+                    self.metrics["stale_served"] += 1
+                    return self._last_good[fallback_key], True
+        raise
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            with self._lock:
+                self.metrics["short_circuited"] += 1
+            raise CircuitOpenError(f"Circuit open for upstream '{self.name}'.")
+
+    # --- Attempts ---
+    # Shared by the sync and async clients; only the exception types differ.
+    def _deadline_for(self, timeout):
+        budget = self.deadline if self.deadline is not None else sum(timeout)
+        return time.monotonic() + budget
+
+    def _attempt_timeout(self, timeout, deadline):
+        """(connect, read) for the next attempt, clipped to what is left of the deadline."""
+        remaining = max(deadline - time.monotonic(), 0.001)
+        return min(timeout[0], remaining), min(timeout[1], remaining)
+
+    def _retry_delay(self, attempt, deadline):
+        """Seconds to sleep before retry number `attempt`, or None if the call should give up."""
+        if attempt > self.retries:
+            return None
+        # Full jitter keeps retries from many workers from arriving in lockstep.
+        delay = random.uniform(0, self.backoff * (2 ** attempt))
+        if time.monotonic() + delay >= deadline:
+            return None
+        with self._lock:
+            self.metrics["retries"] += 1
+        return delay
+
+    def _settle(self, healthy):
+        # Exactly one outcome per admitted call, so a half-open trial always
+        # either closes or re-opens the circuit.
+        if healthy:
+            self.breaker.record_success()
+        else:
+            self.breaker.record_failure()
+
+    @staticmethod
+    def _retryable(error):
+        # ConnectTimeout is a ConnectionError; ReadTimeout is not.
+        if isinstance(error, requests.ConnectionError):
+            return True
+        response = getattr(error, "response", None)
+        return isinstance(error, requests.HTTPError) and response is not None \
+            and response.status_code in RETRYABLE_STATUS
+
+    def _decode(self, response):
+        try:
+            return response.json()
+        except ValueError as e:
+            raise UpstreamResponseError(f"Invalid JSON from {self.name}: {e}", response=response) from e
+
+    def _call(self, method, url, **kwargs):
+        self._check_breaker()
+
+        timeout = kwargs.pop("timeout", self.timeout)
+        deadline = self._deadline_for(timeout)
+        healthy = False
+        attempt = 0
+        try:
+            while True:
+                started = time.perf_counter()
+                try:
+                    response = self.session.request(
+                        method, url, timeout=self._attempt_timeout(timeout, deadline), **kwargs)
+                    # A 4xx means the request was bad, not that the upstream is unhealthy.
+                    healthy = 400 <= response.status_code < 500
+                    response.raise_for_status()
+                    data = self._decode(response)
+                except requests.RequestException as e:
+                    self._record(started, ok=False)
+                    attempt += 1
+                    delay = None if healthy or not self._retryable(e) else self._retry_delay(attempt, deadline)
+                    if delay is None:
+                        raise
+                    time.sleep(delay)
+                    continue
+                self._record(started, ok=True)
+                healthy = True
+                return data
+        finally:
+            self._settle(healthy)
+
+    def _record(self, started, ok):
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        with self._lock:
+            self.metrics["calls"] += 1
+            if not ok:
+                self.metrics["failures"] += 1
+            self._histogram[bisect.bisect_left(LATENCY_BUCKETS_MS, elapsed_ms)] += 1
+
+    def stats(self):
+        with self._lock:
+            labels = [f"le_{b}ms" for b in LATENCY_BUCKETS_MS] + ["gt_5000ms"]
+            return dict(
+                self.metrics,
+                circuit=self.breaker.state,
+                latency_histogram=dict(zip(labels, self._histogram))
+            )
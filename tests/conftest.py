@@ -0,0 +1,9 @@
+import os
+import sys
+
+# services/ is imported as a package from the repo root; AnalyticsModule uses
+# flat imports, like its servers and MiscScripts do.
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+for path in (ROOT, os.path.join(ROOT, 'AnalyticsModule')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
@@ -0,0 +1,91 @@
+import copy
+
+import numpy as np
+import pytest
+
+from services.alert_rules import DEFAULT_RULES, RuleEngine
+
+BASE_THRESHOLDS = {"PROXIMITY_NEAR": 3.0, "HIGH_NOISE": 90.0, "HIGH_AQI": 200.0, "HIGH_ENGINE_TEMP": 115.0}
+
+FRAME = {
+    "identity": {"machine_id": "EXC001", "operator_id": "OP1001"},
+    "status": {"engine_temperature_celsius": 95.0, "engine_rpm": 1800, "fuel_percent": 60.0,
+               "ignition_on": True, "is_idling": False},
+    "environment": {"noise_db": 80.0, "dust_aqi": 120.0, "air_quality_ppm": 400.0},
+    "safety": {"proximity_meters": {"front": 8.0, "rear": 6.0}, "seatbelt_buckled": True},
+}
+
+# A rule whose limit only dozers define.
+HOT_AT_IDLE = {"type": "HOT_AT_IDLE", "message": "Engine hot while idling.",
+               "all": [("engine_temp_c", ">", "IDLE_ENGINE_TEMP"), ("is_idling", "==", True)]}
+QUIET_OR_CLEAN = {"type": "NOT_BOTH", "message": "Either quiet or clean air.",
+                  "any": [("noise_db", "<", 70.0), ("dust_aqi", "<", "LOW_AQI")]}
+
+
+def frame(machine_id, temp=95.0, noise=80.0, aqi=120.0, proximity=8.0, idling=False):
+    f = copy.deepcopy(FRAME)
+    f["identity"]["machine_id"] = machine_id
+    f["status"]["engine_temperature_celsius"] = temp
+    f["status"]["is_idling"] = idling
+    f["environment"]["noise_db"] = noise
+    f["environment"]["dust_aqi"] = aqi
+    f["safety"]["proximity_meters"]["front"] = proximity
+    return f
+
+
+FRAMES = [
+    frame("EXC001"),
+    frame("EXC002", temp=120.0, noise=95.0),
+    frame("DOZ001", temp=100.0, idling=True),
+    frame("DOZ002", temp=100.0, idling=False, aqi=250.0),
+    frame("LDR001", temp=100.0, idling=True, proximity=1.0),
+    frame("DOZ003", noise=60.0, aqi=90.0),
+    frame("", temp=118.0),
+]
+
+
+@pytest.fixture
+def engine():
+    return RuleEngine(
+        BASE_THRESHOLDS, rules=DEFAULT_RULES + [HOT_AT_IDLE, QUIET_OR_CLEAN],
+        machine_type_overrides={"DOZ": {"HIGH_ENGINE_TEMP": 105.0, "IDLE_ENGINE_TEMP": 98.0, "LOW_AQI": 100.0}},
+    )
+
+
+def per_frame_masks(engine, frames):
+    fired = [{a["type"] for a in engine.evaluate_frame(f, machine_id=f["identity"]["machine_id"])} for f in frames]
+    return {rule["type"]: np.array([rule["type"] in types for types in fired]) for rule in engine.rules}
+
+
+def test_batch_matches_per_frame_evaluation(engine):
+    machine_ids = [f["identity"]["machine_id"] for f in FRAMES]
+    batch = engine.evaluate_frames(FRAMES, machine_ids)
+    expected = per_frame_masks(engine, FRAMES)
+    assert batch.keys() == expected.keys()
+    for alert_type, mask in expected.items():
+        assert batch[alert_type].tolist() == mask.tolist(), alert_type
+    # The override-only rule fires for the idling dozer and nowhere else.
+    assert batch["HOT_AT_IDLE"].tolist() == [False, False, True, False, False, False, False]
+
+
+def test_batch_without_machine_ids_uses_the_base_table(engine):
+    batch = engine.evaluate_frames(FRAMES)
+    fired = [{a["type"] for a in engine.evaluate_frame(f, thresholds=BASE_THRESHOLDS)} for f in FRAMES]
+    for rule in engine.rules:
+        assert batch[rule["type"]].tolist() == [rule["type"] in types for types in fired]
+    assert not batch["HOT_AT_IDLE"].any()
+
+
+def test_machine_type_overrides(engine):
+    alerts = engine.evaluate_frame(frame("DOZ009", temp=110.0), machine_id="DOZ009")
+    assert "HIGH_ENGINE_TEMP" in {a["type"] for a in alerts}
+    alerts = engine.evaluate_frame(frame("EXC009", temp=110.0), machine_id="EXC009")
+    assert "HIGH_ENGINE_TEMP" not in {a["type"] for a in alerts}
+
+
+def test_held_types_use_the_hold_thresholds(engine):
+    thresholds = engine.thresholds_for("EXC001")
+    hold = dict(thresholds, HIGH_ENGINE_TEMP=thresholds["HIGH_ENGINE_TEMP"] - 2.0)
+    alerts, held = engine.evaluate_frame_held(frame("EXC001", temp=114.0), thresholds, hold)
+    assert "HIGH_ENGINE_TEMP" not in {a["type"] for a in alerts}
+    assert "HIGH_ENGINE_TEMP" in held
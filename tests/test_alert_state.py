@@ -0,0 +1,52 @@
+from services.alert_state import ACTIVE, CLEARING, AlertTracker
+
+HOT = "HIGH_ENGINE_TEMP"
+
+
+def test_raise_hold_debounces_short_spikes():
+    tracker = AlertTracker(raise_hold=5, clear_hold=0, min_active=0)
+    state = {}
+    assert tracker.update(state, {HOT}, {HOT}, 0) == ([], [])
+    # The condition lapsing before raise_hold forgets the pending alert.
+    assert tracker.update(state, set(), set(), 3) == ([], [])
+    assert state == {}
+    tracker.update(state, {HOT}, {HOT}, 10)
+    assert tracker.update(state, {HOT}, {HOT}, 15) == ([HOT], [])
+    assert AlertTracker.active(state) == [HOT]
+
+
+def test_hovering_inside_the_hysteresis_band_does_not_flap():
+    tracker = AlertTracker(raise_hold=0, clear_hold=10, min_active=0)
+    state = {}
+    assert tracker.update(state, {HOT}, {HOT}, 0) == ([HOT], [])
+    # Below the raise threshold but still past the hold threshold: stays active.
+    for t in range(1, 60):
+        raised = {HOT} if t % 2 else set()
+        assert tracker.update(state, raised, {HOT}, t) == ([], [])
+    assert state[HOT]["state"] == ACTIVE
+
+
+def test_clears_after_clear_hold_and_recovers_while_clearing():
+    tracker = AlertTracker(raise_hold=0, clear_hold=10, min_active=0)
+    state = {}
+    tracker.update(state, {HOT}, {HOT}, 0)
+    assert tracker.update(state, set(), set(), 1) == ([], [])
+    assert state[HOT]["state"] == CLEARING
+    # Back past the hold threshold before clear_hold: the clearing is cancelled.
+    tracker.update(state, set(), {HOT}, 5)
+    assert state[HOT]["state"] == ACTIVE
+    tracker.update(state, set(), set(), 6)
+    assert tracker.update(state, set(), set(), 15) == ([], [])
+    assert tracker.update(state, set(), set(), 16) == ([], [HOT])
+    assert state == {}
+
+
+def test_min_active_keeps_a_brief_alert_up():
+    tracker = AlertTracker(raise_hold=0, clear_hold=0, min_active=30)
+    state = {}
+    tracker.update(state, {HOT}, {HOT}, 0)
+    assert tracker.update(state, set(), set(), 1) == ([], [])
+    assert tracker.update(state, set(), set(), 29) == ([], [])
+    assert tracker.update(state, set(), set(), 30) == ([], [HOT])
+    # A new occurrence is a new incident.
+    assert tracker.update(state, {HOT}, {HOT}, 31) == ([HOT], [])
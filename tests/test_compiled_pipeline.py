@@ -0,0 +1,84 @@
+import os
+
+import numpy as np
+import pytest
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.linear_model import LinearRegression
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+
+import feature_pipeline
+from compiled_pipeline import compile_pipeline, verify
+from feature_pipeline import TASK_DURATION_CATEGORICAL, FeaturePipeline, task_duration_input
+
+DATASET = os.path.join(os.path.dirname(feature_pipeline.__file__), 'fin_synthetic_machine_data.csv')
+
+
+@pytest.fixture(scope='module')
+def task_data():
+    X, y = FeaturePipeline(DATASET, cache_dir=None).task_duration()
+    return X.iloc[:600], y.iloc[:600]
+
+
+@pytest.fixture(scope='module')
+def pipeline(task_data):
+    # The fin_timeEst.py model, scaled down.
+    X, y = task_data
+    model = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer(
+            transformers=[('cat', OneHotEncoder(handle_unknown='ignore'), TASK_DURATION_CATEGORICAL)],
+            remainder='passthrough')),
+        ('regressor', RandomForestRegressor(n_estimators=15, max_depth=12, random_state=0)),
+    ])
+    return model.fit(X.iloc[:400], y.iloc[:400])
+
+
+def records_of(frame):
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
+
+
+def test_matches_pipeline_predict(task_data, pipeline):
+    X, _ = task_data
+    compiled = compile_pipeline(pipeline)
+    records = records_of(X.iloc[400:])
+    expected = pipeline.predict(task_duration_input(records))
+    np.testing.assert_allclose(compiled.predict(records), expected, rtol=0, atol=1e-9)
+    assert compiled.predict_one(records[0]) == pytest.approx(expected[0], abs=1e-9)
+
+
+def test_columns_input_and_verify(task_data, pipeline):
+    X, _ = task_data
+    compiled = compile_pipeline(pipeline)
+    frame = X.iloc[400:]
+    columns = {c: frame[c].tolist() for c in frame.columns}
+    assert verify(compiled, pipeline, columns, task_duration_input(columns)) <= 1e-9
+
+
+def test_unknown_categories_and_missing_numbers(task_data, pipeline):
+    X, _ = task_data
+    compiled = compile_pipeline(pipeline)
+    records = records_of(X.iloc[400:420])
+    records[0]['Machine_ID'] = 'NEW999'
+    records[1]['Terrain'] = 'Swamp'
+    records[2]['RPM'] = None
+    records[3]['Load_Cycles'] = float('nan')
+    expected = pipeline.predict(task_duration_input(records))
+    np.testing.assert_allclose(compiled.predict(records), expected, rtol=0, atol=1e-9)
+
+
+def test_rejects_pipelines_it_cannot_compile(task_data):
+    X, y = task_data
+    numeric = [c for c in X.columns if c not in TASK_DURATION_CATEGORICAL]
+    scaled = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer([('num', StandardScaler(), numeric)])),
+        ('regressor', RandomForestRegressor(n_estimators=2, random_state=0)),
+    ]).fit(X, y)
+    with pytest.raises(ValueError, match="cannot be compiled"):
+        compile_pipeline(scaled)
+    linear = Pipeline(steps=[
+        ('preprocessor', ColumnTransformer([('num', 'passthrough', numeric)])),
+        ('regressor', LinearRegression()),
+    ]).fit(X, y)
+    with pytest.raises(ValueError, match="RandomForestRegressor"):
+        compile_pipeline(linear)
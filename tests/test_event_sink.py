@@ -0,0 +1,60 @@
+import json
+
+from services import event_sink
+from services.event_sink import EventSink
+
+
+class RecordingSink(EventSink):
+    """EventSink whose inserts go to a list instead of Postgres."""
+
+    def __init__(self, spill_path, fail=False):
+        super().__init__(db_pool=None, spill_path=spill_path, flush_interval=0.01)
+        self.fail = fail
+        self.rows = []
+
+    def _insert(self, batch):
+        if self.fail:
+            raise ConnectionError("database down")
+        self.rows.extend(batch)
+
+
+def event(shift_id):
+    return {"shift_id": shift_id, "event_type": "HIGH_NOISE", "details": {"state": "raised"}}
+
+
+def test_failed_inserts_spill_and_replay(tmp_path):
+    sink = RecordingSink(str(tmp_path / "spill.jsonl"), fail=True)
+    assert not sink._write([event(1), event(2)])
+    assert sink.metrics["spilled"] == 2
+    sink.fail = False
+    sink._replay_spill()
+    assert [e["shift_id"] for e in sink.rows] == [1, 2]
+    assert not (tmp_path / "spill.jsonl.replaying").exists()
+
+
+def test_corrupt_spill_lines_are_skipped_and_counted(tmp_path):
+    path = tmp_path / "spill.jsonl"
+    path.write_text("\n".join([
+        json.dumps(event(1)),
+        '{"shift_id": 2, "event_type": "HIGH_NO',  # cut off mid-write
+        json.dumps({"unrelated": True}),
+        "",
+        json.dumps(event(3)),
+    ]) + "\n", encoding="utf-8")
+    sink = RecordingSink(str(path))
+    sink._replay_spill()
+    assert [e["shift_id"] for e in sink.rows] == [1, 3]
+    assert sink.metrics["corrupt_spill_lines"] == 2
+    assert sink.metrics["replayed"] == 2
+
+
+def test_shutdown_hook_is_registered_once(tmp_path, monkeypatch):
+    registered = []
+    monkeypatch.setattr(event_sink.atexit, "register", registered.append)
+    sink = RecordingSink(str(tmp_path / "spill.jsonl"))
+    for _ in range(3):
+        sink._ensure_running()
+        sink._stop.set()
+        sink._thread.join(timeout=5)
+        sink._stop.clear()
+    assert registered == [sink.stop]
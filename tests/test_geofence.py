@@ -0,0 +1,81 @@
+import numpy as np
+import pytest
+
+from services.geofence import PreparedGeofence, track_arrays
+from services.sessions import InvalidGeofence, Session
+
+# Point sets with the answers PostGIS gives for ST_Contains(geofence, point).
+# Points sit clearly inside or outside; ST_Contains is false on the boundary,
+# which the ray-casting test does not promise to reproduce.
+CASES = [
+    ("POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))",
+     [((5, 5), True), ((0.5, 9.5), True), ((-1, 5), False), ((5, 10.5), False), ((11, 11), False)]),
+    # U shape: the notch between the arms is outside although it is inside the bounding box.
+    ("POLYGON((0 0, 9 0, 9 9, 6 9, 6 3, 3 3, 3 9, 0 9, 0 0))",
+     [((1.5, 8), True), ((7.5, 8), True), ((4.5, 1.5), True), ((4.5, 6), False), ((4.5, 3.5), False)]),
+    # Square with a hole.
+    ("POLYGON((0 0, 10 0, 10 10, 0 10, 0 0), (3 3, 7 3, 7 7, 3 7, 3 3))",
+     [((1, 1), True), ((8, 5), True), ((5, 5), False), ((4, 6), False), ((12, 5), False)]),
+    # Two parts.
+    ("MULTIPOLYGON(((0 0, 2 0, 2 2, 0 2, 0 0)), ((5 5, 8 5, 8 8, 5 8, 5 5)))",
+     [((1, 1), True), ((6, 7), True), ((3.5, 3.5), False), ((1, 6), False)]),
+    # Real-world coordinates, as returned by ST_AsText for a task geofence.
+    ("POLYGON((-88.9912 40.4811, -88.9850 40.4811, -88.9850 40.4860, -88.9912 40.4860, -88.9912 40.4811))",
+     [((-88.9880, 40.4830), True), ((-88.9800, 40.4830), False), ((-88.9880, 40.4900), False)]),
+]
+
+
+@pytest.mark.parametrize("wkt, points", CASES)
+def test_matches_st_contains(wkt, points):
+    fence = PreparedGeofence.from_wkt(wkt)
+    lons = [p[0] for p, _ in points]
+    lats = [p[1] for p, _ in points]
+    expected = [inside for _, inside in points]
+    assert [fence.contains(lon, lat) for lon, lat in zip(lons, lats)] == expected
+    assert fence.contains_many(lons, lats).tolist() == expected
+    assert fence.breaches(lons, lats).tolist() == [not inside for inside in expected]
+
+
+def test_random_points_against_the_analytic_answer():
+    # Square with a square hole: containment is two interval tests per axis.
+    fence = PreparedGeofence.from_wkt("POLYGON((0 0, 10 0, 10 10, 0 10, 0 0), (3 3, 7 3, 7 7, 3 7, 3 3))")
+    rng = np.random.default_rng(7)
+    lons, lats = rng.uniform(-2, 12, 20_000), rng.uniform(-2, 12, 20_000)
+    in_outer = (lons > 0) & (lons < 10) & (lats > 0) & (lats < 10)
+    in_hole = (lons > 3) & (lons < 7) & (lats > 3) & (lats < 7)
+    expected = in_outer & ~in_hole
+    assert np.array_equal(fence.contains_many(lons, lats), expected)
+    assert [fence.contains(x, y) for x, y in zip(lons[:2000], lats[:2000])] == expected[:2000].tolist()
+
+
+def test_chunked_evaluation_matches_one_pass(monkeypatch):
+    from services import geofence
+    fence = PreparedGeofence.from_points([[0, 0], [4, 1], [6, 5], [2, 7], [-1, 3]])
+    rng = np.random.default_rng(3)
+    lons, lats = rng.uniform(-2, 7, 5000), rng.uniform(-1, 8, 5000)
+    whole = fence.contains_many(lons, lats)
+    monkeypatch.setattr(geofence, 'BATCH_CELLS', 7)
+    assert np.array_equal(fence.contains_many(lons, lats), whole)
+
+
+def test_rejects_degenerate_polygons():
+    with pytest.raises(ValueError):
+        PreparedGeofence.from_wkt("POLYGON((0 0, 1 1, 0 0))")
+
+
+def test_track_arrays_accepts_pairs_and_rejects_malformed_points():
+    lons, lats = track_arrays([[1, 2], [3.5, 4.5, 100.0]])
+    assert lons.tolist() == [1.0, 3.5] and lats.tolist() == [2.0, 4.5]
+    for points in (None, [], [1, 2], [[1]], [[1, 2], [3]], [["a", "b"]], [[float("nan"), 1]], {"0": [1, 2]}):
+        with pytest.raises(ValueError):
+            track_arrays(points)
+
+
+@pytest.mark.parametrize("wkt", ["POLYGON EMPTY", "POLYGON((0 0, 1 1))", "POLYGON((a b, c d, e f))"])
+def test_set_task_rejects_an_unusable_geofence_and_keeps_the_current_task(wkt):
+    session = Session(1)
+    session.set_task(7, "POLYGON((0 0, 10 0, 10 10, 0 10, 0 0))")
+    with pytest.raises(InvalidGeofence):
+        session.set_task(8, wkt)
+    assert session.task_id == 7
+    assert session.geofence.contains(5, 5)
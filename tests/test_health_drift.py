@@ -0,0 +1,82 @@
+import numpy as np
+
+from services.health_drift import HealthDriftDetector
+
+TEMP, RPM = 90.0, 1800.0
+
+
+def feed(detector, machine_id, start, temps, rpms=None, interval=1.0):
+    """Feeds one sample per second; returns (events, next timestamp)."""
+    rpms = np.full(len(temps), RPM) if rpms is None else rpms
+    events = []
+    for i, (temp, rpm) in enumerate(zip(temps, rpms)):
+        events.extend(detector.update_arrays([machine_id], [start + i * interval], [[temp, rpm]]))
+    return events, start + len(temps) * interval
+
+
+def steady(rng, n, level=TEMP, noise=0.3):
+    return level + rng.normal(0, noise, n)
+
+
+def kinds(events, state):
+    return {e["type"] for e in events if e["state"] == state}
+
+
+def test_no_events_on_a_steady_signal():
+    rng = np.random.default_rng(0)
+    detector = HealthDriftDetector()
+    events, _ = feed(detector, "EXC001", 0, steady(rng, 600), rpms=RPM + rng.normal(0, 20, 600))
+    assert events == []
+    assert detector.snapshot("EXC001")["warm"]
+
+
+def test_nothing_is_raised_during_warmup():
+    detector = HealthDriftDetector(warmup=30)
+    events, _ = feed(detector, "EXC001", 0, [TEMP] * 10 + [TEMP + 50] * 10)
+    assert events == []
+
+
+def test_spike_raises_and_clears():
+    rng = np.random.default_rng(1)
+    detector = HealthDriftDetector()
+    _, t = feed(detector, "EXC001", 0, steady(rng, 120))
+    events, t = feed(detector, "EXC001", t, [TEMP + 15])
+    assert "ENGINE_TEMP_SPIKE" in kinds(events, "raised")
+    events, _ = feed(detector, "EXC001", t, steady(rng, 5))
+    assert "ENGINE_TEMP_SPIKE" in kinds(events, "cleared")
+    # One outlier does not move the baseline far.
+    assert abs(detector.snapshot("EXC001")["metrics"]["engine_temp_c"]["baseline_mean"] - TEMP) < 1.0
+
+
+def test_drift_raises_and_clears_once_the_level_returns():
+    rng = np.random.default_rng(2)
+    detector = HealthDriftDetector()
+    _, t = feed(detector, "EXC001", 0, steady(rng, 300))
+    events, t = feed(detector, "EXC001", t, steady(rng, 120, level=TEMP + 4))
+    raised = [e for e in events if e["type"] == "ENGINE_TEMP_DRIFT" and e["state"] == "raised"]
+    assert len(raised) == 1  # held, not re-raised on every sample
+    assert "DRIFT" in detector.snapshot("EXC001")["metrics"]["engine_temp_c"]["active"]
+    events, _ = feed(detector, "EXC001", t, steady(rng, 300))
+    assert "ENGINE_TEMP_DRIFT" in kinds(events, "cleared")
+    assert detector.snapshot("EXC001")["metrics"]["engine_temp_c"]["active"] == []
+
+
+def test_rate_raises_on_a_sustained_ramp():
+    rng = np.random.default_rng(3)
+    detector = HealthDriftDetector()
+    _, t = feed(detector, "EXC001", 0, steady(rng, 120))
+    ramp = TEMP + np.arange(1, 61) * 1.0 + rng.normal(0, 0.3, 60)  # 1 degree per second
+    events, _ = feed(detector, "EXC001", t, ramp)
+    assert "ENGINE_TEMP_RATE" in kinds(events, "raised")
+
+
+def test_machines_are_tracked_independently_in_a_fleet_tick():
+    rng = np.random.default_rng(4)
+    detector = HealthDriftDetector()
+    machines = ["EXC001", "DOZ002", "LDR003"]
+    for i in range(120):
+        detector.update_arrays(machines, np.full(3, float(i)), np.column_stack([steady(rng, 3), np.full(3, RPM)]))
+    events = detector.update_arrays(machines, np.full(3, 120.0), [[TEMP, RPM], [TEMP + 15, RPM], [TEMP, RPM]])
+    assert [(e["machine_id"], e["type"]) for e in events] == [("DOZ002", "ENGINE_TEMP_SPIKE")]
+    assert detector.machine_count() == 3
+    assert detector.events("DOZ002") == events
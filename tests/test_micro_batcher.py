@@ -0,0 +1,63 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from micro_batcher import MicroBatcher
+
+
+def test_each_caller_gets_its_own_row_in_order():
+    batches = []
+
+    def predict(records):
+        batches.append(list(records))
+        return [r * 10 for r in records]
+
+    batcher = MicroBatcher(predict, max_batch_size=16, max_wait_ms=20)
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        results = list(pool.map(batcher.predict_one, range(200)))
+    assert results == [r * 10 for r in range(200)]
+    assert sum(len(b) for b in batches) == 200
+    assert max(len(b) for b in batches) <= 16
+    assert len(batches) < 200  # concurrent requests were actually stacked
+
+    metrics = batcher.metrics()
+    assert metrics['requests'] == 200 and metrics['errors'] == 0
+
+
+def test_batches_follow_submission_order():
+    seen = []
+
+    def predict(records):
+        seen.append(list(records))
+        return records
+
+    batcher = MicroBatcher(predict, max_batch_size=4, max_wait_ms=50)
+    futures = [batcher.submit(i) for i in range(20)]
+    assert [f.result(5) for f in futures] == list(range(20))
+    assert [r for batch in seen for r in batch] == list(range(20))
+    assert all(len(batch) <= 4 for batch in seen)
+
+
+def test_a_bad_record_fails_alone():
+    def predict(records):
+        if any(r < 0 for r in records):
+            raise ValueError("negative input")
+        return [r + 1 for r in records]
+
+    batcher = MicroBatcher(predict, max_batch_size=32, max_wait_ms=50)
+    futures = [batcher.submit(r) for r in (1, 2, -1, 3)]
+    assert futures[0].result(5) == 2
+    assert futures[1].result(5) == 3
+    with pytest.raises(ValueError, match="negative input"):
+        futures[2].result(5)
+    assert futures[3].result(5) == 4
+    assert batcher.metrics()['errors'] == 1
+
+
+def test_wrong_result_count_is_retried_row_by_row():
+    def predict(records):
+        return [len(records)] if len(records) > 1 else [records[0] * 2]
+
+    batcher = MicroBatcher(predict, max_batch_size=8, max_wait_ms=50)
+    futures = [batcher.submit(r) for r in range(5)]
+    assert [f.result(5) for f in futures] == [0, 2, 4, 6, 8]
@@ -0,0 +1,113 @@
+import os
+import shutil
+
+import pandas as pd
+import pytest
+
+import feature_pipeline
+import operator_profiles
+from feature_pipeline import load_dataset
+from operator_features import build_operator_profiles
+from operator_profiles import OperatorProfileAggregator
+
+DATASET = os.path.join(os.path.dirname(feature_pipeline.__file__), 'fin_synthetic_machine_data.csv')
+
+
+@pytest.fixture
+def csv_path(tmp_path, monkeypatch):
+    # The first 300 records of the shipped dataset; snapshots go under tmp_path.
+    path = tmp_path / 'shifts.csv'
+    with open(DATASET, encoding='utf-8') as src, open(path, 'w', encoding='utf-8') as dst:
+        for _, line in zip(range(301), src):
+            dst.write(line)
+    monkeypatch.setattr(operator_profiles, 'dataset_snapshot',
+                        lambda csv: feature_pipeline.dataset_snapshot(csv, cache_dir=str(tmp_path / 'cache')))
+    return str(path)
+
+
+def full_profiles(csv_path):
+    return build_operator_profiles(load_dataset(csv_path))
+
+
+def assert_same_profiles(actual, expected):
+    actual = actual.sort_values('Operator_ID').reset_index(drop=True)
+    expected = expected.sort_values('Operator_ID').reset_index(drop=True)
+    pd.testing.assert_frame_equal(actual, expected[actual.columns], check_dtype=False, rtol=1e-9)
+
+
+def new_records(operators=('OP1001', 'OP1003', 'OP9999')):
+    return pd.DataFrame([{
+        'Timestamp': '2025-09-01 08:00:00', 'Machine_ID': 'EXC001', 'Operator_ID': operator,
+        'RPM': 1500, 'Engine_Hours': 4000 + i, 'Fuel_Used': 12.5, 'Load_Cycles': 9, 'Idling_Time': 20,
+        'Seatbelt_Status': 'Fastened', 'Safety_Alert_Triggered': 'Yes' if i % 2 else 'No',
+        'Task_Type': 'Digging', 'Soil_Type': 'Clay', 'Terrain': 'Flat', 'Temperature_C': 90.0,
+        'Precipitation_mm': 0.0,
+    } for i, operator in enumerate(operators)])
+
+
+def test_catch_up_matches_a_full_groupby(csv_path, tmp_path):
+    aggregator = OperatorProfileAggregator(str(tmp_path / 'state.json'))
+    assert aggregator.catch_up(csv_path) == 300
+    assert_same_profiles(aggregator.profiles(), full_profiles(csv_path))
+    assert aggregator.catch_up(csv_path) == 0
+
+
+def test_ingest_matches_a_full_groupby(csv_path, tmp_path):
+    aggregator = OperatorProfileAggregator(str(tmp_path / 'state.json'))
+    aggregator.catch_up(csv_path)
+    changed = aggregator.ingest(new_records(), csv_path)
+    assert sorted(changed['Operator_ID']) == ['OP1001', 'OP1003', 'OP9999']
+    assert_same_profiles(aggregator.profiles(), full_profiles(csv_path))
+
+
+def test_restart_reads_only_rows_appended_since(csv_path, tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    OperatorProfileAggregator(state_path).catch_up(csv_path)
+    new_records().reindex(columns=pd.read_csv(csv_path, nrows=0).columns).to_csv(
+        csv_path, mode='a', header=False, index=False)
+
+    restarted = OperatorProfileAggregator(state_path)
+    assert restarted.catch_up(csv_path) == 3
+    assert_same_profiles(restarted.profiles(), full_profiles(csv_path))
+
+
+def test_rewritten_source_is_rebuilt(csv_path, tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    OperatorProfileAggregator(state_path).catch_up(csv_path)
+    # Same header, different (and fewer) records.
+    shortened = str(tmp_path / 'short.csv')
+    load_dataset(csv_path).iloc[100:250].to_csv(shortened, index=False)
+    shutil.move(shortened, csv_path)
+
+    restarted = OperatorProfileAggregator(state_path)
+    assert restarted.catch_up(csv_path) == 150
+    assert_same_profiles(restarted.profiles(), full_profiles(csv_path))
+
+
+def test_non_numeric_fields_are_rejected_before_writing(csv_path, tmp_path):
+    aggregator = OperatorProfileAggregator(str(tmp_path / 'state.json'))
+    aggregator.catch_up(csv_path)
+    size = os.path.getsize(csv_path)
+    records = new_records().astype({'Fuel_Used': object})
+    records.loc[1, 'Fuel_Used'] = 'lots'
+    with pytest.raises(ValueError, match="Fuel_Used must be numeric"):
+        aggregator.ingest(records, csv_path)
+    assert os.path.getsize(csv_path) == size
+
+
+def test_refresh_picks_up_records_another_worker_ingested(csv_path, tmp_path):
+    state_path = str(tmp_path / 'state.json')
+    serving, receiving = OperatorProfileAggregator(state_path), OperatorProfileAggregator(state_path)
+    serving.catch_up(csv_path)
+    receiving.catch_up(csv_path)
+    serving.take_changes()
+
+    receiving.ingest(new_records(), csv_path)
+    serving.refresh(csv_path)
+    changed, complete = serving.take_changes()
+    assert not complete
+    assert sorted(changed['Operator_ID']) == ['OP1001', 'OP1003', 'OP9999']
+    assert_same_profiles(serving.profiles(), full_profiles(csv_path))
+
+    serving.refresh(csv_path)
+    assert len(serving.take_changes()[0]) == 0
@@ -0,0 +1,64 @@
+import copy
+
+import numpy as np
+import pytest
+
+from services.telemetry_store import TelemetryStore
+
+FRAME = {
+    "identity": {"machine_id": "EXC001", "operator_id": "OP1001"},
+    "status": {"engine_temperature_celsius": 95.0, "engine_rpm": 1800, "fuel_percent": 60.0},
+    "environment": {"noise_db": 80.0, "dust_aqi": 120.0},
+    "safety": {"proximity_meters": {"front": 8.0}},
+    "location": {"gps": {"latitude": 40.48, "longitude": -88.99}},
+}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TelemetryStore(str(tmp_path), flush_interval=3600, repeat_interval=1.0)
+    yield store
+    store.stop()
+
+
+def with_rpm(rpm, machine_id="EXC001"):
+    frame = copy.deepcopy(FRAME)
+    frame["status"]["engine_rpm"] = rpm
+    frame["identity"]["machine_id"] = machine_id
+    return frame
+
+
+def test_changed_frames_are_kept_at_any_rate(store):
+    # The stream hub polls every 0.5 s; every new reading must reach the history.
+    assert all(store.append(with_rpm(1800 + i), ts=100 + 0.5 * i) for i in range(10))
+    rows = store.read("EXC001", 0, 200)
+    assert len(rows) == 10
+    assert rows["engine_rpm"].tolist() == [1800 + i for i in range(10)]
+
+
+def test_repeated_frames_are_dropped_until_the_repeat_interval(store):
+    assert store.append(with_rpm(1800), ts=100.0)
+    assert not store.append(with_rpm(1800), ts=100.2)
+    assert not store.append(with_rpm(1800), ts=100.9)
+    assert store.append(with_rpm(1800), ts=101.0)  # a steady machine still records once per interval
+    assert store.metrics["dropped_duplicates"] == 2
+    # Duplicates are per machine.
+    assert store.append(with_rpm(1800, machine_id="DOZ002"), ts=101.1)
+
+
+def test_machine_ids_that_are_not_directory_names(store):
+    assert store.append(with_rpm(1800, machine_id=17), ts=100.0)
+    assert store.append(with_rpm(1800, machine_id="../etc"), ts=100.0)
+    assert not store.append(with_rpm(1800, machine_id=17), ts=100.5)
+    assert store.metrics["unstorable_ids"] == 2
+    assert store.machines() == []
+
+
+def test_reads_see_buffered_and_flushed_rows(store):
+    for i in range(5):
+        store.append(with_rpm(1000 + i), ts=3600.0 * 10 + i)
+    store.flush()
+    for i in range(5, 8):
+        store.append(with_rpm(1000 + i), ts=3600.0 * 10 + i)
+    rows = store.read("EXC001", 0, 3600.0 * 11)
+    assert np.array_equal(rows["engine_rpm"], np.arange(1000, 1008, dtype=np.float32))